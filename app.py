@@ -5,14 +5,22 @@ from flask import Flask, render_template
 from flask_session import Session
 from dotenv import load_dotenv
 from flask_login import LoginManager
+from flask_migrate import Migrate
 from src.routes.sync import sync_bp
 from src.models import db
 from src.config.dev_config import DevConfig
 from src.routes.auth import auth_bp
 from src.routes.search import files_bp
 from src.routes.main import main_bp
-from src.cli.commands import backfill_hashes
+from src.routes.webhook import webhook_bp
+from src.routes.health import health_bp
+from src.cli.commands import (
+    backfill_hashes, bench_docx, bench_mapping_profiles, bench_quantization, bench_startup,
+    build_vector_index, check_subscriptions, maintain_subscriptions, migrate_index_topology, reindex, report_rss,
+    run_jobs, warm_models
+)
 from src.models.user_model import User
+from src.tasks.scheduler import init_job_scheduler
 
 # Load environment variables early
 load_dotenv()
@@ -21,13 +29,29 @@ load_dotenv()
 login_manager = LoginManager()
 login_manager.login_view = "auth.login"  # name of your login endpoint
 
+migrate = Migrate()
+
 def register_blueprints(app):
     """Attach all route blueprints."""
     app.register_blueprint(auth_bp)
     app.register_blueprint(files_bp)
     app.register_blueprint(main_bp)
     app.register_blueprint(sync_bp)
+    app.register_blueprint(webhook_bp, url_prefix="/webhook")
+    app.register_blueprint(health_bp)
     app.cli.add_command(backfill_hashes)
+    app.cli.add_command(maintain_subscriptions)
+    app.cli.add_command(check_subscriptions)
+    app.cli.add_command(bench_docx)
+    app.cli.add_command(warm_models)
+    app.cli.add_command(bench_startup)
+    app.cli.add_command(run_jobs)
+    app.cli.add_command(report_rss)
+    app.cli.add_command(migrate_index_topology)
+    app.cli.add_command(reindex)
+    app.cli.add_command(bench_mapping_profiles)
+    app.cli.add_command(build_vector_index)
+    app.cli.add_command(bench_quantization)
 
 def create_app():
     app = Flask(__name__)
@@ -38,6 +62,7 @@ def create_app():
 
     # 2️⃣ Initialize DB and LoginManager
     db.init_app(app)
+    migrate.init_app(app, db)
     login_manager.init_app(app)
 
     @login_manager.user_loader
@@ -53,7 +78,23 @@ def create_app():
         db.create_all()
         register_blueprints(app)
 
+    init_job_scheduler(app)
+
+    if app.config.get("SUBSCRIPTION_SCHEDULER_ENABLED"):
+        from src.services.subscription_service import start_subscription_scheduler
+        start_subscription_scheduler(app)
+
     return app
 
 if __name__ == "__main__":
-    create_app().run(host="localhost", port=5000, debug=True, threaded=True, use_reloader=True)
+    app = create_app()
+    # only the reloader's child process serves requests; start workers there
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        app.extensions["job_scheduler"].start()
+        if app.config.get("MODEL_WARMUP_ON_START"):
+            import threading
+            from src.services.model_registry import warm_up
+            threading.Thread(
+                target=warm_up, kwargs={"logger": app.logger}, name="model-warmup", daemon=True
+            ).start()
+    app.run(host="localhost", port=5000, debug=True, threaded=True, use_reloader=True)
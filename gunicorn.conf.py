@@ -0,0 +1,64 @@
+# gunicorn.conf.py
+#
+# Pre-fork serving: the master imports the app and loads the NLP models once,
+# freezes the GC so the loaded objects stay on shared pages, then forks the
+# workers. Each worker only pays for its own request state.
+#
+#   gunicorn -c gunicorn.conf.py wsgi:app      # web
+#   flask run-jobs                             # queued syncs + subscriptions
+
+import gc
+import os
+
+# Web workers only enqueue jobs; `flask run-jobs` runs them (one consumer).
+os.environ.setdefault("JOB_QUEUE_CONSUMER", "false")
+os.environ.setdefault("SUBSCRIPTION_SCHEDULER_ENABLED", "false")
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5555")
+workers = int(os.getenv("GUNICORN_WORKERS", os.cpu_count() or 2))
+threads = int(os.getenv("GUNICORN_THREADS", 4))
+worker_class = "gthread"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+preload_app = True
+pidfile = os.getenv("GUNICORN_PIDFILE", "gunicorn.pid")
+
+# load models in the master unless explicitly disabled
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "true").lower() == "true"
+
+
+def _cuda_available() -> bool:
+    try:
+        import torch
+        return torch.cuda.is_available()
+    except ImportError:
+        return False
+
+
+def when_ready(server):
+    """Runs in the master after the app is imported, before any worker forks."""
+    if PRELOAD_MODELS and not _cuda_available():
+        # a CUDA context does not survive fork(); GPU hosts load per worker on first use
+        from src.services.model_registry import warm_up
+        for name, state in warm_up().items():
+            server.log.info(f"model {name}: {'warm' if state['warm'] else state['error']}")
+
+    # the engine's pool was opened by db.create_all(); never share sockets across forks
+    from wsgi import app
+    from src.models import db
+    with app.app_context():
+        db.engine.dispose()
+
+    # move everything allocated so far out of GC tracking, so collections in the
+    # workers don't touch (and un-share) the model objects' pages
+    gc.collect()
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # split the cores between workers instead of every worker using all of them
+    per_worker = max(1, (os.cpu_count() or 1) // workers)
+    try:
+        import torch
+        torch.set_num_threads(per_worker)
+    except ImportError:
+        pass
@@ -0,0 +1,51 @@
+"""document user-scoped file_id uniqueness and lookup indexes
+
+Revision ID: 3f2a9c4d1b7e
+Revises:
+Create Date: 2026-10-19 10:12:41.318207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f2a9c4d1b7e'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _documents_schema():
+    insp = sa.inspect(op.get_bind())
+    uniques = insp.get_unique_constraints('documents')
+    indexes = {i['name'] for i in insp.get_indexes('documents')}
+    return uniques, indexes
+
+
+def upgrade():
+    # Tables created by db.create_all() on a fresh database already match the
+    # models, so only touch what is actually missing or outdated.
+    uniques, indexes = _documents_schema()
+    global_file_id = [u['name'] for u in uniques if u['column_names'] == ['file_id'] and u['name']]
+    unique_names = {u['name'] for u in uniques}
+
+    with op.batch_alter_table('documents', schema=None) as batch_op:
+        for name in global_file_id:
+            batch_op.drop_constraint(name, type_='unique')
+        if 'uq_documents_user_file' not in unique_names:
+            batch_op.create_unique_constraint('uq_documents_user_file', ['user_id', 'file_id'])
+        if 'ix_documents_user_content_hash' not in indexes:
+            batch_op.create_index('ix_documents_user_content_hash', ['user_id', 'content_hash'], unique=False)
+
+
+def downgrade():
+    uniques, indexes = _documents_schema()
+    unique_names = {u['name'] for u in uniques}
+
+    with op.batch_alter_table('documents', schema=None) as batch_op:
+        if 'ix_documents_user_content_hash' in indexes:
+            batch_op.drop_index('ix_documents_user_content_hash')
+        if 'uq_documents_user_file' in unique_names:
+            batch_op.drop_constraint('uq_documents_user_file', type_='unique')
+        batch_op.create_unique_constraint('documents_file_id_key', ['file_id'])
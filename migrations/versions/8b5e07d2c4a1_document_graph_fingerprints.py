@@ -0,0 +1,36 @@
+"""document graph fingerprints (provider hash, cTag, eTag)
+
+Revision ID: 8b5e07d2c4a1
+Revises: 3f2a9c4d1b7e
+Create Date: 2026-10-19 11:03:27.904415
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b5e07d2c4a1'
+down_revision = '3f2a9c4d1b7e'
+branch_labels = None
+depends_on = None
+
+COLUMNS = (
+    ('provider_hash', 128),
+    ('ctag', 256),
+    ('etag', 256),
+)
+
+
+def upgrade():
+    existing = {c['name'] for c in sa.inspect(op.get_bind()).get_columns('documents')}
+    with op.batch_alter_table('documents', schema=None) as batch_op:
+        for name, length in COLUMNS:
+            if name not in existing:
+                batch_op.add_column(sa.Column(name, sa.String(length=length), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('documents', schema=None) as batch_op:
+        for name, _ in reversed(COLUMNS):
+            batch_op.drop_column(name)
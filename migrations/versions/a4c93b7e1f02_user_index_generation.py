@@ -0,0 +1,30 @@
+"""user index generation (search result cache key)
+
+Revision ID: a4c93b7e1f02
+Revises: e2a8f05c6d19
+Create Date: 2026-10-19 18:31:12.770341
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c93b7e1f02'
+down_revision = 'e2a8f05c6d19'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = {c['name'] for c in sa.inspect(op.get_bind()).get_columns('users')}
+    if 'index_generation' not in existing:
+        with op.batch_alter_table('users', schema=None) as batch_op:
+            batch_op.add_column(
+                sa.Column('index_generation', sa.Integer(), nullable=False, server_default='0')
+            )
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('index_generation')
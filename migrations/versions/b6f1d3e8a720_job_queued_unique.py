@@ -0,0 +1,41 @@
+"""one queued job per (kind, user)
+
+Revision ID: b6f1d3e8a720
+Revises: a4c93b7e1f02
+Create Date: 2026-10-19 19:12:40.518226
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6f1d3e8a720'
+down_revision = 'a4c93b7e1f02'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the jobs table itself comes from db.create_all(), which may have built the index too
+    insp = sa.inspect(op.get_bind())
+    if 'jobs' not in insp.get_table_names():
+        return
+    if 'uq_jobs_queued_kind_user' in {i['name'] for i in insp.get_indexes('jobs')}:
+        return
+
+    # keep the oldest of duplicate queued jobs
+    op.execute(
+        "DELETE FROM jobs WHERE status = 'QUEUED' AND id NOT IN ("
+        "SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM jobs WHERE status = 'QUEUED' "
+        "GROUP BY kind, user_id) AS keep)"
+    )
+    op.create_index(
+        'uq_jobs_queued_kind_user', 'jobs', ['kind', 'user_id'], unique=True,
+        postgresql_where=sa.text("status = 'QUEUED'"),
+        sqlite_where=sa.text("status = 'QUEUED'")
+    )
+
+
+def downgrade():
+    op.drop_index('uq_jobs_queued_kind_user', table_name='jobs')
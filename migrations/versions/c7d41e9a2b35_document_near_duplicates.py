@@ -0,0 +1,37 @@
+"""document near-duplicate signature and cluster
+
+Revision ID: c7d41e9a2b35
+Revises: 8b5e07d2c4a1
+Create Date: 2026-10-19 16:42:08.113952
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d41e9a2b35'
+down_revision = '8b5e07d2c4a1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    insp = sa.inspect(op.get_bind())
+    existing = {c['name'] for c in insp.get_columns('documents')}
+    indexes = {i['name'] for i in insp.get_indexes('documents')}
+    with op.batch_alter_table('documents', schema=None) as batch_op:
+        if 'minhash' not in existing:
+            batch_op.add_column(sa.Column('minhash', sa.LargeBinary(), nullable=True))
+        if 'dup_cluster' not in existing:
+            batch_op.add_column(sa.Column('dup_cluster', sa.String(length=128), nullable=True))
+        # create_all() may have built it already
+        if 'ix_documents_user_dup_cluster' not in indexes:
+            batch_op.create_index('ix_documents_user_dup_cluster', ['user_id', 'dup_cluster'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('documents', schema=None) as batch_op:
+        batch_op.drop_index('ix_documents_user_dup_cluster')
+        batch_op.drop_column('dup_cluster')
+        batch_op.drop_column('minhash')
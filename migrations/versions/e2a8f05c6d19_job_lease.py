@@ -0,0 +1,35 @@
+"""job lease (owner, heartbeat_at)
+
+Revision ID: e2a8f05c6d19
+Revises: c7d41e9a2b35
+Create Date: 2026-10-19 18:05:51.402716
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a8f05c6d19'
+down_revision = 'c7d41e9a2b35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the jobs table itself comes from db.create_all(); add the lease columns it lacks
+    insp = sa.inspect(op.get_bind())
+    if 'jobs' not in insp.get_table_names():
+        return
+    existing = {c['name'] for c in insp.get_columns('jobs')}
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        if 'owner' not in existing:
+            batch_op.add_column(sa.Column('owner', sa.String(length=128), nullable=True))
+        if 'heartbeat_at' not in existing:
+            batch_op.add_column(sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.drop_column('heartbeat_at')
+        batch_op.drop_column('owner')
@@ -1,48 +1,530 @@
+import os
 import click
 from flask.cli import with_appcontext
 from src.models import db, User
-from src.services.microsoft_graph import MicrosoftGraphService
-from src.services.parser import parse_stream
-from hashlib import sha256
-from dateutil.parser import parse as parse_datetime
+from src.models.job_model import JobPriority
+from src.tasks.ingest_tasks import BACKFILL_HASHES, backfill_document_hashes
+from src.tasks.scheduler import enqueue_job
 
 @click.command("backfill-hashes")
 @click.argument("user_id", type=int)
+@click.option("--queue", is_flag=True, help="Run as a low-priority background job instead of inline.")
 @with_appcontext
-def backfill_hashes(user_id):
+def backfill_hashes(user_id, queue):
     user = User.query.get(user_id)
     if not user:
         click.echo(f"❌ User with ID {user_id} not found.")
         return
 
-    svc = MicrosoftGraphService(
-        access_token=user.access_token,
-        refresh_token=user.refresh_token,
-        token_expires=user.token_expires,
-        user_id=user.id
+    if queue:
+        job = enqueue_job(BACKFILL_HASHES, user.id, priority=JobPriority.BACKFILL, dispatch=False)
+        click.echo(f"📥 Queued backfill job #{job.id} for user {user.email}")
+        return
+
+    updated = backfill_document_hashes(
+        user,
+        on_error=lambda doc, e: click.echo(f"⚠️ Failed to backfill {doc.filename}: {e}")
     )
-    svc.ensure_valid_token()
+    click.echo(f"✅ Done: {updated} documents updated for user {user.email}")
 
-    from src.models.document_model import Document  # import inside to avoid circulars
-    docs = Document.query.filter_by(user_id=user_id).all()
-    updated = 0
 
-    for doc in docs:
-        if doc.content_hash and doc.modified_at:
-            continue
+@click.command("maintain-subscriptions")
+@click.option("--user-id", type=int, default=None, help="Only maintain this user's subscriptions.")
+@with_appcontext
+def maintain_subscriptions(user_id):
+    """Create, renew and garbage-collect Graph subscriptions (run from cron)."""
+    from src.services.subscription_service import (
+        maintain_user_subscriptions,
+        run_subscription_maintenance
+    )
+
+    if user_id is None:
+        totals = run_subscription_maintenance()
+        click.echo(f"✅ Done: {totals}")
+        return
+
+    user = User.query.get(user_id)
+    if not user:
+        click.echo(f"❌ User with ID {user_id} not found.")
+        return
+
+    stats = maintain_user_subscriptions(user)
+    sub = stats.pop("subscription")
+    click.echo(f"✅ Done: {stats}, active subscription {sub.sub_id} expires {sub.expires_at}")
+
+
+@click.command("check-subscriptions")
+@with_appcontext
+def check_subscriptions():
+    """Run create/renew/garbage-collect against a local fake Graph endpoint, with a throwaway user."""
+    from datetime import datetime, timedelta
+    from src.models.subscription_model import Subscription
+    from src.services.subscription_service import maintain_user_subscriptions
+    from src.utils.fake_graph import FakeGraph
+    from flask import current_app
+
+    cfg = current_app.config
+    local = current_app.test_client()
+
+    def validate(url, token):
+        # the handshake goes to this app's own webhook route, in process
+        resp = local.post(cfg["WEBHOOK_PATH"], query_string={"validationToken": token})
+        return resp.status_code, resp.get_data(as_text=True)
+
+    fake = FakeGraph(validate)
+    previous_base = cfg["GRAPH_BASE_URL"]
+    cfg["GRAPH_BASE_URL"] = fake.start()
+    user = User(
+        ms_id=f"fake-graph-{os.urandom(4).hex()}",
+        name="Subscription check",
+        email="subscription-check@localhost",
+        access_token="fake-token",
+        refresh_token="fake-token",
+        token_expires=datetime.utcnow() + timedelta(hours=1)
+    )
+    db.session.add(user)
+    db.session.commit()
+
+    failures = 0
+
+    def check(label, ok):
+        nonlocal failures
+        failures += not ok
+        click.echo(f"{'✅' if ok else '❌'} {label}")
+
+    def expire_soon(sub):
+        sub.expires_at = datetime.utcnow() + timedelta(minutes=5)
+        db.session.commit()
+
+    try:
+        stats = maintain_user_subscriptions(user)
+        first = stats["subscription"]
+        check("creates a subscription after the validation handshake",
+              stats["created"] == 1 and fake.handshakes == 1 and first.sub_id in fake.subscriptions)
+
+        stats = maintain_user_subscriptions(user)
+        check("leaves a fresh subscription alone", stats["created"] == stats["renewed"] == stats["removed"] == 0)
+
+        expire_soon(first)
+        stats = maintain_user_subscriptions(user)
+        check("renews a subscription close to expiry",
+              stats["renewed"] == 1 and first.expires_at > datetime.utcnow() + timedelta(days=1))
+
+        stray = dict(next(iter(fake.subscriptions.values())), id="stray-remote")
+        fake.subscriptions[stray["id"]] = stray
+        db.session.add(Subscription(
+            sub_id="stale-local", user_id=user.id, client_state="x",
+            expires_at=datetime.utcnow() - timedelta(minutes=1)
+        ))
+        db.session.commit()
+        stats = maintain_user_subscriptions(user)
+        check("drops expired local rows and untracked remote subscriptions",
+              stats["removed"] == 2 and set(fake.subscriptions) == {first.sub_id})
+
+        fake.subscriptions.clear()
+        expire_soon(first)
+        stats = maintain_user_subscriptions(user)
+        check("replaces a subscription Graph no longer knows",
+              stats["created"] == 1 and stats["subscription"].sub_id in fake.subscriptions)
+    finally:
+        Subscription.query.filter_by(user_id=user.id).delete()
+        db.session.delete(user)
+        db.session.commit()
+        fake.stop()
+        cfg["GRAPH_BASE_URL"] = previous_base
+
+    click.echo("✅ Subscription manager OK" if not failures else f"❌ {failures} check(s) failed")
+    if failures:
+        raise SystemExit(1)
+
+
+@click.command("bench-docx")
+@click.argument("paths", nargs=-1, type=click.Path(exists=True, dir_okay=False), required=True)
+def bench_docx(paths):
+    """Compare the streaming .docx extractor with python-docx (speed + paragraph parity)."""
+    import time
+    from docx import Document as DocxDocument
+    from src.services.docx_extractor import iter_docx_paragraphs
+
+    for path in paths:
+        start = time.perf_counter()
+        reference = [p.text.strip() for p in DocxDocument(path).paragraphs if p.text.strip()]
+        t_docx = time.perf_counter() - start
+
+        start = time.perf_counter()
+        body = [t.strip() for t in iter_docx_paragraphs(path, include_headers_footers=False) if t.strip()]
+        t_stream = time.perf_counter() - start
+
+        # python-docx only sees top-level body paragraphs; ours adds table cells in body order
+        remaining = iter(body)
+        parity = all(any(p == q for q in remaining) for p in reference)
+
+        click.echo(
+            f"{'✅' if parity else '❌'} {path}: python-docx {t_docx:.3f}s, "
+            f"streaming {t_stream:.3f}s ({t_docx / max(t_stream, 1e-9):.1f}x), "
+            f"{len(reference)} / {len(body)} paragraphs"
+        )
+
+
+@click.command("warm-models")
+@click.argument("names", nargs=-1)
+def warm_models(names):
+    """Load the NLP models now (all by default) and report load times."""
+    from src.services.model_registry import warm_up
+
+    for name, state in warm_up(names or None).items():
+        if state["warm"]:
+            click.echo(f"🔥 {name}: warm ({state['load_seconds']}s)")
+        else:
+            click.echo(f"❌ {name}: {state['error'] or 'not loaded'}")
+
+
+HEAVY_MODULES = ("torch", "spacy", "sentence_transformers", "sklearn", "transformers")
+
+STARTUP_COMMANDS = (
+    "--help",
+    "backfill-hashes --help",
+    "maintain-subscriptions --help",
+    "db --help",
+)
+
+
+@click.command("bench-startup")
+@click.option("--budget", default=1.0, show_default=True, help="Max seconds per command.")
+@click.option("--runs", default=3, show_default=True, help="Runs per command (best is kept).")
+def bench_startup(budget, runs):
+    """Time cold `flask` CLI startup and check no model libraries are imported."""
+    import subprocess
+    import sys
+    import time
+
+    def timed(args):
+        best, proc = None, None
+        for _ in range(runs):
+            start = time.perf_counter()
+            proc = subprocess.run(args, capture_output=True, text=True)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, proc
+
+    failures = 0
+
+    probe = (
+        "import sys, app; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    elapsed, proc = timed([sys.executable, "-c", probe])
+    heavy = proc.stdout.strip().splitlines()[-1] if proc.stdout.strip() else ""
+    if proc.returncode != 0 or heavy:
+        failures += 1
+        click.echo(f"❌ import app: {elapsed:.3f}s, heavy modules loaded: {heavy or proc.stderr.strip()[-200:]}")
+    else:
+        click.echo(f"✅ import app: {elapsed:.3f}s, no model libraries imported")
+
+    for command in STARTUP_COMMANDS:
+        elapsed, proc = timed([sys.executable, "-m", "flask", "--app", "app", *command.split()])
+        ok = proc.returncode == 0 and elapsed <= budget
+        failures += not ok
+        click.echo(f"{'✅' if ok else '❌'} flask {command}: {elapsed:.3f}s (budget {budget}s)")
+
+    if failures:
+        raise click.ClickException(f"{failures} startup check(s) failed")
+
+
+@click.command("run-jobs")
+@click.option("--poll-interval", default=2, show_default=True, help="Seconds between queue polls.")
+@click.option("--subscriptions/--no-subscriptions", default=True, show_default=True,
+              help="Also run the Graph subscription maintenance loop.")
+@with_appcontext
+def run_jobs(poll_interval, subscriptions):
+    """Execute queued jobs (sync, backfill) for pre-forked web servers."""
+    import time
+    from flask import current_app
+
+    app = current_app._get_current_object()
+    scheduler = app.extensions["job_scheduler"]
+    scheduler.consume = True
+    scheduler.poll_interval = poll_interval
+    scheduler.start()
 
+    if subscriptions:
+        from src.services.subscription_service import start_subscription_scheduler
+        start_subscription_scheduler(app)
+
+    click.echo(f"🧵 Running jobs with {scheduler.max_workers} workers (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        click.echo("👋 Stopping")
+
+
+def _read_memory(pid: int) -> dict:
+    """RSS / PSS / shared / private memory of a process in MiB (Linux /proc)."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as fh:
+        for line in fh:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {
+        "rss": fields.get("Rss", 0.0),
+        "pss": fields.get("Pss", 0.0),
+        "shared": fields.get("Shared_Clean", 0.0) + fields.get("Shared_Dirty", 0.0),
+        "private": fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0),
+    }
+
+
+def _children(pid: int) -> list:
+    pids = []
+    for task in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{task}/children") as fh:
+            pids.extend(int(p) for p in fh.read().split())
+    return pids
+
+
+@click.command("report-rss")
+@click.option("--pid", type=int, default=None, help="Server master PID.")
+@click.option("--pidfile", type=click.Path(dir_okay=False), default="gunicorn.pid", show_default=True)
+def report_rss(pid, pidfile):
+    """Report memory per worker of a running pre-fork server (PSS shows copy-on-write sharing)."""
+    if pid is None:
+        try:
+            with open(pidfile) as fh:
+                pid = int(fh.read().strip())
+        except (OSError, ValueError):
+            raise click.ClickException(f"No --pid given and {pidfile} is not readable")
+
+    try:
+        rows = [("master", pid)] + [("worker", child) for child in _children(pid)]
+        totals = {"rss": 0.0, "pss": 0.0}
+        for role, p in rows:
+            mem = _read_memory(p)
+            totals["rss"] += mem["rss"]
+            totals["pss"] += mem["pss"]
+            click.echo(
+                f"{role:<7} {p:>7}  rss {mem['rss']:8.1f} MiB  pss {mem['pss']:8.1f} MiB  "
+                f"shared {mem['shared']:8.1f} MiB  private {mem['private']:8.1f} MiB"
+            )
+    except FileNotFoundError as e:
+        raise click.ClickException(f"Cannot read process memory (Linux /proc required): {e}")
+
+    workers = len(rows) - 1
+    click.echo(
+        f"📊 {workers} workers: summed rss {totals['rss']:.1f} MiB, "
+        f"actual (pss) {totals['pss']:.1f} MiB"
+        + f", {totals['pss'] / len(rows):.1f} MiB per process"
+    )
+
+
+@click.command("migrate-index-topology")
+@click.option("--user-id", type=int, default=None, help="Only migrate this user's index.")
+@click.option("--delete-old", is_flag=True, help="Delete index_user_{id} once its docs are copied.")
+@with_appcontext
+def migrate_index_topology(user_id, delete_old):
+    """Move per-user ES indices into the shared, routed index (then set ES_INDEX_TOPOLOGY=shared)."""
+    from src.services.elastic_service import migrate_user_to_shared_index
+
+    users = [User.query.get(user_id)] if user_id else User.query.order_by(User.id).all()
+    for user in users:
+        if user is None:
+            click.echo(f"❌ User with ID {user_id} not found.")
+            return
         try:
-            meta = svc.get_item(doc.file_id)
-            raw = svc.fetch_file_content(doc.file_id)
-            text = parse_stream(doc.filename, raw)
+            old_count, new_count = migrate_user_to_shared_index(user.id, delete_old=delete_old)
+        except Exception as e:
+            click.echo(f"❌ User {user.id}: {e}")
+            continue
+        mark = "✅" if new_count >= old_count else "⚠️"
+        click.echo(f"{mark} User {user.id}: {old_count} docs -> {new_count} in shared index")
+
+
+@click.command("reindex")
+@click.option("--user-id", type=int, default=None, help="Only rebuild this user's index.")
+@click.option("--source", type=click.Choice(["graph", "index"]), default="graph", show_default=True,
+              help="graph: re-extract files from OneDrive; index: copy the current index (mapping changes only).")
+@click.option("--stale-only", is_flag=True, help="Skip indices already built with the current mapping/preprocessing.")
+@click.option("--keep-old", is_flag=True, help="Keep the previous index version after the swap.")
+@click.option("--queue", is_flag=True, help="Run as background jobs instead of inline.")
+@with_appcontext
+def reindex(user_id, source, stale_only, keep_old, queue):
+    """Rebuild user indices as index_user_{id}_v{N} and swap the alias atomically."""
+    from src.services.reindex_service import is_stale, reindex_user
+    from src.tasks.ingest_tasks import REINDEX
+
+    users = [User.query.get(user_id)] if user_id else User.query.order_by(User.id).all()
+    for user in users:
+        if user is None:
+            click.echo(f"❌ User with ID {user_id} not found.")
+            return
+        if stale_only and not is_stale(user.id):
+            click.echo(f"⏭️ User {user.id}: index is current")
+            continue
 
-            doc.content_hash = sha256(text.encode("utf-8")).hexdigest()
-            modified_at_str = meta.get("lastModifiedDateTime")
-            doc.modified_at = parse_datetime(modified_at_str) if modified_at_str else None
-            updated += 1
+        if queue:
+            job = enqueue_job(
+                REINDEX, user.id, priority=JobPriority.BACKFILL, dispatch=False,
+                source=source, keep_old=keep_old
+            )
+            click.echo(f"📥 Queued reindex job #{job.id} for user {user.id}")
+            continue
 
+        try:
+            stats = reindex_user(user, source=source, keep_old=keep_old)
+            click.echo(f"✅ User {user.id}: {stats}")
         except Exception as e:
-            click.echo(f"⚠️ Failed to backfill {doc.filename}: {e}")
+            click.echo(f"❌ User {user.id}: {e}")
 
-    db.session.commit()
-    click.echo(f"✅ Done: {updated} documents updated for user {user.email}")
+
+@click.command("bench-mapping-profiles")
+@click.argument("user_id", type=int)
+@click.option("--query", "queries", multiple=True, required=True, help="Search query (repeatable).")
+@click.option("--runs", default=20, show_default=True, help="Timed searches per query.")
+@click.option("--top-k", default=100, show_default=True)
+@click.option("--keep", is_flag=True, help="Keep the bench_profile_* indices afterwards.")
+@with_appcontext
+def bench_mapping_profiles(user_id, queries, runs, top_k, keep):
+    """Copy a user's index into each mapping profile and compare store size and search latency."""
+    import statistics
+    import time
+    from src.services.elastic_service import (
+        bm25_search_body, get_es, get_search_index, index_mappings, index_settings
+    )
+    from src.services.index_profiles import PROFILES
+    from src.services.text_preprocessing import preprocess_bm25_query
+
+    client = get_es()
+    source_index = get_search_index(user_id)
+    prepared = [preprocess_bm25_query(q) for q in queries]
+
+    for profile in PROFILES:
+        name = f"bench_profile_{profile}"
+        client.indices.delete(index=name, ignore_unavailable=True)
+        client.indices.create(
+            index=name,
+            settings=index_settings(1, profile, refresh_interval="-1"),
+            mappings=index_mappings(profile)
+        )
+        client.reindex(source={"index": source_index}, dest={"index": name}, wait_for_completion=True)
+        client.indices.put_settings(index=name, settings={"refresh_interval": None})
+        client.indices.forcemerge(index=name, max_num_segments=1)
+        client.indices.refresh(index=name)
+
+        stats = client.indices.stats(index=name, metric="store,docs")["indices"][name]["primaries"]
+        size_mb = stats["store"]["size_in_bytes"] / (1024 * 1024)
+
+        timings = []
+        for q in prepared:
+            client.search(index=name, body=bm25_search_body(q, top_k))   # warm-up
+            for _ in range(runs):
+                start = time.perf_counter()
+                client.search(index=name, body=bm25_search_body(q, top_k))
+                timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+
+        click.echo(
+            f"📊 {profile:<15} {stats['docs']['count']:>7} docs  {size_mb:9.2f} MiB  "
+            f"search p50 {statistics.median(timings):7.2f} ms  p95 {p95:7.2f} ms"
+        )
+        if not keep:
+            client.indices.delete(index=name)
+
+
+@click.command("build-vector-index")
+@click.argument("user_id", type=int)
+@click.option("--batch-size", default=256, show_default=True, help="Documents embedded per batch.")
+@click.option("--compact", is_flag=True,
+              help="Rewrite the index files afterwards (drop tombstones, retrain IVF, apply VECTOR_QUANTIZATION).")
+@with_appcontext
+def build_vector_index(user_id, batch_size, compact):
+    """Embed a user's existing documents into the local ANN index (new files are added at ingest)."""
+    from flask import current_app
+    from src.services.reindex_service import iter_user_documents
+    from src.services.vector_index import get_vector_index, index_documents
+
+    user = User.query.get(user_id)
+    if not user:
+        click.echo(f"❌ User with ID {user_id} not found.")
+        return
+
+    added, failed, batch = 0, 0, []
+    for _, payload in iter_user_documents(user, current_app.config.get("JOB_WORKERS", 4)):
+        if payload is None:
+            failed += 1
+            continue
+        batch.append((payload["file_id"], payload["content"], payload["content_hash"]))
+        if len(batch) >= batch_size:
+            index_documents(user.id, batch)
+            added += len(batch)
+            batch = []
+    if batch:
+        index_documents(user.id, batch)
+        added += len(batch)
+
+    index = get_vector_index(user.id)
+    if compact and index is not None:
+        index.compact(current_app.config.get("VECTOR_QUANTIZATION"))
+        index.save()
+    click.echo(
+        f"✅ {added} vectors added ({failed} failed); index holds {len(index) if index else 0} "
+        f"[{index.backend if index else '-'}]"
+    )
+
+
+@click.command("bench-quantization")
+@click.option("--user-id", type=int, default=None, help="Use this user's stored vectors (default: random unit vectors).")
+@click.option("--n", "count", default=100000, show_default=True, help="Random vectors when no --user-id.")
+@click.option("--dim", default=384, show_default=True)
+@click.option("--queries", default=200, show_default=True)
+@click.option("--k", default=10, show_default=True)
+@click.option("--rescore", default=4, show_default=True, help="Candidates rescored per result.")
+@with_appcontext
+def bench_quantization(user_id, count, dim, queries, k, rescore):
+    """Memory per 1M vectors, QPS and recall@k of int8/binary codes (with float rescoring) vs exact cosine."""
+    import time
+    import numpy as np
+    from src.services import quantization
+    from src.services.vector_index import get_vector_index
+
+    rng = np.random.default_rng(0)
+    if user_id is not None:
+        index = get_vector_index(user_id)
+        if index is None or index.backend != "ivf" or not len(index):
+            click.echo(f"❌ No ivf vector index with vectors for user {user_id}.")
+            return
+        live = np.asarray(sorted(index._rows.values()))
+        base = np.asarray(index._vectors()[live], dtype=np.float32)
+        dim = base.shape[1]
+    else:
+        base = rng.standard_normal((count, dim), dtype=np.float32)
+    base /= np.linalg.norm(base, axis=1, keepdims=True)
+    # queries: perturbed base vectors, so they have true near neighbours
+    picks = rng.choice(len(base), min(queries, len(base)), replace=False)
+    qs = base[picks] + 0.1 * rng.standard_normal((len(picks), dim), dtype=np.float32) / np.sqrt(dim)
+    qs /= np.linalg.norm(qs, axis=1, keepdims=True)
+
+    truth = [set(quantization.top_k(base @ q, k)) for q in qs]
+    full16 = base.astype(np.float16)
+    int8_codes, int8_scales = quantization.encode(base, "int8")
+    bin_codes, _ = quantization.encode(base, "binary")
+
+    variants = [
+        ("float32 exact",  "float32", lambda q: quantization.top_k(base @ q, k)),
+        ("int8",           "int8",    lambda q: quantization.search_codes("int8", int8_codes, int8_scales, q, k)[0]),
+        ("int8 + rescore", "int8",    lambda q: quantization.search_codes(
+            "int8", int8_codes, int8_scales, q, k, full=full16, rescore=rescore)[0]),
+        ("binary",         "binary",  lambda q: quantization.search_codes("binary", bin_codes, None, q, k)[0]),
+        ("binary + rescore", "binary", lambda q: quantization.search_codes(
+            "binary", bin_codes, None, q, k, full=full16, rescore=rescore)[0]),
+    ]
+
+    click.echo(f"📐 {len(base)} vectors x {dim} dims, {len(qs)} queries, recall@{k}, rescore x{rescore}")
+    click.echo("   (rescoring reads float16 rows, memory-mapped from disk in the ivf index)")
+    for label, storage, fn in variants:
+        start = time.perf_counter()
+        found = [set(fn(q)) for q in qs]
+        seconds = time.perf_counter() - start
+        recall = sum(len(f & t) for f, t in zip(found, truth)) / (k * len(qs))
+        mib = quantization.bytes_per_vector(storage, dim) * 1_000_000 / (1024 * 1024)
+        click.echo(f"📊 {label:<17} {mib:9.1f} MiB/1M  {len(qs) / seconds:9.1f} QPS  recall {recall:.3f}")
@@ -22,3 +22,24 @@ EXPANSION_K = 3
 SECOND_BM25_TOP_K = 50
 EMBEDDING_TOP_K = 15
 FINAL_RESULTS_K = 5
+VECTOR_TOP_K = 50  # ANN candidates added to the second BM25 pass (when the vector index is enabled)
+
+# ====== Encoder inference ======
+# Inputs longer than max_seq_length are truncated by the model
+BIENCODER_MAX_SEQ_LENGTH = 256
+CROSS_ENCODER_MAX_SEQ_LENGTH = 512
+# Batches are formed by length with padded size (longest x count) under a token budget
+BIENCODER_TOKEN_BUDGET = 16384
+CROSS_ENCODER_TOKEN_BUDGET = 8192
+ENCODER_MAX_BATCH_SIZE = 256
+
+# ====== Caching ======
+QUERY_CACHE_SIZE = 2048  # per cache: preprocessed queries / query embeddings kept per process
+
+# ====== Result pages ======
+# The reranked ordering of a (user, query) is cached per process; pages past it
+# rerank the next BM25 window (search_after) lazily
+SEARCH_CACHE_SIZE = 256
+SEARCH_CACHE_TTL = 300  # seconds before a query's ordering is recomputed
+RERANK_WINDOW = 50
+SEARCH_MAX_PAGE = 20    # deeper pages would rerank the corpus window by window
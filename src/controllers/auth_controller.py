@@ -1,6 +1,5 @@
 # src/controllers/auth_controller.py
 import requests
-from msal import ConfidentialClientApplication
 from flask import current_app
 from datetime import datetime
 import time
@@ -10,17 +9,13 @@ from msal.authority import Authority
 from src.models.user_model import User
 from src.models import db
 from src.services.microsoft_graph import MicrosoftGraphService, OneDriveServiceError
+from src.utils.auth_utils import apply_tokens, get_confidential_client
 
 def get_msal_app():
     authority = f"https://login.microsoftonline.com/{current_app.config['MS_TENANT_ID']}"
     try:
-        # this will do the OIDC discovery under the hood
-        return ConfidentialClientApplication(
-            client_id=current_app.config["CLIENT_ID"],
-            client_credential=current_app.config["CLIENT_SECRET"],
-            authority=authority,
-            validate_authority= False
-        )
+        # OIDC discovery happens once per process; the app is cached and reused
+        return get_confidential_client(authority, validate_authority=False)
     except (requests.exceptions.ConnectionError, Authority.UnknownAuthority):
         current_app.logger.warning("⚠️ MSAL authority discovery failed—running in offline mode")
         # Return a dummy app with no-ops for get_authorization_request_url / acquire_token...
@@ -55,7 +50,8 @@ def get_or_create_user(profile: dict, token_result: dict) -> User:
     ms_id = token_result.get("id_token_claims", {}).get("oid") or profile["id"]
     user = User.query.filter_by(ms_id=ms_id).first()
 
-    expires_at = datetime.utcfromtimestamp(time.time() + int(token_result.get("expires_in", 3600)))
+    expires_ts = time.time() + int(token_result.get("expires_in", 3600))
+    expires_at = datetime.utcfromtimestamp(expires_ts)
 
     if not user:
         user = User(
@@ -68,13 +64,10 @@ def get_or_create_user(profile: dict, token_result: dict) -> User:
         )
         db.session.add(user)
         current_app.logger.info(f"👋 Created new user: {user.email}")
-    else:
-        user.access_token = token_result["access_token"]
-        user.refresh_token = token_result.get("refresh_token")
-        user.token_expires = expires_at
+        db.session.commit()
+    elif apply_tokens(user, token_result["access_token"], token_result.get("refresh_token"), expires_ts):
         current_app.logger.debug(f"🔁 Updated tokens for user: {user.email}")
-
-    db.session.commit()
+        db.session.commit()
     return user
 
 def refresh_token_if_needed(user: User) -> User:
@@ -86,8 +79,7 @@ def refresh_token_if_needed(user: User) -> User:
     )
     svc.ensure_valid_token()
 
-    user.access_token = svc.access_token
-    user.refresh_token = svc.refresh_token
-    user.token_expires = datetime.utcfromtimestamp(svc.token_expires)
-    db.session.commit()
+    # only write when the refresh actually produced new tokens
+    if apply_tokens(user, svc.access_token, svc.refresh_token, svc.token_expires):
+        db.session.commit()
     return user
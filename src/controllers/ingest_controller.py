@@ -1,17 +1,28 @@
-import threading
 import tempfile
 import os
-import hashlib
-from datetime import datetime
 from dateutil.parser import parse as parse_datetime
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from flask import current_app
 from src.services.microsoft_graph import MicrosoftGraphService, OneDriveServiceError
-from src.services.parser import parse_stream
-from src.services.elastic_service import bulk_index_documents, get_indexed_ids_and_hashes
-from src.models.document_model import Document
+from src.utils.auth_utils import apply_tokens
+from src.services.artifact_store import cached_text, get_text
+from src.services.folder_cache import folder_cache
+from src.services.near_duplicates import assign_clusters, signature_bytes
+from src.services.vector_index import delete_vectors, index_documents, vector_index_enabled
+from src.services.parser import is_supported, parse_in_worker, parse_stream
+from src.services.elastic_service import (
+    bulk_index_documents,
+    get_indexed_ids_and_hashes,
+    update_indexed_metadata
+)
+from src.services.change_detection import content_unchanged, item_fingerprint, provider_sha256
+from src.services.document_service import get_document_states, upsert_documents
 from src.models.user_model import SyncStatus, User
 from src.models import db
+from src.models.job_model import JobPriority
+from src.tasks.scheduler import enqueue_job, update_job_progress
+from src.tasks.ingest_tasks import SYNC_USER
+from src.services.sync_progress import SyncProgress, start_progress, finish_progress
 
 
 # Override temp directory (use app config or fallback)
@@ -20,14 +31,23 @@ def _init_tempdir():
     tempfile.tempdir = temp_dir
 
 
-def ingest_user_onedrive_files(user: User):
+def ingest_user_onedrive_files(user: User, job_id: int = None):
     """
-    Fetch and index changed or new .docx/.txt files for a given user.
+    Fetch and index changed or new files of any registered format for a given user.
     Performs a full walk on first run and incremental on subsequent runs, in parallel.
     """
     app = current_app._get_current_object()
-    logger = app.logger
 
+    persist = (lambda snap: update_job_progress(job_id, **snap)) if job_id is not None else None
+    progress = start_progress(user.id, job_id, persist)
+    try:
+        _ingest_user_onedrive_files(app, user, progress)
+    finally:
+        finish_progress(user.id)
+
+
+def _ingest_user_onedrive_files(app, user: User, progress: SyncProgress):
+    logger = app.logger
     logger.info(f"🔍 DEBUG: Starting ingestion for user {user.id}")
 
     # ─── 1) Build & refresh the Graph service ONCE ───
@@ -44,17 +64,16 @@ def ingest_user_onedrive_files(user: User):
         logger.error(f"🔍 DEBUG: Failed to initialize Graph service: {e}")
         raise
 
-    # persist refreshed tokens
-    user.access_token = svc.access_token
-    user.refresh_token = svc.refresh_token
-    user.token_expires = datetime.utcfromtimestamp(svc.token_expires)
-    db.session.commit()
+    # persist refreshed tokens (no-op when they didn't change)
+    if apply_tokens(user, svc.access_token, svc.refresh_token, svc.token_expires):
+        db.session.commit()
 
     # detect first run vs incremental
     start_link = user.delta_link
     first_run = (start_link is None)
 
     # fetch changes
+    progress.set_stage("listing")
     try:
         changed_files, new_delta = svc.list_delta(start_link)
         logger.info(f"🔍 DEBUG: Found {len(changed_files)} changes (first_run: {first_run})")
@@ -66,24 +85,38 @@ def ingest_user_onedrive_files(user: User):
     user.delta_link = new_delta
     db.session.commit()
 
+    # browse listings of folders touched by these changes are stale now
+    folder_cache.invalidate_items(user.id, changed_files)
+
+    deleted_ids = [i["id"] for i in changed_files if "deleted" in i]
+    if deleted_ids and vector_index_enabled():
+        delete_vectors(user.id, deleted_ids)
+
     if not changed_files:
         logger.info("🔍 DEBUG: No changes found; exiting")
+        progress.set_stage("done")
         return
 
+    progress.set("discovered", sum(1 for i in changed_files if is_supported(i.get("name", ""))))
+    progress.set_stage("downloading")
+
     # preload existing docs and hashes
-    existing_docs = {doc.file_id: doc for doc in Document.query.filter_by(user_id=user.id)}
+    existing_docs = get_document_states(user.id)
     _, es_hashes = get_indexed_ids_and_hashes(user.id)
     all_hashes = {d.content_hash for d in existing_docs.values()}.union(es_hashes)
 
+    use_workers = app.config.get("PARSER_USE_PROCESS_POOL", False)
+    near_dups = app.config.get("NEAR_DUP_ENABLED", True)
     docs_to_index = []
     docs_to_save = []  # NEW: Store document data for database operations
+    meta_updates = []  # skipped downloads whose metadata still changed
     skipped = 0
 
     def process_item(item):
         # FIXED: Remove database operations from threads
         with app.app_context():
             name = item.get("name", "").lower()
-            if not (name.endswith(".docx") or name.endswith(".txt")):
+            if not is_supported(name):
                 return None, 0
 
             fid = item["id"]
@@ -91,18 +124,62 @@ def ingest_user_onedrive_files(user: User):
             modified_at = parse_datetime(item.get("lastModifiedDateTime")) if item.get("lastModifiedDateTime") else None
 
             existing = existing_docs.get(fid)
-            if not first_run and existing and existing.modified_at == modified_at:
+            fingerprint = item_fingerprint(item)
+            meta_row = {
+                "file_id": fid,
+                "filename": item["name"],
+                "content_hash": existing.content_hash if existing else None,
+                "modified_at": modified_at,
+                "user_id": user.id,
+                "source": "onedrive",
+                "web_url": item.get("webUrl"),
+                "size": item.get("size"),
+                "created_at": created_at,
+                **fingerprint,
+            }
+
+            # 1) metadata alone says the bytes are unchanged: no download
+            if content_unchanged(item, existing, modified_at):
+                progress.incr("skipped")
+                if existing.filename != item["name"] or existing.ctag != fingerprint["ctag"]:
+                    return None, meta_row, 1
                 return None, 1
 
-            try:
-                content = svc.fetch_file_content(fid)
-                h = hashlib.sha256(content).hexdigest()
-                if not first_run and h in all_hashes:
-                    return None, 1
+            # 2) provider SHA-256 matches content we already hold: same outcome as
+            #    downloading and hashing below, without the download
+            sha = provider_sha256(item)
+            if sha and not first_run and sha in all_hashes:
+                progress.incr("skipped")
+                if existing and existing.content_hash == sha:
+                    return None, meta_row, 1
+                return None, 1
 
-                text = parse_stream(name, content).strip()
+            spool = None
+            try:
+                # 3) the same bytes were extracted before (any user or sync): no download, no parse
+                text = get_text(sha) if sha else None
+                if text is not None:
+                    h = sha
+                else:
+                    spool, h, nbytes = svc.download_to_spool(fid)
+                    progress.incr("downloaded")
+                    progress.add_bytes(nbytes)
+                    if not first_run and h in all_hashes:
+                        progress.incr("skipped")
+                        if existing and existing.content_hash == h:
+                            return None, {**meta_row, "content_hash": h}, 1
+                        return None, 1
+
+                    def extract():
+                        if use_workers:
+                            return parse_in_worker(name, spool.read()).strip()
+                        return parse_stream(name, spool).strip()
+
+                    text = cached_text(h, extract)
                 if not text:
+                    progress.incr("skipped")
                     return None, 1
+                progress.incr("parsed")
 
                 payload = {
                     "user_id": user.id,
@@ -128,9 +205,10 @@ def ingest_user_onedrive_files(user: User):
                     "web_url": item.get("webUrl"),
                     "size": item.get("size"),
                     "created_at": created_at,
-                    "is_new": existing is None,
-                    "existing_doc": existing
+                    **fingerprint,
                 }
+                if near_dups:
+                    doc_data["minhash"] = signature_bytes(text)
 
                 tmp = os.path.join(tempfile.gettempdir(), f"parsed_user_{user.id}_{fid}.txt")
                 if os.path.exists(tmp):
@@ -143,21 +221,30 @@ def ingest_user_onedrive_files(user: User):
 
             except OneDriveServiceError as e:
                 logger.error(f"OneDrive error on {name}: {e}")
+                progress.incr("failed")
                 return None, None, 0
             except Exception as e:
                 logger.warning(f"⚠️ Failed processing {name}: {e}")
+                progress.incr("failed")
                 return None, None, 0
+            finally:
+                if spool is not None:
+                    spool.close()
 
     # parallelize processing
     logger.info(f"🔍 DEBUG: Starting parallel processing of {len(changed_files)} files")
     with ThreadPoolExecutor(max_workers=8) as pool:
         futures = [pool.submit(process_item, item) for item in changed_files]
         for future in as_completed(futures):
+            progress.flush()
             result = future.result()
             if len(result) == 3:  # payload, doc_data, skip_flag
                 payload, doc_data, skip_flag = result
                 if skip_flag:
                     skipped += skip_flag
+                    if doc_data:  # unchanged content, refreshed metadata
+                        docs_to_save.append(doc_data)
+                        meta_updates.append(doc_data)
                 elif payload and doc_data:
                     docs_to_index.append(payload)
                     docs_to_save.append(doc_data)
@@ -167,84 +254,50 @@ def ingest_user_onedrive_files(user: User):
                 if skip_flag:
                     skipped += skip_flag
 
-    # FIXED: Do all database operations in main thread
+    progress.set_stage("saving")
+
+    if near_dups:
+        assign_clusters(user.id, [row for row in docs_to_save if "minhash" in row])
+
+    # FIXED: Do all database operations in main thread, as batched upserts
     logger.info(f"🔍 DEBUG: Saving {len(docs_to_save)} documents to database")
-    for doc_data in docs_to_save:
-        if doc_data["is_new"]:
-            # Create new document
-            new_doc = Document(
-                file_id=doc_data["file_id"],
-                filename=doc_data["filename"],
-                content_hash=doc_data["content_hash"],
-                modified_at=doc_data["modified_at"],
-                user_id=doc_data["user_id"],
-                source=doc_data["source"],
-                web_url=doc_data["web_url"],
-                size=doc_data["size"],
-                created_at=doc_data["created_at"]
-            )
-            db.session.add(new_doc)
-            logger.info(f"🔍 DEBUG: Added new document: {doc_data['filename']}")
-        else:
-            # Update existing document
-            existing = doc_data["existing_doc"]
-            existing.filename = doc_data["filename"]
-            existing.content_hash = doc_data["content_hash"]
-            existing.modified_at = doc_data["modified_at"]
-            existing.web_url = doc_data["web_url"]
-            existing.size = doc_data["size"]
-            logger.info(f"🔍 DEBUG: Updated existing document: {doc_data['filename']}")
-
-    # Commit all database changes
-    db.session.commit()
+    upsert_documents(docs_to_save)
     logger.info(f"🔍 DEBUG: Database commit completed for {len(docs_to_save)} documents")
 
-    # Verify database save
-    doc_count = Document.query.filter_by(user_id=user.id).count()
-    logger.info(f"🔍 DEBUG: Total documents in database for user {user.id}: {doc_count}")
+    if meta_updates:
+        update_indexed_metadata(meta_updates, user.id)
 
     logger.info(f"✔️ Sync done: indexed {len(docs_to_index)}, skipped {skipped}")
 
     if docs_to_index:
+        progress.set_stage("indexing")
         logger.info(f"🔍 DEBUG: Bulk indexing {len(docs_to_index)} documents")
-        bulk_index_documents(docs_to_index, user.id)
+        result = bulk_index_documents(docs_to_index, user.id)
+        progress.set("indexed", result.indexed)
+        if result.failures:
+            progress.incr("failed", len(result.failures))
+            for failure in result.failures[:10]:
+                logger.warning(f"⚠️ Not indexed {failure['file_id']}: {failure['status']} {failure['error']}")
         logger.info("✅ Bulk indexing complete")
+
+        if vector_index_enabled():
+            failed_ids = {f["file_id"] for f in result.failures}
+            try:
+                index_documents(user.id, [
+                    (d["file_id"], d["content"], d["content_hash"])
+                    for d in docs_to_index if d["file_id"] not in failed_ids
+                ])
+            except Exception as e:
+                logger.warning(f"⚠️ ANN index update failed for user {user.id}: {e}")
     else:
         logger.info("📭 Nothing new to index")
+    progress.set_stage("done")
 
 
-def start_user_ingestion_async(user_id: int):
-    app = current_app._get_current_object()
-    _init_tempdir()
-    logger = app.logger
+def start_user_ingestion_async(user_id: int, priority=JobPriority.INTERACTIVE):
+    """Queue a delta sync for the user; a sync already waiting absorbs the request."""
+    logger = current_app.logger
     logger.info(f"🚀 DEBUG: start_user_ingestion_async called for user {user_id}")
-
-    def runner():
-        logger.info(f"🔍 DEBUG: Background thread started for user {user_id}")
-        with app.app_context():
-            fresh = db.session.get(User, user_id)
-            if not fresh:
-                logger.warning(f"🔍 DEBUG: User {user_id} not found; skipping")
-                return
-
-            fresh.sync_status = SyncStatus.RUNNING
-            fresh.sync_updated_at = datetime.utcnow()
-            db.session.commit()
-            logger.info(f"🔍 DEBUG: Set sync status to RUNNING for user {user_id}")
-
-            try:
-                ingest_user_onedrive_files(fresh)
-                fresh.sync_status = SyncStatus.DONE
-                fresh.sync_updated_at = datetime.utcnow()
-                db.session.commit()
-                logger.info(f"🔍 DEBUG: Ingestion completed successfully for user {user_id}")
-            except Exception as e:
-                logger.error(f"🔍 DEBUG: Ingestion failed for user {user_id}: {e}")
-                fresh = db.session.get(User, user_id)
-                fresh.sync_status = SyncStatus.ERROR
-                fresh.sync_updated_at = datetime.utcnow()
-                db.session.commit()
-
-    thread = threading.Thread(target=runner, daemon=True)
-    thread.start()
-    logger.info(f"🔍 DEBUG: Background thread started for user {user_id}")
\ No newline at end of file
+    job = enqueue_job(SYNC_USER, user_id, priority=priority)
+    logger.info(f"🔍 DEBUG: Sync job #{job.id} queued for user {user_id}")
+    return job
@@ -1,17 +1,105 @@
-from src.services.elastic_service import search_bm25
+import threading
+import time
+from dataclasses import dataclass, field
+
+from flask import current_app
+
+from src.services.elastic_service import (
+    get_documents_by_file_ids, get_search_index, search_bm25, search_bm25_after
+)
 from src.services.expansion_service import expand_query
-from src.config.search_config import BM25_TOP_K, SECOND_BM25_TOP_K, EXPANSION_K, FINAL_RESULTS_K, EMBEDDING_TOP_K
+from src.config.search_config import (
+    BM25_TOP_K, SECOND_BM25_TOP_K, EXPANSION_K, FINAL_RESULTS_K, EMBEDDING_TOP_K, VECTOR_TOP_K,
+    RERANK_WINDOW, SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL, SEARCH_MAX_PAGE
+)
 from src.services.crossencoder_service import rerank_crossencoder
-from src.services.embedding_service import rerank_biencoder
+from src.services.embedding_service import encode_query, rerank_biencoder
 from src.services.text_preprocessing import preprocess_for_encoder
+from src.services.document_service import get_index_generation
+from src.services.near_duplicates import collapse_near_duplicates
+from src.services.query_cache import LRUCache, normalize_query
+from src.services.vector_index import search_vectors, vector_index_enabled
 
 
-def full_search_pipeline(user_query: str, user_id: int):
+def ann_candidates(encoder_ready_query: str, user_id: int, exclude: set) -> list:
+    """Docs from the user's ANN index that BM25 did not already return."""
+    q_emb = encode_query(encoder_ready_query).float().cpu().numpy()
+    hits = search_vectors(user_id, q_emb, k=VECTOR_TOP_K)
+    new_ids = [fid for fid, _ in hits if fid not in exclude]
+    return get_documents_by_file_ids(user_id, new_ids)
+
+
+def rerank_window(encoder_ready_query: str, docs: list) -> list:
+    """
+    Full ordering of a candidate window: the bi-encoder orders every doc, the
+    cross-encoder reorders its top EMBEDDING_TOP_K (it scores all of them anyway).
+    """
+    biencoder_all = rerank_biencoder(encoder_ready_query, docs, top_k=len(docs))
+    head = rerank_crossencoder(encoder_ready_query, biencoder_all[:EMBEDDING_TOP_K], top_k=EMBEDDING_TOP_K)
+    return head + biencoder_all[EMBEDDING_TOP_K:]
+
+
+# ─── Ranked results (cached per user and query) ──────────────────────────────
+
+@dataclass
+class RankedSearch:
+    """Reranked ordering of a query's results, extended window by window on demand."""
+    user_id: int
+    bm25_query: str
+    encoder_query: str
+    ranked: list = field(default_factory=list)
+    cursor: dict = None                       # BM25 search_after position; None = exhausted
+    seen: set = field(default_factory=set)
+    clusters: dict = field(default_factory=dict)
+    created_at: float = field(default_factory=time.time)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def add_window(self, candidates: list):
+        fresh = [d for d in candidates if d["id"] not in self.seen]
+        self.seen.update(d["id"] for d in candidates)
+        # one representative per near-duplicate cluster goes to the rerankers
+        kept = collapse_near_duplicates(self.user_id, fresh, self.clusters)
+        current_app.logger.debug(f"🧬 Near-duplicates collapsed: {len(fresh) - len(kept)}")
+        if kept:
+            self.ranked.extend(rerank_window(self.encoder_query, kept))
+
+    def extend(self):
+        """Rerank the next BM25 window (search_after) onto the ordering."""
+        window, self.cursor = search_bm25_after(
+            self.bm25_query, user_id=self.user_id, top_k=RERANK_WINDOW, cursor=self.cursor
+        )
+        self.add_window(window)
+
+    def page(self, page: int, per_page: int) -> tuple:
+        """
+        (items, has_more) of a 1-based page (at most SEARCH_MAX_PAGE), reranking
+        deeper windows lazily. has_more is only reported once a result past the
+        page exists: a further BM25 window may be empty or collapse into
+        near-duplicates.
+        """
+        page = min(max(page, 1), SEARCH_MAX_PAGE)
+        end = page * per_page
+        needed = end + 1 if page < SEARCH_MAX_PAGE else end
+        with self.lock:
+            while len(self.ranked) < needed and self.cursor is not None:
+                self.extend()
+            return self.ranked[end - per_page:end], page < SEARCH_MAX_PAGE and len(self.ranked) > end
+
+
+# Per process: with several web workers a later page may land on a worker
+# without the entry and rerun the pipeline (the ordering it builds is cached
+# there from then on). Entries are keyed by the user's index generation, so any
+# index write (sync, upload, webhook) in any process retires them.
+_searches = LRUCache(SEARCH_CACHE_SIZE)
+
+
+def run_search(user_query: str, user_id: int) -> RankedSearch:
+    """Query expansion, first BM25 (+ ANN) window and its reranked ordering."""
 
     top_500 = search_bm25(user_query, user_id=user_id, top_k=BM25_TOP_K)
     print(f"[DEBUG] BM25_TOP_K = {BM25_TOP_K}")
 
-    print(f"[DEBUG] Index: index_user_{user_id}")
+    print(f"[DEBUG] Index: {get_search_index(user_id)}")
     print(f"[DEBUG] Original user query: '{user_query}'")
     print(f"[DEBUG] Retrieved top_500: {len(top_500)} docs" if top_500 else "[DEBUG] No top docs — returning original query.")
 
@@ -20,12 +108,35 @@ def full_search_pipeline(user_query: str, user_id: int):
     print(f"[DEBUG] expanded query (raw): {expanded_encoder_query}")
     print(f"[DEBUG] expanded query (bm25-ready): {expanded_bm25_query}")
 
-    top_200 = search_bm25(expanded_bm25_query, user_id=user_id, top_k=SECOND_BM25_TOP_K)
+    top_200, cursor = search_bm25_after(expanded_bm25_query, user_id=user_id, top_k=SECOND_BM25_TOP_K)
 
     encoder_ready_query = preprocess_for_encoder(expanded_encoder_query)
     print(f"[DEBUG] encoder-ready query: {encoder_ready_query}")
 
-    biencoder_top = rerank_biencoder(encoder_ready_query, top_200, top_k=EMBEDDING_TOP_K)
-    reranked = rerank_crossencoder(encoder_ready_query, biencoder_top, top_k=FINAL_RESULTS_K)
+    if vector_index_enabled():
+        extra = ann_candidates(encoder_ready_query, user_id, {d["id"] for d in top_200})
+        print(f"[DEBUG] ANN candidates added: {len(extra)}")
+        top_200 = top_200 + extra
+
+    search = RankedSearch(user_id, expanded_bm25_query, encoder_ready_query, cursor=cursor)
+    search.add_window(top_200)
+    return search
+
 
-    return reranked
+def get_ranked_search(user_query: str, user_id: int) -> RankedSearch:
+    """The cached ordering for (user, index generation, query) while fresh, else a new pipeline run."""
+    key = (user_id, get_index_generation(user_id), normalize_query(user_query))
+    search = _searches.get(key, None)
+    if search is None or time.time() - search.created_at > SEARCH_CACHE_TTL:
+        search = run_search(user_query, user_id)
+        _searches.put(key, search)
+    return search
+
+
+def search_page(user_query: str, user_id: int, page: int = 1, per_page: int = FINAL_RESULTS_K) -> tuple:
+    """(results, has_more) for one page; browsing pages costs one pipeline run."""
+    return get_ranked_search(user_query, user_id).page(page, per_page)
+
+
+def full_search_pipeline(user_query: str, user_id: int):
+    return search_page(user_query, user_id)[0]
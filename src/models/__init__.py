@@ -4,3 +4,5 @@ db = SQLAlchemy()
 # Re-export models here
 from .user_model import User
 from .document_model import Document  # if you have this
+from .subscription_model import Subscription
+from .job_model import Job
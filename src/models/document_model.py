@@ -3,12 +3,23 @@ from src.models import db
 
 class Document(db.Model):
     __tablename__ = "documents"
+    __table_args__ = (
+        # file ids are unique per drive, not across users (shared files)
+        db.UniqueConstraint("user_id", "file_id", name="uq_documents_user_file"),
+        db.Index("ix_documents_user_content_hash", "user_id", "content_hash"),
+        db.Index("ix_documents_user_dup_cluster", "user_id", "dup_cluster"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(255), nullable=False)
-    file_id = db.Column(db.String(128), unique=True, nullable=False)
+    file_id = db.Column(db.String(128), nullable=False)
     source = db.Column(db.String(20))  # e.g. "onedrive"
     content_hash = db.Column(db.String(64))  # SHA256 or similar
+    provider_hash = db.Column(db.String(128))  # Graph file.hashes, e.g. "quickXorHash:..."
+    ctag = db.Column(db.String(256))  # Graph cTag, changes only with content
+    etag = db.Column(db.String(256))  # Graph eTag, changes with any metadata
+    minhash = db.Column(db.LargeBinary)  # MinHash signature of the text (near-duplicate detection)
+    dup_cluster = db.Column(db.String(128))  # file_id of the near-duplicate group's first document
     indexed = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     modified_at = db.Column(db.DateTime)
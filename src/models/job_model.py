@@ -0,0 +1,72 @@
+# src/models/job_model.py
+
+import json
+from datetime import datetime
+from enum import Enum, IntEnum
+from sqlalchemy import Enum as SqlEnum
+from src.models import db
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    ERROR = "error"
+
+
+class JobPriority(IntEnum):
+    # lower runs first
+    INTERACTIVE = 0
+    SYNC = 10
+    BACKFILL = 20
+
+
+class Job(db.Model):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # at most one waiting job per (kind, user); enqueue() relies on it
+        db.Index(
+            "uq_jobs_queued_kind_user", "kind", "user_id", unique=True,
+            postgresql_where=db.text("status = 'QUEUED'"),
+            sqlite_where=db.text("status = 'QUEUED'")
+        ),
+    )
+
+    id           = db.Column(db.Integer, primary_key=True)
+    kind         = db.Column(db.String(64), nullable=False)
+    user_id      = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
+    priority     = db.Column(db.Integer, nullable=False, default=JobPriority.SYNC)
+    status       = db.Column(SqlEnum(JobStatus), nullable=False, default=JobStatus.QUEUED, index=True)
+    payload      = db.Column(db.Text)   # JSON arguments for the handler
+    progress     = db.Column(db.Text)   # JSON progress snapshot
+    error        = db.Column(db.Text)
+    attempts     = db.Column(db.Integer, nullable=False, default=0)
+    created_at   = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at   = db.Column(db.DateTime)
+    finished_at  = db.Column(db.DateTime)
+    owner        = db.Column(db.String(128))   # consumer process running the job
+    heartbeat_at = db.Column(db.DateTime)      # lease: renewed while the job runs
+
+    def __repr__(self):
+        return f"<Job {self.id} {self.kind} user={self.user_id} {self.status}>"
+
+    @property
+    def args(self) -> dict:
+        return json.loads(self.payload) if self.payload else {}
+
+    @property
+    def progress_data(self) -> dict:
+        return json.loads(self.progress) if self.progress else {}
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "priority": self.priority,
+            "progress": self.progress_data,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
@@ -29,6 +29,8 @@ class User(db.Model, UserMixin):      # ← add UserMixin here
     # sync tracking
     sync_status      = db.Column(SqlEnum(SyncStatus), default=SyncStatus.IDLE)
     sync_updated_at  = db.Column(db.DateTime)
+    # bumped on every index write; part of the search result cache key
+    index_generation = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
     def __repr__(self):
         return f"<User {self.email}>"
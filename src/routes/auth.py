@@ -13,6 +13,7 @@ from src.controllers.auth_controller import (
     refresh_token_if_needed
 )
 from src.services.microsoft_graph import MicrosoftGraphService
+from src.services.subscription_service import ensure_user_subscription
 from src.utils.auth_utils import get_non_reserved_scopes
 from src.models import db
 
@@ -67,6 +68,12 @@ def callback():
     # refresh tokens if needed
     user = refresh_token_if_needed(user)
 
+    # subscribe to drive changes so sync is push-driven instead of polled
+    try:
+        ensure_user_subscription(user)
+    except Exception as e:
+        current_app.logger.warning(f"⚠️ Could not set up change notifications for user {user.id}: {e}")
+
     # log in
     login_user(user)
     session.pop("sync_started", None)
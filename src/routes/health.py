@@ -0,0 +1,28 @@
+# src/routes/health.py
+
+from flask import Blueprint, jsonify
+from src.services.model_registry import model_status
+
+health_bp = Blueprint("health", __name__)
+
+
+@health_bp.route("/healthz")
+def healthz():
+    """Liveness: the process is up and serving requests."""
+    return jsonify({"status": "ok"})
+
+
+@health_bp.route("/readyz")
+def readyz():
+    """Readiness: which models are warm and whether Elasticsearch answers."""
+    from src.services.elastic_service import get_es
+
+    models = model_status()
+    try:
+        es_ok = bool(get_es().ping())
+    except Exception:
+        es_ok = False
+
+    ready = es_ok and all(m["warm"] for m in models.values())
+    payload = {"ready": ready, "elasticsearch": es_ok, "models": models}
+    return jsonify(payload), 200 if ready else 503
@@ -4,9 +4,13 @@ from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
 
 from src.controllers.ingest_controller import start_user_ingestion_async
-from src.controllers.search_controller import full_search_pipeline
+from src.controllers.search_controller import search_page
+from src.config.search_config import SEARCH_MAX_PAGE
 from src.services.microsoft_graph import MicrosoftGraphService, OneDriveServiceError
 from src.services.elastic_service import ingest_single_onedrive_file
+from src.services.folder_cache import folder_cache, list_folder
+from src.services.subscription_service import get_active_subscription
+from src.models.user_model import SyncStatus
 
 files_bp = Blueprint("files", __name__, url_prefix="/files")
 
@@ -23,6 +27,15 @@ def get_graph_service_for_user() -> MicrosoftGraphService:
     return svc
 
 
+def _push_sync_active(user) -> bool:
+    """True when a live Graph subscription drives incremental sync for this user."""
+    return (
+        user.delta_link is not None
+        and user.sync_status != SyncStatus.ERROR
+        and get_active_subscription(user.id) is not None
+    )
+
+
 @files_bp.route("/")
 def index():
     return redirect(url_for("files.browse"))
@@ -62,13 +75,20 @@ def browse():
                     content=content,
                     parent_folder_id=folder_id
                 )
-                ingest_single_onedrive_file(user, new_item)
+                # index from the bytes we just uploaded instead of downloading them back
+                ingest_single_onedrive_file(user, new_item, content_bytes=content, svc=svc)
+                folder_cache.invalidate_items(user.id, [new_item])
                 flash(f"Uploaded & indexed {filename} successfully.", "success")
             except OneDriveServiceError as e:
                 current_app.logger.error("Upload failed: %s", e)
                 flash(f"Upload failed: {e}", "danger")
 
-    # 2) One-time background delta-sync on first browse after login
+    # 2) One-time background delta-sync on first browse after login,
+    #    unless change notifications already keep this user in sync
+    if not session.get("sync_started") and _push_sync_active(user):
+        current_app.logger.info(f"📡 Change notifications active for user {user.id}; skipping delta poll")
+        session["sync_started"] = True
+
     if not session.get("sync_started"):
         current_app.logger.info(f"▶️ Enqueueing background delta-sync for user {user.id}")
         current_app.logger.info(f"🔍 DEBUG: About to call start_user_ingestion_async({user.id})")
@@ -88,17 +108,16 @@ def browse():
     # 3) Decide: full-text search or folder listing
     q = request.args.get("q", "").strip()
     folder_id = request.args.get("folder_id")
+    pages = max(request.args.get("pages", 1, type=int), 1)
+    page = min(max(request.args.get("page", 1, type=int), 1), SEARCH_MAX_PAGE)
+    has_more = False
 
     if q:
-        current_app.logger.info(f"User {user.id} searching for '{q}'")
-        items = full_search_pipeline(user_query=q, user_id=user.id)
+        current_app.logger.info(f"User {user.id} searching for '{q}' (page {page})")
+        items, has_more = search_page(user_query=q, user_id=user.id, page=page)
     else:
         try:
-            items = (
-                svc.list_children(folder_id)
-                if folder_id
-                else svc.list_root_files()
-            )
+            items, has_more = list_folder(svc, user.id, folder_id, pages=pages)
         except OneDriveServiceError as e:
             current_app.logger.error("OneDrive list error: %s", e)
             items = []
@@ -107,7 +126,10 @@ def browse():
         "onedrive_browser.html",
         items=items,
         folder_id=folder_id,
-        search_query=q
+        search_query=q,
+        pages=pages,
+        page=page,
+        has_more=has_more
     )
 
 
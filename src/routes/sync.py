@@ -1,22 +1,79 @@
 # routes/sync.py
 
-from flask import Blueprint, session, jsonify
-from src.models.user_model import User
+import json
+import time
+from flask import Blueprint, jsonify, Response, stream_with_context
+from flask_login import current_user
 from src.models import db
+from src.models.job_model import JobStatus
+from src.models.user_model import User
+from src.services.sync_progress import get_live_progress
+from src.tasks.scheduler import get_latest_job
+from src.tasks.ingest_tasks import SYNC_USER
 
 sync_bp = Blueprint("sync", __name__, url_prefix="/api/sync")
 
+STREAM_INTERVAL = 1.0     # seconds between SSE events
+# Each open stream holds a worker thread, so a response only lasts a few
+# events; EventSource reconnects on its own after STREAM_RETRY_MS.
+STREAM_MAX_SECONDS = 5
+STREAM_RETRY_MS = 1000
+
+
+def _status_payload(user) -> dict:
+    job = get_latest_job(user.id, kind=SYNC_USER)
+    progress = get_live_progress(user.id)
+    if progress is None and job is not None:
+        # sync running in another process (or finished): use the persisted snapshot
+        progress = job.progress_data or None
+
+    return {
+        "status": user.sync_status,
+        "updated_at": user.sync_updated_at.isoformat() if user.sync_updated_at else None,
+        "job": job.to_dict() if job else None,
+        "progress": progress
+    }
+
+
 @sync_bp.route("/status", methods=["GET"])
 def get_sync_status():
-    user_id = session.get("user_id")
-    if not user_id:
+    if not current_user.is_authenticated:
         return jsonify({"error": "Unauthorized"}), 401
 
-    user = User.query.get(user_id)
-    if not user:
-        return jsonify({"error": "User not found"}), 404
+    return jsonify(_status_payload(current_user))
 
-    return jsonify({
-        "status": user.sync_status,
-        "updated_at": user.sync_updated_at.isoformat() if user.sync_updated_at else None
-    })
+
+@sync_bp.route("/stream", methods=["GET"])
+def stream_sync_status():
+    """
+    Server-sent events variant of /status. Each response is short-lived (the
+    browser reconnects); a final `done` event tells the client to close once
+    the sync job settles.
+    """
+    if not current_user.is_authenticated:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    user_id = current_user.id
+
+    def events():
+        yield f"retry: {STREAM_RETRY_MS}\n\n"
+        deadline = time.time() + STREAM_MAX_SECONDS
+        while time.time() < deadline:
+            user = db.session.get(User, user_id)
+            payload = _status_payload(user)
+            data = json.dumps(payload, default=str)
+
+            job = payload["job"]
+            if job is None or job["status"] in (JobStatus.DONE, JobStatus.ERROR):
+                yield f"event: done\ndata: {data}\n\n"
+                break
+            yield f"data: {data}\n\n"
+            # don't hold a stale identity map between polls
+            db.session.expire_all()
+            time.sleep(STREAM_INTERVAL)
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -6,8 +6,14 @@ from flask import Blueprint, request, current_app
 from src.models import db
 from src.models.user_model import User
 from src.models.document_model import Document  # Changed from File to Document
+from src.models.subscription_model import Subscription
+from src.models.job_model import JobPriority
+from src.controllers.ingest_controller import start_user_ingestion_async
 from src.services.microsoft_graph import MicrosoftGraphService
 from src.utils.auth_utils import refresh_token_if_needed
+from src.services.folder_cache import folder_cache
+from src.services.document_service import bump_index_generation
+from src.services.vector_index import delete_vectors, vector_index_enabled
 
 webhook_bp = Blueprint("webhook", __name__)
 
@@ -16,12 +22,12 @@ webhook_bp = Blueprint("webhook", __name__)
 def handle_graph_notification():
     """Handle Microsoft Graph webhook notifications for OneDrive changes"""
     
-    # Step 1: Handle validation request from Microsoft (GET request)
+    # Step 1: Handle validation request from Microsoft (sent as POST with a query param)
+    validation_token = request.args.get("validationToken")
+    if validation_token:
+        current_app.logger.info("✅ Webhook validation successful")
+        return validation_token, 200, {'Content-Type': 'text/plain'}
     if request.method == "GET":
-        validation_token = request.args.get("validationToken")
-        if validation_token:
-            current_app.logger.info("✅ Webhook validation successful")
-            return validation_token, 200, {'Content-Type': 'text/plain'}
         current_app.logger.error("❌ Missing validation token")
         return "Missing validation token", 400
     
@@ -47,36 +53,44 @@ def process_notification(notification):
     
     try:
         # Extract notification details
-        client_state = notification.get("clientState")  # This is user_id
-        resource = notification.get("resource")
+        sub_id = notification.get("subscriptionId")
+        client_state = notification.get("clientState")
+        resource = notification.get("resource") or ""
         change_type = notification.get("changeType")
         
         current_app.logger.info(
-            f"Processing notification: user={client_state}, "
+            f"Processing notification: subscription={sub_id}, "
             f"resource={resource}, change={change_type}"
         )
         
-        # Get the user
-        user = User.query.get(client_state)
+        # Resolve the user through the subscription and verify the shared secret
+        subscription = Subscription.query.filter_by(sub_id=sub_id).first()
+        if not subscription or subscription.client_state != client_state:
+            current_app.logger.warning(f"⚠️ Unknown subscription or clientState mismatch: {sub_id}")
+            return
+        
+        user = db.session.get(User, subscription.user_id)
         if not user:
-            current_app.logger.error(f"User not found: {client_state}")
+            current_app.logger.error(f"User not found: {subscription.user_id}")
             return
         
         # Refresh tokens if needed
         user = refresh_token_if_needed(user)
         
-        # Initialize Graph service
-        graph_service = MicrosoftGraphService(
-            access_token=user.access_token,
-            refresh_token=user.refresh_token,
-            token_expires=user.token_expires,
-            user_id=user.id
-        )
-        
         # Get the changed item details
         if "/items/" in resource:
+            # Initialize Graph service
+            graph_service = MicrosoftGraphService(
+                access_token=user.access_token,
+                refresh_token=user.refresh_token,
+                token_expires=user.token_expires,
+                user_id=user.id
+            )
             item_id = resource.split("/items/")[1]
             handle_item_change(graph_service, user, item_id, change_type)
+        else:
+            # OneDrive only says "something under the drive changed": pull the delta
+            start_user_ingestion_async(user.id, priority=JobPriority.SYNC)
         
     except Exception as e:
         current_app.logger.error(f"Error processing notification: {str(e)}")
@@ -93,6 +107,7 @@ def handle_item_change(graph_service, user, item_id, change_type):
             if not item:
                 current_app.logger.warning(f"Item not found: {item_id}")
                 return
+            folder_cache.invalidate_items(user.id, [item])
             
             # Check if it's a file (not a folder)
             if "file" in item:
@@ -101,6 +116,8 @@ def handle_item_change(graph_service, user, item_id, change_type):
                 sync_folder(user, item, graph_service)
         
         elif change_type == "deleted":
+            # parent unknown from the notification alone
+            folder_cache.invalidate_user(user.id)
             handle_deletion(user, item_id)
     
     except Exception as e:
@@ -174,6 +191,10 @@ def handle_deletion(user, item_id):
             db.session.delete(document)
             db.session.commit()
             current_app.logger.info(f"🗑️ Deleted document: {document.filename}")
+            bump_index_generation(user.id)
+
+        if vector_index_enabled():
+            delete_vectors(user.id, [item_id])
     
     except Exception as e:
         current_app.logger.error(f"Error handling deletion: {str(e)}")
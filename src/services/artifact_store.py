@@ -0,0 +1,193 @@
+# src/services/artifact_store.py
+#
+# Content-addressed cache of derived artifacts, keyed by the SHA-256 of a
+# file's bytes (Document.content_hash): extracted text, BM25-preprocessed
+# text and embeddings. Identical files across users, re-syncs and reindexes
+# then reuse the parsing/NLP work instead of repeating it.
+#
+# Kinds carry the version of whatever produced them (text-v{PARSER_VERSION},
+# bm25-v{PREPROCESSING_VERSION}, emb-{model}), so bumping a version just
+# misses the cache.
+#
+# Backends (ARTIFACT_STORE):
+#   disk                local directory, size-bounded, least-recently-used
+#                       entries evicted (mtime is touched on read)
+#   none                no caching
+#   package.module:Cls  any ArtifactStore subclass (e.g. a shared store);
+#                       built with Cls.from_config(app.config)
+
+import importlib
+import os
+import tempfile
+import threading
+import zlib
+
+import numpy as np
+from flask import current_app
+
+
+class ArtifactStore:
+    """Bytes blobs keyed by (content hash, kind)."""
+
+    @classmethod
+    def from_config(cls, config):
+        return cls()
+
+    def get(self, digest: str, kind: str):
+        return None
+
+    def put(self, digest: str, kind: str, data: bytes):
+        pass
+
+
+class DiskArtifactStore(ArtifactStore):
+    """root/{kind}/{digest[:2]}/{digest}; evicts oldest-used files past max_bytes."""
+
+    LOW_WATER = 0.9   # evict down to this fraction of max_bytes
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._size = None          # bytes on disk, scanned lazily
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config["ARTIFACT_STORE_DIR"], config["ARTIFACT_STORE_MAX_BYTES"])
+
+    def _path(self, digest: str, kind: str) -> str:
+        return os.path.join(self.root, kind, digest[:2], digest)
+
+    def get(self, digest: str, kind: str):
+        path = self._path(digest, kind)
+        try:
+            with open(path, "rb") as fh:
+                data = fh.read()
+            os.utime(path)
+            return data
+        except FileNotFoundError:
+            return None
+
+    def put(self, digest: str, kind: str, data: bytes):
+        path = self._path(digest, kind)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _files(self) -> list:
+        files = []
+        for dirpath, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+        return files
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._files())
+
+    def _evict(self):
+        # rescan: other processes share the directory
+        files = sorted(self._files())
+        total = sum(size for _, size, _ in files)
+        target = self.max_bytes * self.LOW_WATER
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+        self._size = total
+
+
+_BACKENDS = {"none": ArtifactStore, "disk": DiskArtifactStore}
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_artifact_store() -> ArtifactStore:
+    """Process-wide store configured by ARTIFACT_STORE."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                name = current_app.config.get("ARTIFACT_STORE", "disk")
+                if ":" in name:
+                    module, cls_name = name.split(":", 1)
+                    cls = getattr(importlib.import_module(module), cls_name)
+                else:
+                    cls = _BACKENDS[name]
+                _store = cls.from_config(current_app.config)
+    return _store
+
+
+# ─── Typed artifacts ─────────────────────────────────────────────────────────
+
+def _text_kind() -> str:
+    from src.services.parser import PARSER_VERSION
+    return f"text-v{PARSER_VERSION}"
+
+
+def _bm25_kind() -> str:
+    from src.services.text_preprocessing import PREPROCESSING_VERSION
+    return f"bm25-v{PREPROCESSING_VERSION}"
+
+
+def get_text(digest: str):
+    """Extracted text for a content hash ("" for files without text), or None."""
+    data = get_artifact_store().get(digest, _text_kind()) if digest else None
+    return zlib.decompress(data).decode("utf-8") if data is not None else None
+
+
+def put_text(digest: str, text: str):
+    if digest:
+        get_artifact_store().put(digest, _text_kind(), zlib.compress(text.encode("utf-8"), 1))
+
+
+def cached_text(digest: str, extract) -> str:
+    """Text for the hash from the store, else extract() and store it."""
+    text = get_text(digest)
+    if text is None:
+        text = extract()
+        put_text(digest, text)
+    return text
+
+
+def cached_bm25(digest: str, text: str) -> str:
+    """BM25-preprocessed text for the hash, computed from `text` on a miss."""
+    from src.services.text_preprocessing import preprocess_bm25_document
+
+    if not digest:
+        return preprocess_bm25_document(text)
+    store = get_artifact_store()
+    data = store.get(digest, _bm25_kind())
+    if data is not None:
+        return zlib.decompress(data).decode("utf-8")
+    tokens = preprocess_bm25_document(text)
+    store.put(digest, _bm25_kind(), zlib.compress(tokens.encode("utf-8"), 1))
+    return tokens
+
+
+def get_embedding(digest: str, model_key: str):
+    data = get_artifact_store().get(digest, f"emb-{model_key}") if digest else None
+    return np.frombuffer(data, dtype=np.float16).astype(np.float32) if data is not None else None
+
+
+def put_embedding(digest: str, model_key: str, vector):
+    if digest:
+        get_artifact_store().put(digest, f"emb-{model_key}", np.asarray(vector, dtype=np.float16).tobytes())
@@ -0,0 +1,45 @@
+# src/services/batching.py
+#
+# Length-bucketed batching for encoder inference. Inputs are sorted by
+# (estimated) token length and grouped so each batch stays under a token
+# budget (longest item x batch size), which keeps padding small: short
+# snippets are no longer padded to the longest document in one giant batch.
+# Outputs are returned in the original input order.
+
+
+def estimate_tokens(text: str, max_seq_length: int) -> int:
+    """Cheap WordPiece length estimate (~1.3 tokens per word + [CLS]/[SEP]), capped at truncation."""
+    return min(max_seq_length, int(len(text.split()) * 1.3) + 2)
+
+
+def length_buckets(lengths: list, token_budget: int, max_batch_size: int) -> list:
+    """Indices grouped into batches of similar length whose padded size fits the budget."""
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batches, current, longest = [], [], 0
+
+    for i in order:
+        longest_if_added = max(longest, lengths[i])
+        if current and (
+            longest_if_added * (len(current) + 1) > token_budget
+            or len(current) >= max_batch_size
+        ):
+            batches.append(current)
+            current, longest_if_added = [], lengths[i]
+        current.append(i)
+        longest = longest_if_added
+
+    if current:
+        batches.append(current)
+    return batches
+
+
+def run_bucketed(items: list, lengths: list, fn, token_budget: int, max_batch_size: int) -> list:
+    """
+    Call fn(batch_of_items) -> per-item outputs for each length bucket and
+    return all outputs in the order of `items`.
+    """
+    outputs = [None] * len(items)
+    for batch in length_buckets(lengths, token_budget, max_batch_size):
+        for i, out in zip(batch, fn([items[i] for i in batch])):
+            outputs[i] = out
+    return outputs
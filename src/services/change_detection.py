@@ -0,0 +1,53 @@
+# src/services/change_detection.py
+#
+# Decide from Graph metadata alone whether a drive item's content must be fetched.
+# Delta items carry `cTag` (changes only when content changes), `eTag` (changes on
+# any metadata change) and `file.hashes` (sha256Hash on personal drives,
+# quickXorHash on OneDrive for Business/SharePoint).
+
+# preference order when recording a provider hash
+HASH_KEYS = ("sha256Hash", "quickXorHash", "sha1Hash")
+
+
+def provider_hash(item: dict):
+    """Return the strongest provider hash as '<kind>:<value>', or None."""
+    hashes = (item.get("file") or {}).get("hashes") or {}
+    for key in HASH_KEYS:
+        if hashes.get(key):
+            return f"{key}:{hashes[key]}"
+    return None
+
+
+def provider_sha256(item: dict):
+    """The provider's SHA-256 of the raw bytes, lowercase (same form as Document.content_hash)."""
+    value = ((item.get("file") or {}).get("hashes") or {}).get("sha256Hash")
+    return value.lower() if value else None
+
+
+def item_fingerprint(item: dict) -> dict:
+    """Change-detection columns to store on a Document row."""
+    return {
+        "ctag": item.get("cTag"),
+        "etag": item.get("eTag"),
+        "provider_hash": provider_hash(item),
+    }
+
+
+def content_unchanged(item: dict, state, modified_at=None) -> bool:
+    """
+    True when the stored state proves the item's bytes haven't changed.
+    `state` is a Document row/tuple with ctag, provider_hash and modified_at.
+    """
+    if state is None:
+        return False
+
+    ctag = item.get("cTag")
+    if ctag and state.ctag:
+        return ctag == state.ctag
+
+    phash = provider_hash(item)
+    if phash and state.provider_hash:
+        return phash == state.provider_hash
+
+    # rows indexed before fingerprints were stored: fall back to the timestamp
+    return modified_at is not None and state.modified_at == modified_at
@@ -1,24 +1,44 @@
-from sentence_transformers import CrossEncoder
-import torch
-from src.config.search_config import CROSS_ENCODER_MODEL_PATH
-
-# Automatically use GPU if available
-device = "cuda" if torch.cuda.is_available() else "cpu"
-
-# Load CrossEncoder from local path with correct device
-model = CrossEncoder(CROSS_ENCODER_MODEL_PATH, device=device)
-model.half()
-model.eval()
-
-def rerank_crossencoder(query, docs, top_k=5, batch_size=1024):
+from src.config.search_config import (
+    CROSS_ENCODER_MAX_SEQ_LENGTH,
+    CROSS_ENCODER_MODEL_PATH,
+    CROSS_ENCODER_TOKEN_BUDGET,
+    ENCODER_MAX_BATCH_SIZE
+)
+from src.services.batching import estimate_tokens, run_bucketed
+from src.services.model_registry import get_model, register_model
+
+
+@register_model("crossencoder")
+def _load_crossencoder():
+    import torch
+    from sentence_transformers import CrossEncoder
+
+    # Automatically use GPU if available
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+
+    # Load CrossEncoder from local path with correct device
+    model = CrossEncoder(CROSS_ENCODER_MODEL_PATH, device=device, max_length=CROSS_ENCODER_MAX_SEQ_LENGTH)
+    model.half()
+    model.eval()
+    return model
+
+def rerank_crossencoder(query, docs, top_k=5, batch_size=ENCODER_MAX_BATCH_SIZE):
     print(f"🔍 Reranking using query: {query}")
     if not docs:
         return []
 
     pairs = [(query, doc["content"]) for doc in docs]
 
-    # Predict relevance scores with appropriate batch size
-    scores = model.predict(pairs, batch_size=batch_size)
+    # Predict relevance scores in length buckets (short pairs aren't padded to the longest)
+    model = get_model("crossencoder")
+    lengths = [estimate_tokens(f"{q} {d}", CROSS_ENCODER_MAX_SEQ_LENGTH) for q, d in pairs]
+    scores = run_bucketed(
+        pairs,
+        lengths,
+        lambda batch: model.predict(batch, batch_size=len(batch)),
+        CROSS_ENCODER_TOKEN_BUDGET,
+        batch_size
+    )
 
     # Attach scores
     for doc, score in zip(docs, scores):
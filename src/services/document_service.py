@@ -0,0 +1,133 @@
+# src/services/document_service.py
+
+from flask import current_app
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from src.models import db
+from src.models.document_model import Document
+from src.models.user_model import User
+
+# Columns refreshed when a row for the same file already exists
+UPDATE_COLUMNS = (
+    "filename", "content_hash", "modified_at", "web_url", "size",
+    "provider_hash", "ctag", "etag", "minhash", "dup_cluster",
+)
+
+# SQLite caps bound parameters per statement (999 on older builds)
+SQLITE_MAX_PARAMS = 999
+
+
+def _chunks(rows: list, size: int):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def _update_columns(row: dict) -> list:
+    """Refreshed columns that the rows actually carry (absent ones keep their value)."""
+    return [col for col in UPDATE_COLUMNS if col in row]
+
+
+def _upsert_statement(dialect: str, table, batch: list):
+    """Build a multi-row INSERT ... ON CONFLICT/DUPLICATE KEY UPDATE for the dialect."""
+    columns = _update_columns(batch[0])
+    if dialect in ("postgresql", "sqlite"):
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        stmt = insert(table).values(batch)
+        return stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.file_id],
+            set_={col: stmt.excluded[col] for col in columns}
+        )
+    if dialect in ("mysql", "mariadb"):
+        stmt = mysql.insert(table).values(batch)
+        return stmt.on_duplicate_key_update(
+            **{col: stmt.inserted[col] for col in columns}
+        )
+    return None
+
+
+def upsert_documents(rows: list, batch_size: int = None) -> int:
+    """
+    Insert or update Document rows in batches without going through the ORM
+    unit of work. Rows are keyed by Document column names; rows with the same
+    set of keys are written together. Commits and returns the number of rows.
+    """
+    # Postgres refuses to touch the same row twice in one statement; last write wins
+    rows = list({(row["user_id"], row["file_id"]): row for row in rows}.values())
+    if not rows:
+        return 0
+
+    groups = {}
+    for row in rows:
+        groups.setdefault(tuple(sorted(row)), []).append(row)
+    for group in groups.values():
+        _upsert_rows(group, batch_size)
+    db.session.commit()
+    return len(rows)
+
+
+def _upsert_rows(rows: list, batch_size: int = None):
+    """Upsert rows that all carry the same keys (no commit)."""
+    batch_size = batch_size or current_app.config.get("DOCUMENT_UPSERT_BATCH", 1000)
+    table = Document.__table__
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect == "sqlite":
+        batch_size = max(1, min(batch_size, SQLITE_MAX_PARAMS // len(rows[0])))
+
+    if _upsert_statement(dialect, table, rows[:1]) is None:
+        # Unknown backend: fall back to per-row ORM merges
+        current_app.logger.warning(f"⚠️ No bulk upsert for dialect '{dialect}', using ORM merge")
+        existing = {
+            (d.user_id, d.file_id): d
+            for d in Document.query.filter(Document.file_id.in_([r["file_id"] for r in rows]))
+        }
+        for row in rows:
+            doc = existing.get((row["user_id"], row["file_id"]))
+            if doc is None:
+                db.session.add(Document(**row))
+            else:
+                for col in _update_columns(row):
+                    setattr(doc, col, row.get(col))
+        return
+
+    for batch in _chunks(rows, batch_size):
+        db.session.execute(_upsert_statement(dialect, table, batch))
+
+    current_app.logger.debug(f"💾 Upserted {len(rows)} documents in batches of {batch_size}")
+
+
+def bump_index_generation(user_id: int):
+    """Mark the user's searchable content as changed (drops cached result orderings in every process)."""
+    db.session.execute(
+        db.update(User)
+        .where(User.id == user_id)
+        .values(index_generation=User.index_generation + 1)
+    )
+    db.session.commit()
+
+
+def get_index_generation(user_id: int) -> int:
+    return db.session.execute(
+        db.select(User.index_generation).where(User.id == user_id)
+    ).scalar() or 0
+
+
+def get_document_states(user_id: int) -> dict:
+    """
+    file_id -> (file_id, filename, modified_at, content_hash, provider_hash, ctag)
+    for a user, read as plain tuples through the (user_id, file_id) index
+    instead of hydrating ORM objects.
+    """
+    rows = db.session.execute(
+        db.select(
+            Document.file_id,
+            Document.filename,
+            Document.modified_at,
+            Document.content_hash,
+            Document.provider_hash,
+            Document.ctag,
+        )
+        .where(Document.user_id == user_id)
+    )
+    return {row.file_id: row for row in rows}
+
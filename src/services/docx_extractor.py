@@ -0,0 +1,85 @@
+# src/services/docx_extractor.py
+#
+# Streaming .docx text extraction: reads word/document.xml (paragraphs and
+# tables, in body order) and then headers/footers straight out of the zip with
+# lxml.etree.iterparse, clearing elements as it goes so memory stays flat
+# regardless of document size.
+
+import re
+import zipfile
+from lxml import etree
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+
+_P, _T, _TAB, _BR, _CR, _TR = W + "p", W + "t", W + "tab", W + "br", W + "cr", W + "tr"
+_BR_TYPE = W + "type"
+_TAGS = (_P, _T, _TAB, _BR, _CR, _TR, MC_FALLBACK)
+
+_HEADER_FOOTER = re.compile(r"^word/(header|footer)\d*\.xml$")
+
+
+def _docx_parts(zf: zipfile.ZipFile) -> list:
+    names = zf.namelist()
+    # headers before footers, each in part-number order
+    extra = sorted(
+        (n for n in names if _HEADER_FOOTER.match(n)),
+        key=lambda n: (_HEADER_FOOTER.match(n).group(1) != "header", n)
+    )
+    return ["word/document.xml"] + extra
+
+
+def _release(el):
+    """Drop an element's content and its already-processed siblings."""
+    el.clear()
+    parent = el.getparent()
+    if parent is not None:
+        while el.getprevious() is not None:
+            del parent[0]
+
+
+def _iter_part(fh):
+    stack = []      # text buffers of the open paragraphs (text boxes nest them)
+    fallback = 0    # inside mc:Fallback, which repeats the mc:Choice content
+
+    for event, el in etree.iterparse(
+        fh, events=("start", "end"), tag=_TAGS,
+        resolve_entities=False, no_network=True, huge_tree=True
+    ):
+        tag = el.tag
+        if tag == MC_FALLBACK:
+            fallback += 1 if event == "start" else -1
+            continue
+        if fallback:
+            continue
+
+        if event == "start":
+            if tag == _P:
+                stack.append([])
+            continue
+
+        if tag == _P:
+            if stack:
+                yield "".join(stack.pop())
+            _release(el)
+        elif tag == _TR:
+            _release(el)
+        elif stack:
+            if tag == _T:
+                stack[-1].append(el.text or "")
+            elif tag == _TAB:
+                stack[-1].append("\t")
+            elif tag == _CR or el.get(_BR_TYPE) in (None, "textWrapping"):
+                stack[-1].append("\n")   # page/column breaks add no text (as in python-docx)
+
+
+def iter_docx_paragraphs(source, include_headers_footers: bool = True):
+    """
+    Yield the text of every paragraph in a .docx, including table cells and
+    (optionally) headers and footers. `source` is a path or binary file-like.
+    """
+    with zipfile.ZipFile(source) as zf:
+        parts = _docx_parts(zf) if include_headers_footers else ["word/document.xml"]
+        for part in parts:
+            with zf.open(part) as fh:
+                yield from _iter_part(fh)
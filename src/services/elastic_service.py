@@ -1,18 +1,27 @@
 import hashlib
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from dotenv import load_dotenv
 from flask import current_app
-from elasticsearch import Elasticsearch, helpers
-from elasticsearch.helpers import BulkIndexError
+from elasticsearch import BadRequestError, Elasticsearch, helpers
 from dateutil.parser import parse as parse_datetime
 
 from src.models import db, Document
 from src.services.microsoft_graph import MicrosoftGraphService
-from src.services.parser import parse_stream
+from src.services.parser import is_supported, parse_stream
+from src.services.change_detection import item_fingerprint
+from src.services.index_profiles import DEFAULT_PROFILE, SOURCE_EXCLUDES, VECTOR_PROFILES, get_profile
 from src.services.text_preprocessing import (
-    preprocess_bm25_document,
+    PREPROCESSING_VERSION,
     preprocess_bm25_query
 )
+from src.services.artifact_store import cached_bm25, cached_text
+from src.services.document_service import bump_index_generation
+from src.services.near_duplicates import assign_clusters, signature_bytes
+from src.services.vector_index import embed_documents, index_documents, vector_index_enabled
 
 load_dotenv()
 
@@ -34,131 +43,361 @@ def get_user_index(user_id: int) -> str:
     """Generate the per-user index name."""
     return f"index_user_{user_id}"
 
-def create_index_if_not_exists(client: Elasticsearch, index_name: str):
+# ─── Index topology ──────────────────────────────────────────────────────────
+#
+# "per_user": one index per user (index_user_{id}), doc id = file_id.
+# "shared":   a few shared indices; a user's docs live on one shard (routing =
+#             user_id) and are read through a filtered alias docs_user_{id}.
+#             Doc id = {user_id}_{file_id}; the file id is kept in _source.
+
+# bump whenever the profiles' mappings change, so `flask reindex --stale-only` rebuilds
+INDEX_MAPPING_VERSION = 3
+
+
+def mapping_profile() -> str:
+    return current_app.config.get("ES_MAPPING_PROFILE", DEFAULT_PROFILE)
+
+
+def index_mappings(profile: str = None) -> dict:
+    """Profile mappings plus what they were built with (read back by index_meta)."""
+    profile = profile or mapping_profile()
+    mappings = get_profile(profile)["mappings"]
+    mappings["_meta"] = {
+        "mapping_version": INDEX_MAPPING_VERSION,
+        "preprocessing_version": PREPROCESSING_VERSION,
+        "profile": profile,
+    }
+    return mappings
+
+
+def index_settings(shards: int = 1, profile: str = None, **overrides) -> dict:
+    return {
+        "number_of_shards":   shards,
+        "number_of_replicas": 0,
+        **get_profile(profile or mapping_profile())["settings"],
+        **overrides
+    }
+
+
+def index_meta(client: Elasticsearch, index_name: str) -> dict:
+    """_meta of an index or alias ({} for indices created before versioning)."""
+    resp = client.indices.get_mapping(index=index_name)
+    return next(iter(resp.values()), {}).get("mappings", {}).get("_meta", {})
+
+
+def index_versions(client: Elasticsearch, index_name: str) -> tuple:
+    """(mapping_version, preprocessing_version) of an index or alias; 0 when unversioned."""
+    meta = index_meta(client, index_name)
+    return meta.get("mapping_version", 0), meta.get("preprocessing_version", 0)
+
+
+def shared_topology() -> bool:
+    return current_app.config.get("ES_INDEX_TOPOLOGY", "per_user") == "shared"
+
+
+def get_shared_index(user_id: int) -> str:
+    """The shared index holding this user's documents."""
+    cfg = current_app.config
+    base = cfg.get("ES_SHARED_INDEX", "documents_shared")
+    count = cfg.get("ES_SHARED_INDEX_COUNT", 1)
+    return base if count <= 1 else f"{base}_{user_id % count}"
+
+
+def get_user_alias(user_id: int) -> str:
+    return f"docs_user_{user_id}"
+
+
+def get_search_index(user_id: int) -> str:
+    """Index or alias to read a user's documents from."""
+    return get_user_alias(user_id) if shared_topology() else get_user_index(user_id)
+
+
+def get_doc_id(user_id: int, file_id: str) -> str:
+    return f"{user_id}_{file_id}" if shared_topology() else file_id
+
+
+def get_write_target(client: Elasticsearch, user_id: int) -> tuple:
+    """(index, routing) for writing a user's documents, creating them on first use."""
+    if not shared_topology():
+        index_name = get_user_index(user_id)
+        create_index_if_not_exists(client, index_name, versioned=True)
+        return index_name, None
+
+    index_name = get_shared_index(user_id)
+    create_index_if_not_exists(
+        client, index_name, shards=current_app.config.get("ES_SHARED_SHARDS", 3)
+    )
+    ensure_user_alias(client, user_id)
+    return index_name, str(user_id)
+
+
+def ensure_user_alias(client: Elasticsearch, user_id: int):
+    """Filtered, routed alias exposing only this user's docs in the shared index."""
+    alias = get_user_alias(user_id)
+    if alias in _created_indices:
+        return
+    if not client.indices.exists_alias(name=alias):
+        client.indices.put_alias(
+            index=get_shared_index(user_id),
+            name=alias,
+            filter={"term": {"user_id": str(user_id)}},
+            routing=str(user_id)
+        )
+        current_app.logger.info(f"✅ Created alias {alias}")
+    _created_indices.add(alias)
+
+
+def create_index_if_not_exists(client: Elasticsearch, index_name: str, shards: int = 1, versioned: bool = False):
     """
     Ensure the given index exists with the correct mappings.
     Uses an in‐process cache to avoid repeated exists() calls.
+    With versioned=True, `index_name` is an alias over {index_name}_v{N} so the
+    index can later be rebuilt and swapped in (see reindex_service).
     """
     if index_name in _created_indices:
         return
 
     if not client.indices.exists(index=index_name):
+        target = f"{index_name}_v{INDEX_MAPPING_VERSION}" if versioned else index_name
         client.indices.create(
-            index=index_name,
-            body={
-                "settings": {
-                    "number_of_shards":   1,
-                    "number_of_replicas": 0
-                },
-                "mappings": {
-                    "properties": {
-                        "user_id":      {"type": "keyword"},
-                        "filename": {
-                            "type": "text",
-                            "fields": {
-                                "raw": {"type": "keyword"}
-                            }
-                        },
-                        "content": {
-                            "type":           "text",
-                            "analyzer":       "english",
-                            "term_vector":    "with_positions_offsets"
-                        },
-                        "content_hash": {"type": "keyword"},
-                        "created_at":   {"type": "date"},
-                        "modified_at":  {"type": "date"},
-                        "size":         {"type": "long"},
-                        "web_url":      {"type": "keyword"},
-                        "source":       {"type": "keyword"}
-                    }
-                }
-            }
+            index=target,
+            settings=index_settings(shards),
+            mappings=index_mappings(),
+            aliases={index_name: {}} if versioned else None
         )
-        current_app.logger.info(f"✅ Created index {index_name} with mappings")
+        current_app.logger.info(f"✅ Created index {target} with mappings")
     else:
         current_app.logger.debug(f"Index {index_name} already exists")
 
     _created_indices.add(index_name)
 
 
-def bulk_index_documents(docs: list, user_id: int):
+def migrate_user_to_shared_index(user_id: int, delete_old: bool = False) -> tuple:
+    """
+    Copy index_user_{id} into the shared index (server-side _reindex, setting
+    routing and the prefixed doc id), create the user's alias and compare
+    counts. The old index is deleted only when asked and the counts match.
+    Returns (old_count, new_count).
+    """
     client = get_es()
-    index_name = get_user_index(user_id)
-    create_index_if_not_exists(client, index_name)
+    old_index = get_user_index(user_id)
+    if not client.indices.exists(index=old_index):
+        return 0, 0
 
-    current_app.logger.debug(f"🛠 bulk_index_documents() called with {len(docs)} docs for user {user_id}")
+    shared_index = get_shared_index(user_id)
+    create_index_if_not_exists(
+        client, shared_index, shards=current_app.config.get("ES_SHARED_SHARDS", 3)
+    )
+    ensure_user_alias(client, user_id)
+
+    client.reindex(
+        source={"index": old_index},
+        dest={"index": shared_index},
+        script={
+            "lang": "painless",
+            "source": (
+                "if (ctx._source.file_id == null) { ctx._source.file_id = ctx._id; } "
+                "ctx._source.user_id = params.uid; "
+                "ctx._routing = params.uid; "
+                "ctx._id = params.uid + '_' + ctx._source.file_id;"
+            ),
+            "params": {"uid": str(user_id)}
+        },
+        wait_for_completion=True,
+        refresh=True
+    )
 
-    actions = []
-    for i, doc in enumerate(docs):
-        try:
-            current_app.logger.debug(f"🔍 DEBUG: Processing doc {i + 1}/{len(docs)}: {doc.get('filename', 'unknown')}")
+    old_count = client.count(index=old_index)["count"]
+    new_count = client.count(index=get_user_alias(user_id))["count"]
+    current_app.logger.info(f"📦 Migrated {old_index}: {old_count} -> {new_count} docs in {shared_index}")
 
-            source = {**doc}
+    if delete_old and new_count >= old_count:
+        client.indices.delete(index=old_index)
+        _created_indices.discard(old_index)
+        current_app.logger.info(f"🗑️ Deleted {old_index}")
+    return old_count, new_count
 
-            # Debug the preprocessing step
-            original_content = source.get("content", "")
-            current_app.logger.debug(f"🔍 DEBUG: Original content length: {len(original_content)}")
 
-            try:
-                source["content"] = preprocess_bm25_document(original_content)
-                current_app.logger.debug(f"🔍 DEBUG: Preprocessed content length: {len(source['content'])}")
-            except Exception as e:
-                current_app.logger.error(f"❌ preprocess_bm25_document failed for {doc.get('filename')}: {e}")
-                source["content"] = original_content  # Fallback to original
+# ─── Bulk indexing ───────────────────────────────────────────────────────────
 
-            actions.append({
-                "_op_type": "index",
-                "_index": index_name,
-                "_id": doc["file_id"],
-                "_source": source
-            })
-            current_app.logger.debug(f"🔍 DEBUG: Added action for doc {i + 1}")
+@dataclass
+class BulkResult:
+    """Outcome of a bulk load: docs indexed plus one entry per failed document."""
+    indexed: int = 0
+    failures: list = field(default_factory=list)   # {"file_id", "status", "error"}
+    seconds: float = 0.0
 
-        except Exception as e:
-            current_app.logger.error(f"❌ Error preparing doc {doc.get('file_id')}: {e}")
+    @property
+    def docs_per_second(self) -> float:
+        return self.indexed / self.seconds if self.seconds else 0.0
 
-    if not actions:
-        current_app.logger.info("📭 No documents to bulk-index.")
-        return
 
-    current_app.logger.debug(f"🔍 DEBUG: Prepared {len(actions)} actions for bulk indexing")
-    current_app.logger.debug(f"Sample action: {actions[0]}")
+@contextmanager
+def bulk_load_settings(client: Elasticsearch, index_name: str, enabled: bool = True):
+    """Disable refresh on an index for a large load; restore it (and refresh) afterwards."""
+    if not enabled:
+        yield
+        return
 
+    resp = client.indices.get_settings(index=index_name, name="index.refresh_interval")
+    previous = next(iter(resp.values()), {}).get("settings", {}).get("index", {}).get("refresh_interval")
+    client.indices.put_settings(index=index_name, settings={"refresh_interval": "-1"})
     try:
-        current_app.logger.debug(f"🔍 DEBUG: Starting bulk indexing to Elasticsearch...")
+        yield
+    finally:
+        client.indices.put_settings(index=index_name, settings={"refresh_interval": previous})
+        client.indices.refresh(index=index_name)
 
-        success, errors = helpers.bulk(
-            client,
-            actions,
-            raise_on_error=False,
-            stats_only=False,  # Changed to False to get detailed error info
-            request_timeout=60  # Increased timeout
-        )
 
-        current_app.logger.info(f"✅ Bulk indexed {success} docs for user {user_id}")
-        current_app.logger.debug(f"🔍 DEBUG: Bulk indexing completed successfully")
+def stores_embeddings(client: Elasticsearch, index_name: str) -> bool:
+    """True when the index was built with a profile that maps `embedding`."""
+    return index_meta(client, index_name).get("profile") in VECTOR_PROFILES
 
-        if errors:
-            current_app.logger.warning(f"❌ Bulk errors ({len(errors)}): {errors[:3]} …")
 
-    except BulkIndexError as be:
-        current_app.logger.error(f"🚨 BulkIndexError for user {user_id}: {be}")
-        current_app.logger.error(f"🚨 BulkIndexError details: {be.errors[:3]}")
-    except Exception as e:
-        current_app.logger.error(f"🚨 Exception in bulk_index_documents: {e}")
-        import traceback
-        current_app.logger.error(f"🚨 Traceback: {traceback.format_exc()}")
+def _bulk_actions(docs: list, user_id: int, index_name: str, routing, embeddings: dict = None):
+    """Lazily preprocess docs into index actions, so only one chunk is held at a time."""
+    for doc in docs:
+        source = {**doc}
+        if embeddings and doc["file_id"] in embeddings:
+            source["embedding"] = embeddings[doc["file_id"]]
+        try:
+            source["content"] = cached_bm25(doc.get("content_hash"), source.get("content", ""))
+        except Exception as e:
+            current_app.logger.error(f"❌ preprocess_bm25_document failed for {doc.get('filename')}: {e}")
+        action = {
+            "_op_type": "index",
+            "_index": index_name,
+            "_id": get_doc_id(user_id, doc["file_id"]),
+            "_source": source
+        }
+        if routing:
+            action["_routing"] = routing
+        yield action
 
-    current_app.logger.debug(f"🔍 DEBUG: bulk_index_documents() function completed")
-def search_bm25(query: str, user_id: int, top_k: int):
+
+def _stream_partition(app, client, docs, user_id, index_name, routing, embeddings=None) -> BulkResult:
+    """streaming_bulk over one slice of docs, retrying 429s per item with backoff."""
+    cfg = app.config
+    result = BulkResult()
+    with app.app_context():
+        for ok, item in helpers.streaming_bulk(
+            client,
+            _bulk_actions(docs, user_id, index_name, routing, embeddings),
+            chunk_size=cfg.get("ES_BULK_CHUNK_DOCS", 500),
+            max_chunk_bytes=cfg.get("ES_BULK_CHUNK_BYTES", 10 * 1024 * 1024),
+            max_retries=cfg.get("ES_BULK_MAX_RETRIES", 5),
+            initial_backoff=cfg.get("ES_BULK_INITIAL_BACKOFF", 1),
+            max_backoff=cfg.get("ES_BULK_MAX_BACKOFF", 30),
+            raise_on_error=False,
+            raise_on_exception=False,
+            request_timeout=cfg.get("ES_BULK_TIMEOUT", 120)
+        ):
+            info = next(iter(item.values()))
+            if ok:
+                result.indexed += 1
+            else:
+                error = info.get("error")
+                result.failures.append({
+                    "file_id": info.get("_id", "").split("_", 1)[-1] if routing else info.get("_id"),
+                    "status": info.get("status"),
+                    "error": error.get("reason", str(error)) if isinstance(error, dict) else str(error),
+                })
+    return result
+
+
+def bulk_index_documents(docs: list, user_id: int, index_name: str = None) -> BulkResult:
+    """
+    Preprocess and bulk-index docs; `index_name` overrides the user's write target.
+    Chunks are bounded by count and bytes, sent from ES_BULK_THREADS threads,
+    and 429s are retried per item. Large loads into a user's own index run
+    with refresh disabled. Failed documents come back in BulkResult.failures.
+    """
+    result = BulkResult()
+    if not docs:
+        current_app.logger.info("📭 No documents to bulk-index.")
+        return result
+
+    cfg = current_app.config
     client = get_es()
-    index_name = get_user_index(user_id)
-    # no longer calling create_index_if_not_exists here
+    explicit_index = index_name is not None
+    if not explicit_index:
+        index_name, routing = get_write_target(client, user_id)
+    else:
+        routing = None
 
-    q = preprocess_bm25_query(query)
-    current_app.logger.debug(f"🔍 search_bm25 on {index_name} with query '{q}', top_k={top_k}")
+    # never toggle refresh on a shared index (other tenants) or one the caller manages
+    large_load = (
+        len(docs) >= cfg.get("ES_BULK_LARGE_LOAD", 500)
+        and not explicit_index
+        and routing is None
+    )
+    embeddings = None
+    if stores_embeddings(client, index_name):
+        vectors = embed_documents([d.get("content", "") for d in docs], [d.get("content_hash") for d in docs])
+        embeddings = {d["file_id"]: v.tolist() for d, v in zip(docs, vectors)}
+
+    threads = max(1, min(cfg.get("ES_BULK_THREADS", 4), -(-len(docs) // cfg.get("ES_BULK_CHUNK_DOCS", 500))))
+    partitions = [docs[i::threads] for i in range(threads)]
+    app = current_app._get_current_object()
+
+    start = time.perf_counter()
+    with bulk_load_settings(client, index_name, enabled=large_load):
+        if threads == 1:
+            parts = [_stream_partition(app, client, docs, user_id, index_name, routing, embeddings)]
+        else:
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                parts = list(pool.map(
+                    lambda part: _stream_partition(app, client, part, user_id, index_name, routing, embeddings),
+                    partitions
+                ))
+    result.seconds = time.perf_counter() - start
+
+    for part in parts:
+        result.indexed += part.indexed
+        result.failures.extend(part.failures)
+
+    current_app.logger.info(
+        f"✅ Bulk indexed {result.indexed} docs for user {user_id} "
+        f"({result.docs_per_second:.0f} docs/s, {threads} threads)"
+    )
+    if result.failures:
+        current_app.logger.warning(f"❌ Bulk failures ({len(result.failures)}): {result.failures[:3]} …")
+    if result.indexed:
+        bump_index_generation(user_id)
+    return result
 
-    body = {
+
+def update_indexed_metadata(docs: list, user_id: int):
+    """Partially update filename/date/url fields of already-indexed docs, leaving content alone."""
+    client = get_es()
+    index_name, routing = get_write_target(client, user_id)
+
+    actions = [
+        {
+            "_op_type": "update",
+            "_index": index_name,
+            "_id": get_doc_id(user_id, doc["file_id"]),
+            **({"_routing": routing} if routing else {}),
+            "doc": {
+                "filename":    doc["filename"],
+                "modified_at": doc["modified_at"],
+                "web_url":     doc["web_url"],
+                "size":        doc["size"],
+            }
+        }
+        for doc in docs
+    ]
+    success, errors = helpers.bulk(client, actions, raise_on_error=False, stats_only=False)
+    current_app.logger.info(f"📝 Updated metadata of {success} indexed docs for user {user_id}")
+    if success:
+        bump_index_generation(user_id)
+    if errors:
+        current_app.logger.debug(f"Metadata update misses ({len(errors)}): {errors[:3]}")
+
+
+def bm25_search_body(q: str, top_k: int) -> dict:
+    """BM25 query over an already preprocessed query string, with a content snippet."""
+    return {
         "size": top_k,
         "query": {
             "multi_match": {
@@ -166,6 +405,7 @@ def search_bm25(query: str, user_id: int, top_k: int):
                 "fields": ["content^2", "filename"]
             }
         },
+        "_source": {"excludes": SOURCE_EXCLUDES},
         "highlight": {
             "fields": {
                 "content": {
@@ -178,49 +418,138 @@ def search_bm25(query: str, user_id: int, top_k: int):
         }
     }
 
-    response = client.search(index=index_name, body=body)
-    hits = response.get("hits", {}).get("hits", [])
+
+def search_bm25(query: str, user_id: int, top_k: int):
+    client = get_es()
+    index_name = get_search_index(user_id)
+    # no longer calling create_index_if_not_exists here
+
+    q = preprocess_bm25_query(query)
+    current_app.logger.debug(f"🔍 search_bm25 on {index_name} with query '{q}', top_k={top_k}")
+
+    response = client.search(index=index_name, body=bm25_search_body(q, top_k))
+    return [_bm25_hit(hit) for hit in response.get("hits", {}).get("hits", [])]
+
+
+def _bm25_hit(hit: dict) -> dict:
+    src = hit["_source"]
+    snippet = hit.get("highlight", {}).get("content", [""])[0]
+    return {
+        "id": src.get("file_id") or hit["_id"],
+        "score": hit["_score"],
+        "filename": src.get("filename"),
+        "snippet": snippet.strip(),
+        "content": src.get("content")
+    }
+
+
+def search_bm25_after(query: str, user_id: int, top_k: int, cursor: dict = None) -> tuple:
+    """
+    One window of BM25 hits in score order and the cursor of the next window
+    (None when exhausted). Pages with search_after on (score, file_id);
+    indices without a keyword file_id (built before mapping version 2) fall
+    back to from/size.
+    """
+    client = get_es()
+    index_name = get_search_index(user_id)
+    body = bm25_search_body(preprocess_bm25_query(query), top_k)
+    cursor = cursor or {}
+
+    if "from" in cursor:
+        body["from"] = cursor["from"]
+        hits = client.search(index=index_name, body=body)["hits"]["hits"]
+        next_cursor = {"from": cursor["from"] + len(hits)}
+    else:
+        body["sort"] = [{"_score": "desc"}, {"file_id": {"order": "asc", "unmapped_type": "keyword"}}]
+        body["track_scores"] = True
+        if "search_after" in cursor:
+            body["search_after"] = cursor["search_after"]
+        try:
+            hits = client.search(index=index_name, body=body)["hits"]["hits"]
+        except BadRequestError as e:
+            current_app.logger.warning(f"⚠️ search_after unavailable on {index_name} ({e}); paging with from/size")
+            return search_bm25_after(query, user_id, top_k, {"from": 0})
+        next_cursor = {"search_after": hits[-1]["sort"]} if hits else None
+
+    return [_bm25_hit(hit) for hit in hits], (next_cursor if len(hits) == top_k else None)
+
+
+def get_documents_by_file_ids(user_id: int, file_ids: list) -> list:
+    """Indexed docs for file ids, shaped like search_bm25 hits (score 0, snippet from content)."""
+    if not file_ids:
+        return []
+    client = get_es()
+    response = client.search(
+        index=get_search_index(user_id),
+        query={"ids": {"values": [get_doc_id(user_id, fid) for fid in file_ids]}},
+        size=len(file_ids),
+        source_excludes=SOURCE_EXCLUDES
+    )
     results = []
-    for hit in hits:
+    for hit in response.get("hits", {}).get("hits", []):
         src = hit["_source"]
-        snippet = hit.get("highlight", {}).get("content", [""])[0]
+        content = src.get("content") or ""
         results.append({
-            "id": hit["_id"],
-            "score": hit["_score"],
+            "id": src.get("file_id") or hit["_id"],
+            "score": 0.0,
             "filename": src.get("filename"),
-            "snippet": snippet.strip(),
-            "content": src.get("content")
+            "snippet": content[:150].strip(),
+            "content": content
         })
     return results
 
-def ingest_single_onedrive_file(user, item):
+
+def ingest_single_onedrive_file(user, item, content_bytes: bytes = None, svc: MicrosoftGraphService = None):
+    """
+    Index one drive item. Pass `content_bytes` when the bytes are already in
+    hand (e.g. right after an upload) to skip downloading them again.
+    """
     name = item.get("name", "").lower()
-    if not name.endswith((".docx", ".txt")):
+    if not is_supported(name):
         return
 
-    svc = MicrosoftGraphService(
-        access_token=user.access_token,
-        refresh_token=user.refresh_token,
-        token_expires=user.token_expires,
-        user_id=user.id
-    )
+    fid = item["id"]
+    if content_bytes is None:
+        svc = svc or MicrosoftGraphService(
+            access_token=user.access_token,
+            refresh_token=user.refresh_token,
+            token_expires=user.token_expires,
+            user_id=user.id
+        )
+        content, h, _ = svc.download_to_spool(fid)
+    else:
+        content = content_bytes
+        h = hashlib.sha256(content_bytes).hexdigest()
+
+    try:
+        _index_single_file(user, item, name, content, h)
+    finally:
+        if content is not content_bytes:
+            content.close()
 
+
+def _index_single_file(user, item, name, content, h):
     fid = item["id"]
-    content_bytes = svc.fetch_file_content(fid)
-    h = hashlib.sha256(content_bytes).hexdigest()
 
     existing = Document.query.filter_by(user_id=user.id, file_id=fid).first()
-    db_hashes, es_hashes = get_indexed_ids_and_hashes(user.id)
-    if h in db_hashes or h in es_hashes:
+    # indexed (user_id, content_hash) lookup instead of scanning the whole ES index
+    duplicate = Document.query.filter_by(user_id=user.id, content_hash=h).first()
+    if duplicate:
         return
 
-    text = parse_stream(name, content_bytes).strip()
+    text = cached_text(h, lambda: parse_stream(name, content).strip())
     if not text:
         return
 
     created = parse_datetime(item.get("createdDateTime")) if item.get("createdDateTime") else None
     modified = parse_datetime(item.get("lastModifiedDateTime")) if item.get("lastModifiedDateTime") else None
 
+    near_dup = {}
+    if current_app.config.get("NEAR_DUP_ENABLED", True):
+        near_dup = {"file_id": fid, "minhash": signature_bytes(text)}
+        assign_clusters(user.id, [near_dup])
+        near_dup.pop("file_id")
+
     if not existing:
         doc = Document(
             user_id=user.id,
@@ -231,7 +560,9 @@ def ingest_single_onedrive_file(user, item):
             size=item.get("size"),
             web_url=item.get("webUrl"),
             content_hash=h,
-            source="onedrive"
+            source="onedrive",
+            **item_fingerprint(item),
+            **near_dup
         )
         db.session.add(doc)
     else:
@@ -240,6 +571,8 @@ def ingest_single_onedrive_file(user, item):
         existing.size         = item.get("size")
         existing.web_url      = item.get("webUrl")
         existing.content_hash = h
+        for key, value in {**item_fingerprint(item), **near_dup}.items():
+            setattr(existing, key, value)
 
     db.session.commit()
 
@@ -252,19 +585,28 @@ def ingest_single_onedrive_file(user, item):
         "size":         item.get("size"),
         "web_url":      item.get("webUrl"),
         "content_hash": h,
-        "content":      preprocess_bm25_document(text),
+        "content":      cached_bm25(h, text),
         "source":       "onedrive",
     }
 
     client = get_es()
-    index_name = get_user_index(user.id)
-    create_index_if_not_exists(client, index_name)
-    client.index(index=index_name, id=fid, body=single_doc)
+    index_name, routing = get_write_target(client, user.id)
+    if stores_embeddings(client, index_name):
+        single_doc["embedding"] = embed_documents([text], [h])[0].tolist()
+    client.index(index=index_name, id=get_doc_id(user.id, fid), document=single_doc, routing=routing)
+    bump_index_generation(user.id)
+
+    if vector_index_enabled():
+        try:
+            index_documents(user.id, [(fid, text, h)])
+        except Exception as e:
+            current_app.logger.warning(f"⚠️ ANN index update failed for {fid}: {e}")
+
 
 def get_indexed_ids_and_hashes(user_id: int):
     client = get_es()
-    index_name = get_user_index(user_id)
-    create_index_if_not_exists(client, index_name)
+    get_write_target(client, user_id)
+    index_name = get_search_index(user_id)
 
     body = {
         "_source": ["file_id", "content_hash"],
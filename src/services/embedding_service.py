@@ -1,38 +1,71 @@
-import torch
-from torch.cuda.amp import autocast
-from sentence_transformers import SentenceTransformer, util
-from src.config.search_config import BIENCODER_MODEL_PATH
+from src.config.search_config import (
+    BIENCODER_MAX_SEQ_LENGTH,
+    BIENCODER_MODEL_PATH,
+    BIENCODER_TOKEN_BUDGET,
+    ENCODER_MAX_BATCH_SIZE
+)
+from src.services.batching import estimate_tokens, run_bucketed
+from src.services.model_registry import get_model, register_model
+from src.services.query_cache import memoize_query
 
-# ─── Load & prepare model (once at startup) ─────────────────────────────────
+# ─── Load & prepare model (once, on first use) ──────────────────────────────
 
-device = "cuda" if torch.cuda.is_available() else "cpu"
-model  = SentenceTransformer(BIENCODER_MODEL_PATH, device=device)
+@register_model("biencoder")
+def _load_biencoder():
+    import torch
+    from sentence_transformers import SentenceTransformer
 
-# 1) Switch to eval mode immediately (fast)
-model.eval()
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    model  = SentenceTransformer(BIENCODER_MODEL_PATH, device=device)
+    model.max_seq_length = BIENCODER_MAX_SEQ_LENGTH
+
+    # 1) Switch to eval mode immediately (fast)
+    model.eval()
+    return model
+
+# ─── Query embeddings (cached) ───────────────────────────────────────────────
+
+@memoize_query("query_embedding")
+def encode_query(query):
+    """Embedding of a query; cached per request and per process (read-only tensor)."""
+    import torch
+    from torch.cuda.amp import autocast
+
+    model = get_model("biencoder")
+    with torch.no_grad(), autocast():
+        return model.encode(query, convert_to_tensor=True, device=model.device)
 
 # ─── Reranker ────────────────────────────────────────────────────────────────
 
-def rerank_biencoder(query, docs, top_k=20, batch_size=1024):
+def encode_documents(texts, batch_size=ENCODER_MAX_BATCH_SIZE):
+    """Embed texts in length buckets under the token budget; rows follow `texts` order."""
+    import torch
+    from torch.cuda.amp import autocast
+
+    model  = get_model("biencoder")
+    device = model.device
+    lengths = [estimate_tokens(t, BIENCODER_MAX_SEQ_LENGTH) for t in texts]
+
+    def encode_batch(batch):
+        return model.encode(batch, convert_to_tensor=True, device=device, batch_size=len(batch))
+
+    with torch.no_grad(), autocast():
+        rows = run_bucketed(texts, lengths, encode_batch, BIENCODER_TOKEN_BUDGET, batch_size)
+    return torch.stack(rows)
+
+
+def rerank_biencoder(query, docs, top_k=20, batch_size=ENCODER_MAX_BATCH_SIZE):
     print(f"🔍 Reranking using query: {query}")
     if not docs:
         return []
 
+    from sentence_transformers import util
+
     texts = [d["content"] for d in docs]
 
-    # 2) Mixed-precision + no_grad block
-    with torch.no_grad(), autocast():
-        q_emb = model.encode(
-            query,
-            convert_to_tensor=True,
-            device=device
-        )
-        d_emb = model.encode(
-            texts,
-            convert_to_tensor=True,
-            device=device,
-            batch_size=batch_size
-        )
+    # 2) Mixed-precision + no_grad, length-bucketed batches
+    q_emb = encode_query(query)
+    d_emb = encode_documents(texts, batch_size=batch_size)
 
     # 3) One-shot GPU cosine + top_k
     hits = util.semantic_search(
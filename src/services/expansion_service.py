@@ -1,9 +1,11 @@
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.preprocessing import normalize
 import numpy as np
 from src.services.text_preprocessing import preprocess_bm25_query
 
 def expand_query(original_query: str, top_docs: list, k=3):
+    # sklearn is slow to import; only pay for it when a search runs
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.preprocessing import normalize
+
     # Build corpus from the top_docs
     corpus = [doc.get("content", "") for doc in top_docs if doc.get("content")]
     if not corpus:
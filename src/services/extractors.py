@@ -0,0 +1,162 @@
+# src/services/extractors.py
+#
+# Streaming text extractors, one per format. Each takes a binary file-like
+# object and yields text pieces (lines, paragraphs, rows) as it reads, so
+# callers can stop early or enforce budgets between pieces.
+
+import csv
+import io
+import re
+import zipfile
+from html.parser import HTMLParser
+from lxml import etree
+
+try:  # optional: text-layer PDF support
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+READ_CHUNK = 64 * 1024
+
+
+def _text_stream(stream) -> io.TextIOWrapper:
+    return io.TextIOWrapper(stream, encoding="utf-8", errors="ignore", newline="")
+
+
+# ─── Plain text family ───────────────────────────────────────────────────────
+
+def iter_txt(stream):
+    for line in _text_stream(stream):
+        yield line
+
+
+_MD_FENCE = re.compile(r"^\s*(```|~~~)")
+_MD_PREFIX = re.compile(r"^\s{0,3}(#{1,6}\s+|>\s?|[-*+]\s+|\d+[.)]\s+)")
+_MD_LINK = re.compile(r"!?\[([^\]]*)\]\([^)]*\)")
+_MD_EMPHASIS = re.compile(r"(\*\*|__|\*|_|`)")
+
+
+def iter_markdown(stream):
+    for line in _text_stream(stream):
+        if _MD_FENCE.match(line):
+            continue
+        line = _MD_PREFIX.sub("", line)
+        line = _MD_LINK.sub(r"\1", line)
+        yield _MD_EMPHASIS.sub("", line)
+
+
+def iter_csv(stream):
+    for row in csv.reader(_text_stream(stream)):
+        yield " ".join(cell for cell in row if cell)
+
+
+class _HTMLText(HTMLParser):
+    SKIP = {"script", "style", "noscript", "template", "head"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.pieces = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self._skip += 1
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP and self._skip:
+            self._skip -= 1
+
+    def handle_data(self, data):
+        if not self._skip and data.strip():
+            self.pieces.append(data)
+
+
+def iter_html(stream):
+    parser = _HTMLText()
+    text = _text_stream(stream)
+    while True:
+        chunk = text.read(READ_CHUNK)
+        if not chunk:
+            break
+        parser.feed(chunk)
+        yield from parser.pieces
+        parser.pieces.clear()
+    parser.close()
+    yield from parser.pieces
+
+
+# ─── OOXML (zip + XML parts) ─────────────────────────────────────────────────
+
+A = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+S = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+
+_SLIDE = re.compile(r"^ppt/slides/slide(\d+)\.xml$")
+_SHEET = re.compile(r"^xl/worksheets/sheet(\d+)\.xml$")
+
+
+def _numbered_parts(zf: zipfile.ZipFile, pattern) -> list:
+    found = [(int(m.group(1)), n) for n in zf.namelist() for m in [pattern.match(n)] if m]
+    return [name for _, name in sorted(found)]
+
+
+def _iterparse(fh, tags):
+    return etree.iterparse(
+        fh, events=("end",), tag=tags,
+        resolve_entities=False, no_network=True, huge_tree=True
+    )
+
+
+def iter_pptx(stream):
+    with zipfile.ZipFile(stream) as zf:
+        for part in _numbered_parts(zf, _SLIDE):
+            with zf.open(part) as fh:
+                for _, el in _iterparse(fh, A + "p"):
+                    yield "".join(t.text or "" for t in el.iter(A + "t"))
+                    el.clear()
+
+
+def _shared_strings(zf: zipfile.ZipFile) -> list:
+    if "xl/sharedStrings.xml" not in zf.namelist():
+        return []
+    strings = []
+    with zf.open("xl/sharedStrings.xml") as fh:
+        for _, el in _iterparse(fh, S + "si"):
+            strings.append("".join(t.text or "" for t in el.iter(S + "t")))
+            el.clear()
+    return strings
+
+
+def iter_xlsx(stream):
+    with zipfile.ZipFile(stream) as zf:
+        shared = _shared_strings(zf)
+        for part in _numbered_parts(zf, _SHEET):
+            with zf.open(part) as fh:
+                for _, row in _iterparse(fh, S + "row"):
+                    cells = []
+                    for c in row.iter(S + "c"):
+                        kind = c.get("t")
+                        if kind == "inlineStr":
+                            cells.append("".join(t.text or "" for t in c.iter(S + "t")))
+                            continue
+                        v = c.find(S + "v")
+                        if v is None or v.text is None:
+                            continue
+                        if kind == "s":
+                            idx = int(v.text)
+                            cells.append(shared[idx] if idx < len(shared) else "")
+                        else:
+                            cells.append(v.text)
+                    yield " ".join(cell for cell in cells if cell)
+                    row.clear()
+                    while row.getprevious() is not None:
+                        del row.getparent()[0]
+
+
+# ─── PDF (text layer only) ───────────────────────────────────────────────────
+
+def iter_pdf(stream):
+    if PdfReader is None:
+        raise ValueError("PDF support requires the 'pypdf' package")
+    reader = PdfReader(stream)
+    for page in reader.pages:
+        yield page.extract_text() or ""
@@ -0,0 +1,146 @@
+# src/services/folder_cache.py
+#
+# Per-user cache of OneDrive folder listings for the browse page.
+# A listing is served locally while it was validated recently; after that it
+# is revalidated with a conditional GET on the folder's eTag (304 = still
+# valid, no children transferred). Delta sync and webhooks invalidate the
+# parents of changed items. Pages are fetched lazily via @odata.nextLink.
+#
+# The cache is per process: other processes' invalidations reach it through
+# eTag revalidation once the trust window has passed.
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+
+from flask import current_app
+
+# only what the browse page renders
+LISTING_SELECT = "id,name,folder,file,size,lastModifiedDateTime,webUrl,eTag,cTag,parentReference"
+
+ROOT = "root"
+
+
+@dataclass
+class FolderListing:
+    folder_id: str
+    etag: str
+    items: list = field(default_factory=list)
+    next_link: str = None
+    pages: int = 0
+    validated_at: float = 0.0
+
+
+class FolderListingCache:
+    """Thread-safe, size-bounded (LRU) map of (user_id, folder_id) -> FolderListing."""
+
+    def __init__(self, max_folders: int = 5000):
+        self.max_folders = max_folders
+        self._listings = OrderedDict()
+        self._roots = {}            # user_id -> drive root item id
+        self._lock = threading.Lock()
+
+    def resolve(self, user_id: int, folder_id=None):
+        """Map 'no folder' to the user's root item id, when already known."""
+        if folder_id and folder_id != ROOT:
+            return folder_id
+        with self._lock:
+            return self._roots.get(user_id)
+
+    def set_root(self, user_id: int, root_id: str):
+        with self._lock:
+            self._roots[user_id] = root_id
+
+    def get(self, user_id: int, folder_id: str):
+        with self._lock:
+            listing = self._listings.get((user_id, folder_id))
+            if listing is not None:
+                self._listings.move_to_end((user_id, folder_id))
+            return listing
+
+    def put(self, user_id: int, listing: FolderListing):
+        with self._lock:
+            self._listings[(user_id, listing.folder_id)] = listing
+            self._listings.move_to_end((user_id, listing.folder_id))
+            while len(self._listings) > self.max_folders:
+                self._listings.popitem(last=False)
+
+    def invalidate(self, user_id: int, folder_ids):
+        with self._lock:
+            for folder_id in folder_ids:
+                self._listings.pop((user_id, folder_id), None)
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            for key in [k for k in self._listings if k[0] == user_id]:
+                del self._listings[key]
+
+    def invalidate_items(self, user_id: int, items) -> int:
+        """Drop listings affected by changed drive items (delta or webhook payloads)."""
+        folder_ids = set()
+        for item in items:
+            parent = (item.get("parentReference") or {}).get("id")
+            if parent:
+                folder_ids.add(parent)
+            if "folder" in item or "deleted" in item:
+                folder_ids.add(item.get("id"))
+        folder_ids.discard(None)
+        self.invalidate(user_id, folder_ids)
+        return len(folder_ids)
+
+
+folder_cache = FolderListingCache()
+
+
+def _sorted(items: list) -> list:
+    return sorted(items, key=lambda i: ("file" in i, i.get("name", "").lower()))
+
+
+def list_folder(svc, user_id: int, folder_id=None, pages: int = 1) -> tuple:
+    """
+    Items of a folder covering at least `pages` pages, and whether more pages
+    exist. Each page is sorted (folders first, then by name) as it is fetched,
+    so "load more" appends rows without moving the ones already shown.
+    Served from the cache when possible.
+    """
+    cfg = current_app.config
+    trust = cfg.get("FOLDER_CACHE_TRUST_SECONDS", 30)
+    page_size = cfg.get("FOLDER_PAGE_SIZE", 200)
+
+    key = folder_cache.resolve(user_id, folder_id)
+    listing = folder_cache.get(user_id, key) if key else None
+    now = time.time()
+
+    if listing is not None and now - listing.validated_at > trust:
+        meta = svc.get_folder_if_changed(folder_id, etag=listing.etag)
+        if meta is None:
+            listing.validated_at = now
+        else:
+            current_app.logger.debug(f"📁 Folder {listing.folder_id} changed; relisting")
+            listing = FolderListing(folder_id=meta["id"], etag=meta.get("eTag"))
+
+    if listing is None:
+        meta = svc.get_folder_if_changed(folder_id)
+        if not folder_id or folder_id == ROOT:
+            folder_cache.set_root(user_id, meta["id"])
+        listing = FolderListing(folder_id=meta["id"], etag=meta.get("eTag"))
+
+    # fetch pages lazily, only as far as the caller asks; work on a copy so
+    # concurrent requests never see (or extend) a half-built listing
+    if listing.pages < pages and (listing.pages == 0 or listing.next_link):
+        listing = replace(listing, items=list(listing.items))
+    while listing.pages < pages and (listing.pages == 0 or listing.next_link):
+        items, next_link = svc.list_children_page(
+            folder_id,
+            next_link=listing.next_link,
+            page_size=page_size,
+            select=LISTING_SELECT
+        )
+        listing.items.extend(_sorted(items))
+        listing.next_link = next_link
+        listing.pages += 1
+        listing.validated_at = time.time()
+
+    folder_cache.put(user_id, listing)
+    return listing.items, listing.next_link is not None
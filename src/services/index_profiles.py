@@ -0,0 +1,93 @@
+# src/services/index_profiles.py
+#
+# Selectable ES mapping profiles (ES_MAPPING_PROFILE):
+#
+# highlight_rich  the original mapping: term vectors with positions/offsets on
+#                 content (fast highlighting, roughly doubles the index) and a
+#                 keyword sub-field on filename.
+# compact         postings with offsets only (the unified highlighter still
+#                 works from them), no filename.raw, web_url/source stored but
+#                 not indexed, best_compression codec. BM25 scores are the same.
+# hybrid_vector   compact plus a dense_vector `embedding` for kNN, written at
+#                 index time from the artifact-store embeddings. It stays in
+#                 _source so partial updates and server-side reindexes keep
+#                 it; searches leave it out of their hits (SOURCE_EXCLUDES).
+#
+# `content` stays in _source in every profile: the rerankers read it from hits.
+
+import copy
+
+DEFAULT_PROFILE = "highlight_rich"
+EMBEDDING_DIMS = 384   # all-MiniLM-L6-v2
+VECTOR_PROFILES = {"hybrid_vector"}
+SOURCE_EXCLUDES = ["embedding"]
+
+_BASE_FIELDS = {
+    "user_id":      {"type": "keyword"},
+    "file_id":      {"type": "keyword"},
+    "content_hash": {"type": "keyword"},
+    "created_at":   {"type": "date"},
+    "modified_at":  {"type": "date"},
+    "size":         {"type": "long"},
+}
+
+HIGHLIGHT_RICH = {
+    "settings": {},
+    "mappings": {
+        "properties": {
+            **_BASE_FIELDS,
+            "filename": {
+                "type": "text",
+                "fields": {
+                    "raw": {"type": "keyword"}
+                }
+            },
+            "content": {
+                "type":           "text",
+                "analyzer":       "english",
+                "term_vector":    "with_positions_offsets"
+            },
+            "web_url":      {"type": "keyword"},
+            "source":       {"type": "keyword"}
+        }
+    }
+}
+
+COMPACT = {
+    "settings": {"codec": "best_compression"},
+    "mappings": {
+        "properties": {
+            **_BASE_FIELDS,
+            "filename": {"type": "text", "index_options": "freqs"},
+            "content": {
+                "type":           "text",
+                "analyzer":       "english",
+                "index_options":  "offsets"
+            },
+            "web_url":      {"type": "keyword", "index": False, "doc_values": False},
+            "source":       {"type": "keyword", "index": False, "doc_values": False}
+        }
+    }
+}
+
+HYBRID_VECTOR = copy.deepcopy(COMPACT)
+HYBRID_VECTOR["mappings"]["properties"]["embedding"] = {
+    "type":       "dense_vector",
+    "dims":       EMBEDDING_DIMS,
+    "index":      True,
+    "similarity": "cosine"
+}
+
+PROFILES = {
+    "highlight_rich": HIGHLIGHT_RICH,
+    "compact":        COMPACT,
+    "hybrid_vector":  HYBRID_VECTOR,
+}
+
+
+def get_profile(name: str = None) -> dict:
+    """Settings and mappings of a profile (deep copy, safe to extend)."""
+    name = name or DEFAULT_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Unknown mapping profile: {name} (choose from {', '.join(PROFILES)})")
+    return copy.deepcopy(PROFILES[name])
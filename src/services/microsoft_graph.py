@@ -1,11 +1,12 @@
+import hashlib
+import tempfile
 import time
 import traceback
 import requests
 from datetime import datetime
-from msal import ConfidentialClientApplication
 from flask import current_app
-import requests
-from src.utils.auth_utils import save_updated_token
+from src.utils.auth_utils import get_confidential_client, save_updated_token, token_cache
+from src.services.parser import is_supported
 
 
 class OneDriveServiceError(Exception):
@@ -15,6 +16,8 @@ class OneDriveServiceError(Exception):
 
 class MicrosoftGraphService:
     BASE_URL = "https://graph.microsoft.com/v1.0"
+    SIMPLE_UPLOAD_MAX = 4 * 1024 * 1024       # larger uploads use an upload session
+    UPLOAD_CHUNK_SIZE = 10 * 320 * 1024       # session chunks must be multiples of 320 KiB
 
     def __init__(
             self,
@@ -25,11 +28,9 @@ class MicrosoftGraphService:
             suppress_missing_user_id_warning=False
     ):
         cfg = current_app.config
-        self.app = ConfidentialClientApplication(
-            client_id=cfg["CLIENT_ID"],
-            client_credential=cfg["CLIENT_SECRET"],
-            authority=cfg["AUTHORITY"]
-        )
+        self._app = None
+        # Overridable so the service can be pointed at a local fake Graph endpoint
+        self.BASE_URL = cfg.get("GRAPH_BASE_URL", self.BASE_URL)
         self.access_token = access_token
         self.refresh_token = refresh_token
         self.user_id = user_id
@@ -40,6 +41,11 @@ class MicrosoftGraphService:
         self._token_checked = False
         self.headers = {}
 
+        # another request in this process may hold a newer token than the caller's row
+        cached = token_cache.get(user_id) if user_id is not None else None
+        if cached and cached[2] > self.token_expires:
+            self.access_token, self.refresh_token, self.token_expires = cached
+
         current_app.logger.debug(
             "🔧 MS Graph init: user_id=%s, expires=%.0f (now=%.0f)",
             self.user_id, self.token_expires, time.time()
@@ -50,6 +56,13 @@ class MicrosoftGraphService:
                 "".join(traceback.format_stack(limit=10))
             )
 
+    @property
+    def app(self):
+        """MSAL client, built on first use (its construction does OIDC discovery)."""
+        if self._app is None:
+            self._app = get_confidential_client()
+        return self._app
+
     def _ensure_token(self):
         """
         Ensures we have a valid access token. Only checks/refreshes once per instance
@@ -64,56 +77,16 @@ class MicrosoftGraphService:
 
         now = time.time()
         if not self.access_token or now >= self.token_expires:
-            current_app.logger.debug("🔄 Token expired or missing, refreshing...")
-            scopes_all = current_app.config["SCOPE"].split()
-            reserved = {"openid", "profile", "offline_access"}
-            scopes = [s for s in scopes_all if s not in reserved]
-            current_app.logger.debug("🔁 Refreshing token, scopes=%r", scopes)
-
-            try:
-                result = self.app.acquire_token_by_refresh_token(
-                    self.refresh_token, scopes=scopes
-                )
-            except ValueError as e:
-                current_app.logger.error("❌ Refresh-token error: %s", e)
-                raise OneDriveServiceError("Token refresh failed")
-
-            if not result or "access_token" not in result:
-                current_app.logger.error("❌ Token refresh failed: %r", result)
-                raise OneDriveServiceError(
-                    result.get("error_description", "Token refresh failed")
-                )
-
-            self.access_token = result["access_token"]
-            self.refresh_token = result.get("refresh_token", self.refresh_token)
-            self.token_expires = now + int(result["expires_in"])
-            current_app.logger.debug("✅ Token refreshed; expires at %.0f", self.token_expires)
-
-            if not self.user_id and "id_token_claims" in result:
-                ext = result["id_token_claims"].get("oid") or result["id_token_claims"].get("sub")
-                if ext:
-                    from src.models.user_model import User
-                    u = User.query.filter_by(ms_id=ext).first()
-                    if u:
-                        self.user_id = u.id
-                        current_app.logger.debug(
-                            "🔁 Mapped ms_id to user.id=%s", self.user_id
-                        )
+            if self.user_id is not None:
+                with token_cache.refresh_lock(self.user_id):
+                    cached = token_cache.get(self.user_id)
+                    if cached:
+                        # refreshed by a concurrent request while we waited
+                        self.access_token, self.refresh_token, self.token_expires = cached
                     else:
-                        current_app.logger.warning(
-                            "❗ No local user found for ms_id=%s", ext
-                        )
-
-            if self.user_id:
-                save_updated_token(self.user_id, {
-                    "access_token": self.access_token,
-                    "refresh_token": self.refresh_token,
-                    "expires_at": self.token_expires,
-                })
+                        self._refresh_access_token(now)
             else:
-                current_app.logger.error(
-                    "❌ Token refreshed but user_id missing—token not saved."
-                )
+                self._refresh_access_token(now)
         else:
             current_app.logger.debug(
                 "🧠 Token still valid for %.0f seconds", self.token_expires - now
@@ -121,6 +94,59 @@ class MicrosoftGraphService:
 
         self.headers = {"Authorization": f"Bearer {self.access_token}"}
 
+    def _refresh_access_token(self, now: float):
+        """Redeem the refresh token and persist the result."""
+        current_app.logger.debug("🔄 Token expired or missing, refreshing...")
+        scopes_all = current_app.config["SCOPE"].split()
+        reserved = {"openid", "profile", "offline_access"}
+        scopes = [s for s in scopes_all if s not in reserved]
+        current_app.logger.debug("🔁 Refreshing token, scopes=%r", scopes)
+
+        try:
+            result = self.app.acquire_token_by_refresh_token(
+                self.refresh_token, scopes=scopes
+            )
+        except ValueError as e:
+            current_app.logger.error("❌ Refresh-token error: %s", e)
+            raise OneDriveServiceError("Token refresh failed")
+
+        if not result or "access_token" not in result:
+            current_app.logger.error("❌ Token refresh failed: %r", result)
+            raise OneDriveServiceError(
+                result.get("error_description", "Token refresh failed")
+            )
+
+        self.access_token = result["access_token"]
+        self.refresh_token = result.get("refresh_token", self.refresh_token)
+        self.token_expires = now + int(result["expires_in"])
+        current_app.logger.debug("✅ Token refreshed; expires at %.0f", self.token_expires)
+
+        if not self.user_id and "id_token_claims" in result:
+            ext = result["id_token_claims"].get("oid") or result["id_token_claims"].get("sub")
+            if ext:
+                from src.models.user_model import User
+                u = User.query.filter_by(ms_id=ext).first()
+                if u:
+                    self.user_id = u.id
+                    current_app.logger.debug(
+                        "🔁 Mapped ms_id to user.id=%s", self.user_id
+                    )
+                else:
+                    current_app.logger.warning(
+                        "❗ No local user found for ms_id=%s", ext
+                    )
+
+        if self.user_id:
+            save_updated_token(self.user_id, {
+                "access_token": self.access_token,
+                "refresh_token": self.refresh_token,
+                "expires_at": self.token_expires,
+            })
+        else:
+            current_app.logger.error(
+                "❌ Token refreshed but user_id missing—token not saved."
+            )
+
     def ensure_valid_token(self):
         """
         Public method to force token validation if it expires within 5 minutes.
@@ -182,8 +208,49 @@ class MicrosoftGraphService:
         items.sort(key=lambda i: ("file" in i, i.get("name", "").lower()))
         return items
 
+    def _folder_url(self, folder_id=None) -> str:
+        return f"{self.BASE_URL}/me/drive/items/{folder_id}" if folder_id else f"{self.BASE_URL}/me/drive/root"
+
+    def get_folder_if_changed(self, folder_id=None, etag=None):
+        """
+        Folder metadata (id, eTag, cTag), or None when `etag` still matches
+        (HTTP 304). A folder's eTag changes whenever its children change.
+        """
+        self._ensure_token()
+        headers = dict(self.headers)
+        if etag:
+            headers["If-None-Match"] = etag
+        resp = requests.get(
+            self._folder_url(folder_id),
+            headers=headers,
+            params={"$select": "id,eTag,cTag"}
+        )
+        if resp.status_code == 304:
+            return None
+        if resp.status_code != 200:
+            current_app.logger.error("❌ Failed to get folder: %s", resp.text)
+            raise OneDriveServiceError(resp.text)
+        return resp.json()
+
+    def list_children_page(self, folder_id=None, next_link=None, page_size=200, select=None) -> tuple:
+        """One page of a folder's children. Returns (items, @odata.nextLink or None)."""
+        self._ensure_token()
+        if next_link:
+            # the link already carries $select/$top/$skiptoken
+            resp = requests.get(next_link, headers=self.headers)
+        else:
+            params = {"$top": page_size}
+            if select:
+                params["$select"] = select
+            resp = requests.get(f"{self._folder_url(folder_id)}/children", headers=self.headers, params=params)
+        if resp.status_code != 200:
+            current_app.logger.error("❌ Failed to list children: %s", resp.text)
+            raise OneDriveServiceError(resp.text)
+        data = resp.json()
+        return data.get("value", []), data.get("@odata.nextLink")
+
     def list_all_files_recursively(self, folder_id=None, _depth=0) -> list:
-        """Recursively list all .docx and .txt files under a folder (or root)."""
+        """Recursively list all files with a registered extractor under a folder (or root)."""
         if _depth == 0:
             current_app.logger.debug("📁 Starting recursive file listing...")
             self._ensure_token()
@@ -212,8 +279,7 @@ class MicrosoftGraphService:
                             "⚠️ Skipping folder '%s': %s", item.get("name"), e
                         )
                 elif "file" in item:
-                    name = item.get("name", "").lower()
-                    if name.endswith(".docx") or name.endswith(".txt"):
+                    if is_supported(item.get("name", "")):
                         all_files.append(item)
             url = data.get("@odata.nextLink")
         return all_files
@@ -250,6 +316,42 @@ class MicrosoftGraphService:
             raise OneDriveServiceError(resp.text)
         return resp.content
 
+    def download_to_spool(self, file_id: str, max_memory: int = None):
+        """
+        Stream a file's content into a SpooledTemporaryFile while hashing it.
+        Only `max_memory` bytes are held in RAM; anything larger rolls over to
+        a temp file. Returns (file positioned at 0, sha256 hex, size in bytes).
+        """
+        current_app.logger.debug("📥 Streaming file content for: %s", file_id)
+        self._ensure_token()
+        cfg = current_app.config
+        max_memory = max_memory or cfg.get("SPOOL_MAX_MEMORY", 8 * 1024 * 1024)
+        chunk_size = cfg.get("DOWNLOAD_CHUNK_SIZE", 1024 * 1024)
+
+        with requests.get(
+            f"{self.BASE_URL}/me/drive/items/{file_id}/content",
+            headers=self.headers,
+            stream=True
+        ) as resp:
+            if resp.status_code != 200:
+                current_app.logger.error("❌ Failed to fetch file content: %s", resp.text)
+                raise OneDriveServiceError(resp.text)
+
+            spool = tempfile.SpooledTemporaryFile(max_size=max_memory, mode="w+b")
+            digest = hashlib.sha256()
+            size = 0
+            try:
+                for chunk in resp.iter_content(chunk_size=chunk_size):
+                    spool.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+            except Exception:
+                spool.close()
+                raise
+
+        spool.seek(0)
+        return spool, digest.hexdigest(), size
+
     def get_item(self, item_id: str) -> dict:
         """Get metadata for a specific item"""
         current_app.logger.debug("📋 Getting item metadata: %s", item_id)
@@ -312,20 +414,20 @@ class MicrosoftGraphService:
             content: bytes,
             parent_folder_id: str = None
     ) -> dict:
-        """Upload a new file to OneDrive"""
+        """Upload a new file to OneDrive (resumable session for large files)"""
         current_app.logger.debug("📤 Uploading new file: %s", filename)
         self._ensure_token()
 
         if parent_folder_id:
-            url = (
-                f"{self.BASE_URL}/me/drive/items/"
-                f"{parent_folder_id}:/{filename}:/content"
-            )
+            base = f"{self.BASE_URL}/me/drive/items/{parent_folder_id}:/{filename}:"
         else:
-            url = f"{self.BASE_URL}/me/drive/root:/{filename}:/content"
+            base = f"{self.BASE_URL}/me/drive/root:/{filename}:"
+
+        if len(content) > current_app.config.get("GRAPH_SIMPLE_UPLOAD_MAX", self.SIMPLE_UPLOAD_MAX):
+            return self._upload_with_session(f"{base}/createUploadSession", content)
 
         resp = requests.put(
-            url,
+            f"{base}/content",
             headers=self.headers,
             data=content
         )
@@ -337,133 +439,173 @@ class MicrosoftGraphService:
 
         return resp.json()
 
-    # def create_subscription(
-    #     self,
-    #     change_type: str,
-    #     resource: str,
-    #     notification_url: str,
-    #     client_state: str,
-    #     expiration_datetime: str
-    # ) -> dict:
-    #     """Create a Graph change-notification subscription."""
-    #     current_app.logger.debug("📡 Creating subscription for resource: %s", resource)
-    #     current_app.logger.debug("📡 Notification URL: %s", notification_url)
-    #     current_app.logger.debug("📡 Change type: %s", change_type)
-    #     current_app.logger.debug("📡 Expiration: %s", expiration_datetime)
-    #
-    #     # Ensure we have a valid token before making the request
-    #     self._ensure_token()
-    #
-    #     url = "https://graph.microsoft.com/v1.0/subscriptions"
-    #     body = {
-    #         "changeType":        change_type,
-    #         "notificationUrl":   notification_url,
-    #         "resource":          resource,
-    #         "clientState":       client_state,
-    #         "expirationDateTime": expiration_datetime
-    #     }
-    #
-    #     current_app.logger.debug("📡 Subscription payload: %s", body)
-    #
-    #     # Use the class headers that include the Bearer token
-    #     resp = requests.post(url, json=body, headers=self.headers)
-    #
-    #     # Add better error handling with detailed logging
-    #     if resp.status_code == 400:
-    #         current_app.logger.error(f"❌ Subscription creation failed (400): {resp.text}")
-    #         current_app.logger.error(f"❌ Request body was: {body}")
-    #         raise OneDriveServiceError(f"Bad request: {resp.text}")
-    #     elif resp.status_code == 401:
-    #         current_app.logger.error("❌ Unauthorized (401) - token may be invalid")
-    #         current_app.logger.error(f"❌ Current token expires at: {self.token_expires}")
-    #         current_app.logger.error(f"❌ Current time: {time.time()}")
-    #         raise OneDriveServiceError("Unauthorized - please re-authenticate")
-    #     elif resp.status_code == 403:
-    #         current_app.logger.error("❌ Forbidden (403) - insufficient permissions")
-    #         raise OneDriveServiceError("Insufficient permissions for subscription")
-    #     elif resp.status_code != 201:
-    #         current_app.logger.error(f"❌ Subscription creation failed ({resp.status_code}): {resp.text}")
-    #         raise OneDriveServiceError(f"Subscription failed [{resp.status_code}]: {resp.text}")
-    #
-    #     current_app.logger.debug("✅ Subscription created successfully")
-    #     return resp.json()
-    #
-    # def renew_subscription(
-    #     self,
-    #     subscription_id: str,
-    #     new_expiration_datetime: str
-    # ) -> dict:
-    #     """Extend an existing subscription's expiration."""
-    #     current_app.logger.debug("🔄 Renewing subscription: %s", subscription_id)
-    #
-    #     # Ensure we have a valid token before making the request
-    #     self._ensure_token()
-    #
-    #     url = f"https://graph.microsoft.com/v1.0/subscriptions/{subscription_id}"
-    #     body = {"expirationDateTime": new_expiration_datetime}
-    #
-    #     current_app.logger.debug("🔄 Renewal payload: %s", body)
-    #
-    #     # Use the class headers that include the Bearer token
-    #     resp = requests.patch(url, json=body, headers=self.headers)
-    #
-    #     # Add better error handling
-    #     if resp.status_code == 400:
-    #         current_app.logger.error(f"❌ Subscription renewal failed (400): {resp.text}")
-    #         raise OneDriveServiceError(f"Bad request: {resp.text}")
-    #     elif resp.status_code == 404:
-    #         current_app.logger.error("❌ Subscription not found (404)")
-    #         raise OneDriveServiceError("Subscription not found")
-    #     elif resp.status_code == 401:
-    #         current_app.logger.error("❌ Unauthorized (401) - token may be invalid")
-    #         raise OneDriveServiceError("Unauthorized - please re-authenticate")
-    #     elif resp.status_code != 200:
-    #         current_app.logger.error(f"❌ Subscription renewal failed ({resp.status_code}): {resp.text}")
-    #         raise OneDriveServiceError(f"Renewal failed [{resp.status_code}]: {resp.text}")
-    #
-    #     current_app.logger.debug("✅ Subscription renewed successfully")
-    #     return resp.json()
-    #
-    # def delete_subscription(self, subscription_id: str) -> bool:
-    #     """Delete an existing subscription."""
-    #     current_app.logger.debug("🗑️ Deleting subscription: %s", subscription_id)
-    #
-    #     # Ensure we have a valid token before making the request
-    #     self._ensure_token()
-    #
-    #     url = f"https://graph.microsoft.com/v1.0/subscriptions/{subscription_id}"
-    #     resp = requests.delete(url, headers=self.headers)
-    #
-    #     if resp.status_code == 404:
-    #         current_app.logger.warning("⚠️ Subscription not found (404) - may already be deleted")
-    #         return True
-    #     elif resp.status_code == 401:
-    #         current_app.logger.error("❌ Unauthorized (401) - token may be invalid")
-    #         raise OneDriveServiceError("Unauthorized - please re-authenticate")
-    #     elif resp.status_code != 204:
-    #         current_app.logger.error(f"❌ Subscription deletion failed ({resp.status_code}): {resp.text}")
-    #         raise OneDriveServiceError(f"Deletion failed [{resp.status_code}]: {resp.text}")
-    #
-    #     current_app.logger.debug("✅ Subscription deleted successfully")
-    #     return True
-    #
-    # def list_subscriptions(self) -> list:
-    #     """List all active subscriptions."""
-    #     current_app.logger.debug("📋 Listing all subscriptions...")
-    #
-    #     # Ensure we have a valid token before making the request
-    #     self._ensure_token()
-    #
-    #     url = "https://graph.microsoft.com/v1.0/subscriptions"
-    #     resp = requests.get(url, headers=self.headers)
-    #
-    #     if resp.status_code == 401:
-    #         current_app.logger.error("❌ Unauthorized (401) - token may be invalid")
-    #         raise OneDriveServiceError("Unauthorized - please re-authenticate")
-    #     elif resp.status_code != 200:
-    #         current_app.logger.error(f"❌ Failed to list subscriptions ({resp.status_code}): {resp.text}")
-    #         raise OneDriveServiceError(f"List failed [{resp.status_code}]: {resp.text}")
-    #
-    #     subscriptions = resp.json().get("value", [])
-    #     current_app.logger.debug(f"✅ Found {len(subscriptions)} subscriptions")
-    #     return subscriptions
\ No newline at end of file
+    def _upload_with_session(self, session_url: str, content: bytes) -> dict:
+        """Upload via a Graph upload session in fixed-size chunks."""
+        resp = requests.post(
+            session_url,
+            headers=self.headers,
+            json={"item": {"@microsoft.graph.conflictBehavior": "replace"}}
+        )
+        if resp.status_code != 200:
+            current_app.logger.error("❌ Failed to create upload session: %s", resp.text)
+            raise OneDriveServiceError(f"Upload session failed [{resp.status_code}]: {resp.text}")
+        upload_url = resp.json()["uploadUrl"]
+
+        total = len(content)
+        chunk_size = current_app.config.get("GRAPH_UPLOAD_CHUNK_SIZE", self.UPLOAD_CHUNK_SIZE)
+        view = memoryview(content)
+        start = 0
+        while start < total:
+            end = min(start + chunk_size, total)
+            # the pre-authenticated upload URL must not receive the bearer token
+            resp = requests.put(
+                upload_url,
+                headers={
+                    "Content-Length": str(end - start),
+                    "Content-Range": f"bytes {start}-{end - 1}/{total}",
+                },
+                data=view[start:end].tobytes()
+            )
+            if resp.status_code == 202:
+                start = end
+                continue
+            if resp.status_code in (200, 201):
+                current_app.logger.debug("✅ Upload session finished (%d bytes)", total)
+                return resp.json()
+
+            current_app.logger.error("❌ Upload chunk failed: %s", resp.text)
+            requests.delete(upload_url)
+            raise OneDriveServiceError(f"Upload failed [{resp.status_code}]: {resp.text}")
+
+        raise OneDriveServiceError("Upload session ended without a completed item")
+
+    def create_subscription(
+        self,
+        change_type: str,
+        resource: str,
+        notification_url: str,
+        client_state: str,
+        expiration_datetime: str
+    ) -> dict:
+        """Create a Graph change-notification subscription."""
+        current_app.logger.debug("📡 Creating subscription for resource: %s", resource)
+        current_app.logger.debug("📡 Notification URL: %s", notification_url)
+        current_app.logger.debug("📡 Change type: %s", change_type)
+        current_app.logger.debug("📡 Expiration: %s", expiration_datetime)
+
+        # Ensure we have a valid token before making the request
+        self._ensure_token()
+
+        url = f"{self.BASE_URL}/subscriptions"
+        body = {
+            "changeType":        change_type,
+            "notificationUrl":   notification_url,
+            "resource":          resource,
+            "clientState":       client_state,
+            "expirationDateTime": expiration_datetime
+        }
+
+        current_app.logger.debug("📡 Subscription payload: %s", body)
+
+        # Use the class headers that include the Bearer token
+        resp = requests.post(url, json=body, headers=self.headers)
+
+        # Add better error handling with detailed logging
+        if resp.status_code == 400:
+            current_app.logger.error(f"❌ Subscription creation failed (400): {resp.text}")
+            current_app.logger.error(f"❌ Request body was: {body}")
+            raise OneDriveServiceError(f"Bad request: {resp.text}")
+        elif resp.status_code == 401:
+            current_app.logger.error("❌ Unauthorized (401) - token may be invalid")
+            current_app.logger.error(f"❌ Current token expires at: {self.token_expires}")
+            current_app.logger.error(f"❌ Current time: {time.time()}")
+            raise OneDriveServiceError("Unauthorized - please re-authenticate")
+        elif resp.status_code == 403:
+            current_app.logger.error("❌ Forbidden (403) - insufficient permissions")
+            raise OneDriveServiceError("Insufficient permissions for subscription")
+        elif resp.status_code != 201:
+            current_app.logger.error(f"❌ Subscription creation failed ({resp.status_code}): {resp.text}")
+            raise OneDriveServiceError(f"Subscription failed [{resp.status_code}]: {resp.text}")
+
+        current_app.logger.debug("✅ Subscription created successfully")
+        return resp.json()
+
+    def renew_subscription(
+        self,
+        subscription_id: str,
+        new_expiration_datetime: str
+    ) -> dict:
+        """Extend an existing subscription's expiration."""
+        current_app.logger.debug("🔄 Renewing subscription: %s", subscription_id)
+
+        # Ensure we have a valid token before making the request
+        self._ensure_token()
+
+        url = f"{self.BASE_URL}/subscriptions/{subscription_id}"
+        body = {"expirationDateTime": new_expiration_datetime}
+
+        current_app.logger.debug("🔄 Renewal payload: %s", body)
+
+        # Use the class headers that include the Bearer token
+        resp = requests.patch(url, json=body, headers=self.headers)
+
+        # Add better error handling
+        if resp.status_code == 400:
+            current_app.logger.error(f"❌ Subscription renewal failed (400): {resp.text}")
+            raise OneDriveServiceError(f"Bad request: {resp.text}")
+        elif resp.status_code == 404:
+            current_app.logger.error("❌ Subscription not found (404)")
+            raise OneDriveServiceError("Subscription not found")
+        elif resp.status_code == 401:
+            current_app.logger.error("❌ Unauthorized (401) - token may be invalid")
+            raise OneDriveServiceError("Unauthorized - please re-authenticate")
+        elif resp.status_code != 200:
+            current_app.logger.error(f"❌ Subscription renewal failed ({resp.status_code}): {resp.text}")
+            raise OneDriveServiceError(f"Renewal failed [{resp.status_code}]: {resp.text}")
+
+        current_app.logger.debug("✅ Subscription renewed successfully")
+        return resp.json()
+
+    def delete_subscription(self, subscription_id: str) -> bool:
+        """Delete an existing subscription."""
+        current_app.logger.debug("🗑️ Deleting subscription: %s", subscription_id)
+
+        # Ensure we have a valid token before making the request
+        self._ensure_token()
+
+        url = f"{self.BASE_URL}/subscriptions/{subscription_id}"
+        resp = requests.delete(url, headers=self.headers)
+
+        if resp.status_code == 404:
+            current_app.logger.warning("⚠️ Subscription not found (404) - may already be deleted")
+            return True
+        elif resp.status_code == 401:
+            current_app.logger.error("❌ Unauthorized (401) - token may be invalid")
+            raise OneDriveServiceError("Unauthorized - please re-authenticate")
+        elif resp.status_code != 204:
+            current_app.logger.error(f"❌ Subscription deletion failed ({resp.status_code}): {resp.text}")
+            raise OneDriveServiceError(f"Deletion failed [{resp.status_code}]: {resp.text}")
+
+        current_app.logger.debug("✅ Subscription deleted successfully")
+        return True
+
+    def list_subscriptions(self) -> list:
+        """List all active subscriptions."""
+        current_app.logger.debug("📋 Listing all subscriptions...")
+
+        # Ensure we have a valid token before making the request
+        self._ensure_token()
+
+        url = f"{self.BASE_URL}/subscriptions"
+        resp = requests.get(url, headers=self.headers)
+
+        if resp.status_code == 401:
+            current_app.logger.error("❌ Unauthorized (401) - token may be invalid")
+            raise OneDriveServiceError("Unauthorized - please re-authenticate")
+        elif resp.status_code != 200:
+            current_app.logger.error(f"❌ Failed to list subscriptions ({resp.status_code}): {resp.text}")
+            raise OneDriveServiceError(f"List failed [{resp.status_code}]: {resp.text}")
+
+        subscriptions = resp.json().get("value", [])
+        current_app.logger.debug(f"✅ Found {len(subscriptions)} subscriptions")
+        return subscriptions
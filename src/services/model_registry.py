@@ -0,0 +1,94 @@
+# src/services/model_registry.py
+#
+# Heavy NLP models (spaCy, the bi-encoder, the cross-encoder) are loaded on
+# first use instead of at import time, so CLI commands, migrations and the
+# auth/webhook routes never pay for them. Each model is loaded at most once
+# per process behind its own lock; `warm_up()` loads them ahead of traffic.
+
+import importlib
+import threading
+import time
+
+# modules that register loaders with @register_model
+MODEL_MODULES = (
+    "src.services.text_preprocessing",
+    "src.services.embedding_service",
+    "src.services.crossencoder_service",
+)
+
+_loaders = {}        # name -> zero-arg callable returning the model
+_models = {}         # name -> loaded model
+_locks = {}          # name -> lock guarding the first load
+_load_seconds = {}   # name -> how long the load took
+_errors = {}         # name -> last load error
+
+
+def register_model(name: str):
+    """Register a zero-argument loader for a named model."""
+    def decorator(fn):
+        _loaders[name] = fn
+        _locks.setdefault(name, threading.Lock())
+        return fn
+    return decorator
+
+
+def _discover():
+    for module in MODEL_MODULES:
+        importlib.import_module(module)
+
+
+def get_model(name: str):
+    """Return the named model, loading it on first use (thread-safe, once)."""
+    model = _models.get(name)
+    if model is not None:
+        return model
+
+    if name not in _loaders:
+        _discover()
+    if name not in _loaders:
+        raise KeyError(f"Unknown model: {name}")
+
+    with _locks[name]:
+        model = _models.get(name)
+        if model is None:
+            start = time.perf_counter()
+            try:
+                model = _loaders[name]()
+            except Exception as e:
+                _errors[name] = str(e)
+                raise
+            _load_seconds[name] = round(time.perf_counter() - start, 3)
+            _errors.pop(name, None)
+            _models[name] = model
+    return model
+
+
+def is_warm(name: str) -> bool:
+    return name in _models
+
+
+def warm_up(names=None, logger=None) -> dict:
+    """Load the given (default: all) models now. Returns model_status()."""
+    _discover()
+    for name in names or list(_loaders):
+        try:
+            get_model(name)
+            if logger:
+                logger.info(f"🔥 Model '{name}' warm in {_load_seconds[name]}s")
+        except Exception as e:
+            if logger:
+                logger.error(f"❌ Failed to load model '{name}': {e}")
+    return model_status()
+
+
+def model_status() -> dict:
+    """Per-model readiness: warm flag, load time and last load error."""
+    _discover()
+    return {
+        name: {
+            "warm": name in _models,
+            "load_seconds": _load_seconds.get(name),
+            "error": _errors.get(name),
+        }
+        for name in _loaders
+    }
@@ -1,19 +1,138 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from io import BytesIO
-from docx import Document as DocxDocument
+from multiprocessing import get_context
+from typing import Callable, Iterator
 
-def parse_stream(filename: str, content: bytes) -> str:
+from src.services import extractors
+from src.services.docx_extractor import iter_docx_paragraphs
 
-    if filename.lower().endswith(".txt"):
-        return content.decode("utf-8", errors="ignore").strip()
+MB = 1024 * 1024
 
-    elif filename.lower().endswith(".docx"):
-        try:
-            doc = DocxDocument(BytesIO(content))
-            texts = [p.text.strip() for p in doc.paragraphs if p.text.strip()]
-            print(f"docx paragraphs: {len(doc.paragraphs)}, non-empty: {len(texts)}")
-            return "\n".join(texts)
-        except Exception as e:
-            raise ValueError(f"Failed to parse .docx: {e}")
+# bump whenever an extractor changes its output, so cached text (artifact store) is re-extracted
+PARSER_VERSION = 1
 
-    else:
+
+class ExtractionBudgetExceeded(ValueError):
+    """Raised when a file is too large or takes too long to extract."""
+    pass
+
+
+@dataclass(frozen=True)
+class Extractor:
+    name: str
+    extract: Callable[..., Iterator[str]]   # binary file-like -> text pieces
+    max_bytes: int                          # size budget
+    max_seconds: float                      # time budget
+
+
+# extension (with dot) -> Extractor
+_EXTRACTORS = {}
+
+
+def register_extractor(name: str, extensions, max_bytes: int = 50 * MB, max_seconds: float = 60.0):
+    """Register a streaming extractor for one or more file extensions."""
+    def decorator(fn):
+        extractor = Extractor(name, fn, max_bytes, max_seconds)
+        for ext in extensions:
+            _EXTRACTORS[ext.lower()] = extractor
+        return fn
+    return decorator
+
+
+register_extractor("text", [".txt"])(extractors.iter_txt)
+register_extractor("markdown", [".md", ".markdown"])(extractors.iter_markdown)
+register_extractor("csv", [".csv"])(extractors.iter_csv)
+register_extractor("html", [".html", ".htm"], max_bytes=20 * MB)(extractors.iter_html)
+register_extractor("docx", [".docx"], max_bytes=100 * MB)(iter_docx_paragraphs)
+register_extractor("pptx", [".pptx"], max_bytes=100 * MB)(extractors.iter_pptx)
+register_extractor("xlsx", [".xlsx"], max_bytes=50 * MB, max_seconds=90.0)(extractors.iter_xlsx)
+if extractors.PdfReader is not None:
+    register_extractor("pdf", [".pdf"], max_bytes=50 * MB, max_seconds=120.0)(extractors.iter_pdf)
+
+
+def _extension(filename: str) -> str:
+    return os.path.splitext(filename.lower())[1]
+
+
+def get_extractor(filename: str):
+    return _EXTRACTORS.get(_extension(filename))
+
+
+def supported_extensions() -> tuple:
+    return tuple(sorted(_EXTRACTORS))
+
+
+def is_supported(filename: str) -> bool:
+    """Single source of truth for which drive files ingestion picks up."""
+    return _extension(filename) in _EXTRACTORS
+
+
+def _stream_size(stream) -> int:
+    pos = stream.tell()
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(pos)
+    return size
+
+
+def iter_text(filename: str, content) -> Iterator[str]:
+    """
+    Yield text pieces of a file while enforcing its format's size and time
+    budget. `content` is bytes or a seekable binary file-like object.
+    """
+    extractor = get_extractor(filename)
+    if extractor is None:
+        raise ValueError(f"Unsupported file type: {filename}")
+
+    stream = BytesIO(content) if isinstance(content, (bytes, bytearray)) else content
+    size = _stream_size(stream)
+    if size > extractor.max_bytes:
+        raise ExtractionBudgetExceeded(
+            f"{filename}: {size} bytes exceeds the {extractor.name} budget of {extractor.max_bytes}"
+        )
+
+    deadline = time.monotonic() + extractor.max_seconds
+    for piece in extractor.extract(stream):
+        if time.monotonic() > deadline:
+            raise ExtractionBudgetExceeded(
+                f"{filename}: {extractor.name} extraction exceeded {extractor.max_seconds}s"
+            )
+        yield piece
+
+
+def parse_stream(filename: str, content) -> str:
+    try:
+        texts = [t.strip() for t in iter_text(filename, content) if t.strip()]
+        return "\n".join(texts)
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"Failed to parse {_extension(filename) or filename}: {e}")
+
+
+# ─── Out-of-process extraction ───────────────────────────────────────────────
+
+_pool = None
+
+
+def _get_pool(max_workers: int = None) -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: never fork a process that holds threads, sockets and models
+        _pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=get_context("spawn"))
+    return _pool
+
+
+def parse_in_worker(filename: str, content: bytes, timeout: float = None, max_workers: int = None) -> str:
+    """
+    Run parse_stream in a worker process, so a pathological file can't stall
+    or bloat the caller. The wait is bounded by the format's time budget.
+    """
+    extractor = get_extractor(filename)
+    if extractor is None:
         raise ValueError(f"Unsupported file type: {filename}")
+    future = _get_pool(max_workers).submit(parse_stream, filename, bytes(content))
+    return future.result(timeout=timeout or extractor.max_seconds + 5)
@@ -0,0 +1,108 @@
+# src/services/quantization.py
+#
+# Compact embedding codes for vector search, as vectorised numpy kernels over
+# contiguous arrays. Approximate scores from the codes pick k * rescore
+# candidates, and exact float scores reorder them:
+#
+#   int8    per-vector symmetric scalar quantisation, one float32 scale per row
+#           (388 bytes per 384-d vector vs 1536 for float32)
+#   binary  sign bits packed 8 per byte, Hamming distance as the prefilter
+#           (48 bytes per 384-d vector)
+#
+# Codes need no training, so they can be appended incrementally.
+
+import numpy as np
+
+MODES = ("none", "int8", "binary")
+RESCORE_FACTOR = 4     # candidates rescored with float vectors per result
+CHUNK_ROWS = 65536     # rows scored at once (bounds temporary float copies)
+
+if hasattr(np, "bitwise_count"):          # numpy >= 2.0
+    _popcount = np.bitwise_count
+else:
+    _POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def _popcount(a):
+        return _POPCOUNT[a]
+
+
+# ─── Kernels ─────────────────────────────────────────────────────────────────
+
+def quantize_int8(vectors) -> tuple:
+    """(codes int8 [n, d], scales float32 [n]) with vectors ≈ codes * scales[:, None]."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127.0
+    codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def int8_scores(codes, scales, query) -> np.ndarray:
+    """Approximate dot products of `query` with int8-coded rows."""
+    query = np.asarray(query, dtype=np.float32)
+    out = np.empty(len(codes), dtype=np.float32)
+    for start in range(0, len(codes), CHUNK_ROWS):
+        end = start + CHUNK_ROWS
+        out[start:end] = (codes[start:end].astype(np.float32) @ query) * scales[start:end]
+    return out
+
+
+def binarize(vectors) -> np.ndarray:
+    """Sign bits packed along the last axis: uint8 [n, ceil(d / 8)]."""
+    return np.packbits(np.asarray(vectors) > 0, axis=-1)
+
+
+def hamming_distances(packed, query_packed) -> np.ndarray:
+    """Number of differing bits between each packed row and the packed query."""
+    query_packed = np.asarray(query_packed, dtype=np.uint8).reshape(-1)
+    out = np.empty(len(packed), dtype=np.int32)
+    for start in range(0, len(packed), CHUNK_ROWS):
+        block = np.bitwise_xor(packed[start:start + CHUNK_ROWS], query_packed)
+        out[start:start + CHUNK_ROWS] = _popcount(block).sum(axis=1, dtype=np.int32)
+    return out
+
+
+def encode(vectors, mode: str) -> tuple:
+    """Codes for `mode`: (codes, scales) for int8, (packed, None) for binary."""
+    if mode == "int8":
+        return quantize_int8(vectors)
+    if mode == "binary":
+        return binarize(vectors), None
+    raise ValueError(f"Unknown quantization mode: {mode} (choose from {', '.join(MODES)})")
+
+
+def approximate_scores(mode: str, codes, scales, query) -> np.ndarray:
+    """Higher is closer, for either code type."""
+    if mode == "int8":
+        return int8_scores(codes, scales, query)
+    return -hamming_distances(codes, binarize(query)).astype(np.float32)
+
+
+def top_k(scores, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    idx = np.argpartition(-scores, k - 1)[:k]
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
+
+def search_codes(mode: str, codes, scales, query, k: int, full=None, rescore: int = RESCORE_FACTOR) -> tuple:
+    """
+    (row indices, scores) of the k best rows. With `full` (float rows, may be
+    a memmap) the k * rescore best approximate candidates are re-ranked by
+    exact dot product, and only those rows are read.
+    """
+    query = np.asarray(query, dtype=np.float32)
+    approx = approximate_scores(mode, codes, scales, query)
+    if full is None:
+        rows = top_k(approx, k)
+        return rows, approx[rows]
+
+    candidates = np.sort(top_k(approx, k * max(rescore, 1)))
+    exact = np.asarray(full[candidates], dtype=np.float32) @ query
+    best = top_k(exact, k)
+    return candidates[best], exact[best]
+
+
+def bytes_per_vector(mode: str, dim: int) -> int:
+    return {"float32": 4 * dim, "float16": 2 * dim, "int8": dim + 4, "binary": (dim + 7) // 8}[mode]
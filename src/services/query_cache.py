@@ -0,0 +1,100 @@
+# src/services/query_cache.py
+#
+# Memoisation for per-query NLP work (spaCy preprocessing, query embeddings).
+# One search preprocesses the same query several times (BM25 search, expansion,
+# second BM25 pass, encoder) and users repeat queries, so results are kept
+#   1. per request, in flask.g (no locking, gone after the response), and
+#   2. per process, in a bounded thread-safe LRU shared by all requests.
+# Keys are the whitespace-normalised query text.
+
+import functools
+import threading
+from collections import OrderedDict
+
+from flask import g, has_app_context
+
+from src.config.search_config import QUERY_CACHE_SIZE
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache with hit/miss counters."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=_MISSING):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+_caches = {}
+
+
+def normalize_query(text: str) -> str:
+    return " ".join((text or "").split())
+
+
+def _request_memo() -> dict:
+    if not has_app_context():
+        return None
+    memo = g.get("_query_memo")
+    if memo is None:
+        memo = g._query_memo = {}
+    return memo
+
+
+def memoize_query(name: str, maxsize: int = QUERY_CACHE_SIZE):
+    """Cache a single-argument query function per request and per process."""
+    cache = _caches.setdefault(name, LRUCache(maxsize))
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(text):
+            key = normalize_query(text)
+
+            memo = _request_memo()
+            if memo is not None and (name, key) in memo:
+                return memo[(name, key)]
+
+            value = cache.get(key)
+            if value is _MISSING:
+                value = fn(key)
+                cache.put(key, value)
+
+            if memo is not None:
+                memo[(name, key)] = value
+            return value
+
+        wrapper.cache = cache
+        return wrapper
+    return decorator
+
+
+def cache_stats() -> dict:
+    return {name: cache.stats() for name, cache in _caches.items()}
@@ -0,0 +1,266 @@
+# src/services/reindex_service.py
+#
+# Zero-downtime rebuild of a user's index. Searches and writes go through the
+# alias index_user_{id}; a rebuild fills index_user_{id}_v{N} with bulk-load
+# settings (no refresh, no replicas), then swaps the alias in one atomic
+# update_aliases call. A legacy concrete index_user_{id} is dropped by the same
+# call (remove_index), so the name is never missing.
+
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from elasticsearch import helpers
+from flask import current_app
+
+from src.models import Document, User
+from src.services.artifact_store import cached_text, get_text
+from src.services.elastic_service import (
+    bulk_index_documents,
+    get_es,
+    get_user_index,
+    index_mappings,
+    index_meta,
+    index_settings,
+    mapping_profile,
+    shared_topology,
+    INDEX_MAPPING_VERSION,
+    _created_indices
+)
+from src.services.text_preprocessing import PREPROCESSING_VERSION
+
+BULK_LOAD_SETTINGS = {"refresh_interval": "-1", "number_of_replicas": 0}
+BACKFILL_BATCH = 200
+
+
+def current_indices(client, alias: str) -> list:
+    """Concrete indices currently behind `alias` (or [alias] for a legacy index)."""
+    if client.indices.exists_alias(name=alias):
+        return sorted(client.indices.get_alias(name=alias).keys())
+    if client.indices.exists(index=alias):
+        return [alias]
+    return []
+
+
+def is_stale(user_id: int) -> bool:
+    """True when the user's index was built with older mappings/preprocessing or another profile."""
+    client = get_es()
+    alias = get_user_index(user_id)
+    if not client.indices.exists(index=alias):
+        return False
+    meta = index_meta(client, alias)
+    return (
+        meta.get("mapping_version", 0) < INDEX_MAPPING_VERSION
+        or meta.get("preprocessing_version", 0) < PREPROCESSING_VERSION
+        or meta.get("profile", "highlight_rich") != mapping_profile()
+    )
+
+
+def _next_index_name(client, alias: str) -> str:
+    taken = client.indices.get(index=f"{alias}_v*", ignore_unavailable=True, allow_no_indices=True)
+    numbers = [int(m.group(1)) for name in taken for m in [re.search(r"_v(\d+)$", name)] if m]
+    return f"{alias}_v{max(numbers + [INDEX_MAPPING_VERSION - 1]) + 1}"
+
+
+def _load_document(svc, doc: Document):
+    """Download and parse one file into an indexable payload (None if empty)."""
+    from src.services.parser import parse_stream
+
+    # text already extracted from these bytes: skip download and parsing
+    h = doc.content_hash
+    text = get_text(h) if h else None
+    if text is None:
+        spool, h, _ = svc.download_to_spool(doc.file_id)
+        try:
+            text = cached_text(h, lambda: parse_stream(doc.filename.lower(), spool).strip())
+        finally:
+            spool.close()
+    if not text:
+        return None
+    return {
+        "user_id":      doc.user_id,
+        "file_id":      doc.file_id,
+        "filename":     doc.filename,
+        "content":      text,
+        "created_at":   doc.created_at,
+        "modified_at":  doc.modified_at,
+        "size":         doc.size,
+        "web_url":      doc.web_url,
+        "content_hash": h,
+        "source":       doc.source or "onedrive",
+    }
+
+
+def iter_user_documents(user: User, workers: int):
+    """
+    Download and parse every Document of the user from OneDrive in a thread
+    pool; yields (document, payload), with payload None when loading failed.
+    """
+    from src.services.microsoft_graph import MicrosoftGraphService
+
+    app = current_app._get_current_object()
+    svc = MicrosoftGraphService(
+        access_token=user.access_token,
+        refresh_token=user.refresh_token,
+        token_expires=user.token_expires,
+        user_id=user.id
+    )
+    svc.ensure_valid_token()
+
+    docs = Document.query.filter_by(user_id=user.id).all()
+
+    def load(doc):
+        with app.app_context():
+            return _load_document(svc, doc)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(load, doc): doc for doc in docs}
+        for future in as_completed(futures):
+            doc = futures[future]
+            try:
+                payload = future.result()
+            except Exception as e:
+                current_app.logger.warning(f"⚠️ Failed to load {doc.filename}: {e}")
+                yield doc, None
+                continue
+            if payload:
+                yield doc, payload
+
+
+def _backfill_from_graph(user: User, index_name: str, workers: int) -> tuple:
+    """Re-extract every Document of the user from OneDrive into `index_name`."""
+    indexed, failed, batch = 0, 0, []
+
+    for _, payload in iter_user_documents(user, workers):
+        if payload is None:
+            failed += 1
+            continue
+        batch.append(payload)
+        if len(batch) >= BACKFILL_BATCH:
+            result = bulk_index_documents(batch, user.id, index_name=index_name)
+            indexed += result.indexed
+            failed += len(result.failures)
+            batch = []
+
+    if batch:
+        result = bulk_index_documents(batch, user.id, index_name=index_name)
+        indexed += result.indexed
+        failed += len(result.failures)
+    return indexed, failed
+
+
+def _doc_ids(client, index_name: str) -> set:
+    return {h["_id"] for h in helpers.scan(client, index=index_name, query={"query": {"match_all": {}}}, _source=False)}
+
+
+def _doc_versions(client, index_name: str) -> dict:
+    """_id -> _seq_no of every doc (the sequence number changes on each write)."""
+    client.indices.refresh(index=index_name)
+    return {
+        h["_id"]: h["_seq_no"]
+        for h in helpers.scan(
+            client, index=index_name, query={"query": {"match_all": {}}},
+            _source=False, seq_no_primary_term=True
+        )
+    }
+
+
+def _carry_over_changes(client, snapshots: dict, new_index: str) -> tuple:
+    """
+    Apply to the new index what happened in the old indices while it was built
+    (uploads, webhook updates, deletions; syncs for the user are held off while
+    the reindex job runs): docs written since the snapshot or missing from the
+    new index are copied, docs deleted since the snapshot are removed.
+    Returns (copied, removed).
+    """
+    copied, removed = 0, 0
+    client.indices.refresh(index=new_index)
+    new_ids = _doc_ids(client, new_index)
+    for old, before in snapshots.items():
+        after = _doc_versions(client, old)
+        changed = sorted(
+            doc_id for doc_id, seq_no in after.items()
+            if doc_id not in new_ids or before.get(doc_id) != seq_no
+        )
+        if changed:
+            resp = client.reindex(
+                source={"index": old, "query": {"ids": {"values": changed}}},
+                dest={"index": new_index},
+                wait_for_completion=True
+            )
+            copied += resp.get("created", 0) + resp.get("updated", 0)
+
+        deleted = [doc_id for doc_id in before if doc_id not in after and doc_id in new_ids]
+        if deleted:
+            ok, _ = helpers.bulk(
+                client,
+                ({"_op_type": "delete", "_index": new_index, "_id": doc_id} for doc_id in deleted),
+                raise_on_error=False
+            )
+            removed += ok
+    return copied, removed
+
+
+def reindex_user(user: User, source: str = "graph", workers: int = None, keep_old: bool = False) -> dict:
+    """
+    Build a fresh versioned index for the user and atomically point the alias at it.
+    source="graph" re-extracts every file (picks up parser and preprocessing
+    changes); text already extracted with the current PARSER_VERSION comes from
+    the artifact store instead of a download. source="index" copies the current
+    index server-side (mapping-only changes, no Graph traffic).
+    """
+    if shared_topology():
+        raise ValueError("Versioned reindex applies to the per_user index topology")
+
+    client = get_es()
+    alias = get_user_index(user.id)
+    old_indices = current_indices(client, alias)
+    new_index = _next_index_name(client, alias)
+    workers = workers or current_app.config.get("JOB_WORKERS", 4)
+
+    client.indices.create(
+        index=new_index,
+        settings=index_settings(1, **BULK_LOAD_SETTINGS),
+        mappings=index_mappings()
+    )
+    current_app.logger.info(f"🏗️ Building {new_index} for user {user.id} from {source}")
+
+    # write positions of the live index, to replay changes made during the build
+    snapshots = {old: _doc_versions(client, old) for old in old_indices}
+
+    stats = {"index": new_index, "indexed": 0, "failed": 0, "carried_over": 0, "removed": 0}
+    try:
+        if source == "index" and old_indices:
+            resp = client.reindex(
+                source={"index": alias}, dest={"index": new_index}, wait_for_completion=True
+            )
+            stats["indexed"] = resp.get("created", 0)
+        elif source == "graph":
+            stats["indexed"], stats["failed"] = _backfill_from_graph(user, new_index, workers)
+
+        stats["carried_over"], stats["removed"] = _carry_over_changes(client, snapshots, new_index)
+
+        # back to serving settings before the new index takes traffic
+        client.indices.put_settings(
+            index=new_index,
+            settings={"refresh_interval": None, "number_of_replicas": 0}
+        )
+        client.indices.refresh(index=new_index)
+    except Exception:
+        client.indices.delete(index=new_index, ignore_unavailable=True)
+        raise
+
+    actions = [{"add": {"index": new_index, "alias": alias}}]
+    for old in old_indices:
+        if old == alias:
+            actions.append({"remove_index": {"index": old}})   # legacy concrete index
+        else:
+            actions.append({"remove": {"index": old, "alias": alias}})
+    client.indices.update_aliases(actions=actions)
+    _created_indices.discard(alias)
+    current_app.logger.info(f"🔀 Alias {alias} -> {new_index}")
+
+    if not keep_old:
+        for old in old_indices:
+            if old != alias:
+                client.indices.delete(index=old, ignore_unavailable=True)
+    return stats
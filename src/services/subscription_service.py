@@ -0,0 +1,193 @@
+# src/services/subscription_service.py
+
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from dateutil.parser import parse as parse_datetime
+from flask import current_app
+
+from src.models import db
+from src.models.subscription_model import Subscription
+from src.models.user_model import User
+from src.services.microsoft_graph import MicrosoftGraphService, OneDriveServiceError
+
+
+def _graph_for(user: User) -> MicrosoftGraphService:
+    return MicrosoftGraphService(
+        access_token=user.access_token,
+        refresh_token=user.refresh_token,
+        token_expires=user.token_expires,
+        user_id=user.id
+    )
+
+
+def _new_expiry() -> datetime:
+    minutes = current_app.config["SUBSCRIPTION_LIFETIME_MINUTES"]
+    return datetime.utcnow() + timedelta(minutes=minutes)
+
+
+def _to_graph_datetime(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.0000000Z")
+
+
+def _from_graph_datetime(value: str) -> datetime:
+    """Parse a Graph timestamp into the naive-UTC form used by our models."""
+    dt = parse_datetime(value)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def get_active_subscription(user_id: int):
+    """Return the newest non-expired subscription for a user, if any."""
+    return (
+        Subscription.query
+        .filter(Subscription.user_id == user_id, Subscription.expires_at > datetime.utcnow())
+        .order_by(Subscription.expires_at.desc())
+        .first()
+    )
+
+
+def create_user_subscription(user: User, svc: MicrosoftGraphService = None) -> Subscription:
+    """Create a drive-root change subscription on Graph and persist it."""
+    cfg = current_app.config
+    svc = svc or _graph_for(user)
+    client_state = secrets.token_hex(16)
+
+    result = svc.create_subscription(
+        change_type=cfg["SUBSCRIPTION_CHANGE_TYPE"],
+        resource=cfg["SUBSCRIPTION_RESOURCE"],
+        notification_url=cfg["NOTIFICATIONS_URL"],
+        client_state=client_state,
+        expiration_datetime=_to_graph_datetime(_new_expiry())
+    )
+
+    sub = Subscription(
+        sub_id=result["id"],
+        user_id=user.id,
+        client_state=client_state,
+        expires_at=_from_graph_datetime(result["expirationDateTime"])
+    )
+    db.session.add(sub)
+    db.session.commit()
+    current_app.logger.info(f"📡 Created subscription {sub.sub_id} for user {user.id}")
+    return sub
+
+
+def renew_user_subscription(sub: Subscription, svc: MicrosoftGraphService) -> bool:
+    """Extend a subscription; drops the local row if Graph no longer knows it."""
+    try:
+        result = svc.renew_subscription(sub.sub_id, _to_graph_datetime(_new_expiry()))
+    except OneDriveServiceError as e:
+        current_app.logger.warning(f"⚠️ Renewal failed for subscription {sub.sub_id}: {e}")
+        if "not found" in str(e).lower():
+            db.session.delete(sub)
+            db.session.commit()
+        return False
+
+    sub.expires_at = _from_graph_datetime(result["expirationDateTime"])
+    db.session.commit()
+    current_app.logger.info(f"🔄 Renewed subscription {sub.sub_id} until {sub.expires_at}")
+    return True
+
+
+def ensure_user_subscription(user: User) -> Subscription:
+    """Make sure the user has exactly one live subscription, renewing it if it expires soon."""
+    return maintain_user_subscriptions(user)["subscription"]
+
+
+def maintain_user_subscriptions(user: User) -> dict:
+    """
+    Create, renew and garbage-collect subscriptions for a single user.
+    Returns counters plus the subscription left active.
+    """
+    cfg = current_app.config
+    svc = _graph_for(user)
+    now = datetime.utcnow()
+    renew_before = now + timedelta(minutes=cfg["SUBSCRIPTION_RENEW_BEFORE_MINUTES"])
+    stats = {"created": 0, "renewed": 0, "removed": 0, "subscription": None}
+
+    subs = (
+        Subscription.query
+        .filter_by(user_id=user.id)
+        .order_by(Subscription.expires_at.desc())
+        .all()
+    )
+
+    # 1) Expired rows are already gone on Graph's side; duplicates are redundant
+    keep = None
+    for sub in subs:
+        if sub.expires_at <= now:
+            db.session.delete(sub)
+            stats["removed"] += 1
+        elif keep is None:
+            keep = sub
+        else:
+            try:
+                svc.delete_subscription(sub.sub_id)
+            except OneDriveServiceError as e:
+                current_app.logger.warning(f"⚠️ Could not delete duplicate subscription {sub.sub_id}: {e}")
+            db.session.delete(sub)
+            stats["removed"] += 1
+    db.session.commit()
+
+    # 2) Drop remote subscriptions pointing at us that we no longer track
+    try:
+        known = {keep.sub_id} if keep else set()
+        for remote in svc.list_subscriptions():
+            if remote.get("notificationUrl") != cfg["NOTIFICATIONS_URL"] or remote.get("id") in known:
+                continue
+            svc.delete_subscription(remote["id"])
+            stats["removed"] += 1
+    except OneDriveServiceError as e:
+        current_app.logger.warning(f"⚠️ Could not list subscriptions for user {user.id}: {e}")
+
+    # 3) Renew the survivor before it lapses, or create a fresh one
+    if keep and keep.expires_at <= renew_before:
+        if renew_user_subscription(keep, svc):
+            stats["renewed"] += 1
+        else:
+            keep = None
+    if keep is None:
+        keep = create_user_subscription(user, svc)
+        stats["created"] += 1
+
+    stats["subscription"] = keep
+    return stats
+
+
+def run_subscription_maintenance() -> dict:
+    """Maintain subscriptions for every user; one failing user doesn't stop the rest."""
+    totals = {"users": 0, "created": 0, "renewed": 0, "removed": 0, "failed": 0}
+    for user in User.query.all():
+        totals["users"] += 1
+        try:
+            stats = maintain_user_subscriptions(user)
+            for key in ("created", "renewed", "removed"):
+                totals[key] += stats[key]
+        except Exception as e:
+            db.session.rollback()
+            totals["failed"] += 1
+            current_app.logger.error(f"❌ Subscription maintenance failed for user {user.id}: {e}")
+    current_app.logger.info(f"📡 Subscription maintenance done: {totals}")
+    return totals
+
+
+def start_subscription_scheduler(app):
+    """Run subscription maintenance periodically in a daemon thread."""
+    interval = app.config["SUBSCRIPTION_SCHEDULER_INTERVAL"]
+
+    def loop():
+        while True:
+            with app.app_context():
+                try:
+                    run_subscription_maintenance()
+                except Exception:
+                    app.logger.exception("❌ Subscription scheduler tick failed")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name="subscription-scheduler", daemon=True)
+    thread.start()
+    app.logger.info(f"⏰ Subscription scheduler started (every {interval}s)")
+    return thread
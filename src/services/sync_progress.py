@@ -0,0 +1,103 @@
+# src/services/sync_progress.py
+
+import threading
+import time
+
+# user_id -> SyncProgress for syncs running in this process.
+# Cheap to update from ingestion threads; snapshots are also persisted to the
+# job row (throttled) so other processes can serve them.
+_live = {}
+_live_lock = threading.Lock()
+
+COUNTERS = ("discovered", "downloaded", "parsed", "indexed", "skipped", "failed")
+
+
+class SyncProgress:
+    """Thread-safe live counters for one sync run."""
+
+    FLUSH_INTERVAL = 2.0  # seconds between persisted snapshots
+
+    def __init__(self, user_id: int, job_id: int = None, persist=None):
+        self.user_id = user_id
+        self.job_id = job_id
+        self._persist = persist
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+        self.started_at = time.time()
+        self.stage = "queued"
+        self.stage_started_at = self.started_at
+        self.bytes_downloaded = 0
+        self.counts = dict.fromkeys(COUNTERS, 0)
+
+    def set_stage(self, stage: str):
+        with self._lock:
+            self.stage = stage
+            self.stage_started_at = time.time()
+        self.flush(force=True)
+
+    def incr(self, name: str, n: int = 1):
+        with self._lock:
+            self.counts[name] += n
+
+    def set(self, name: str, value: int):
+        with self._lock:
+            self.counts[name] = value
+
+    def add_bytes(self, n: int):
+        with self._lock:
+            self.bytes_downloaded += n
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            now = time.time()
+            elapsed = max(now - self.started_at, 1e-6)
+            stage_elapsed = max(now - self.stage_started_at, 1e-6)
+            counts = dict(self.counts)
+            done_items = counts["parsed"] + counts["skipped"] + counts["failed"]
+            remaining = max(counts["discovered"] - done_items, 0)
+
+            eta = None
+            if self.stage == "downloading" and done_items:
+                eta = remaining / (done_items / stage_elapsed)
+            elif self.stage == "done":
+                eta = 0
+
+            return {
+                "stage": self.stage,
+                **counts,
+                "bytes_downloaded": self.bytes_downloaded,
+                "bytes_per_second": round(self.bytes_downloaded / elapsed, 1),
+                "items_per_second": round(done_items / elapsed, 2),
+                "elapsed_seconds": round(elapsed, 1),
+                "eta_seconds": round(eta, 1) if eta is not None else None,
+                "updated_at": now,
+            }
+
+    def flush(self, force: bool = False):
+        """Persist a snapshot if the throttle allows; call from the owning thread."""
+        if self._persist is None:
+            return
+        now = time.time()
+        if not force and now - self._last_flush < self.FLUSH_INTERVAL:
+            return
+        self._last_flush = now
+        self._persist(self.snapshot())
+
+
+def start_progress(user_id: int, job_id: int = None, persist=None) -> SyncProgress:
+    progress = SyncProgress(user_id, job_id, persist)
+    with _live_lock:
+        _live[user_id] = progress
+    return progress
+
+
+def finish_progress(user_id: int):
+    with _live_lock:
+        _live.pop(user_id, None)
+
+
+def get_live_progress(user_id: int):
+    """Snapshot of a sync running in this process, or None."""
+    with _live_lock:
+        progress = _live.get(user_id)
+    return progress.snapshot() if progress else None
@@ -2,22 +2,30 @@
 
 import os
 import re
-import spacy
 from nltk.stem import PorterStemmer
+from src.services.model_registry import get_model, register_model
+from src.services.query_cache import memoize_query
 
 # Set spaCy model path (custom or env)
 DEFAULT_SPACY_PATH = r"D:\Thesis\App\src\encoder\spacy\en_core_web_sm\en_core_web_sm-3.7.1"
 SPACY_MODEL_PATH = os.getenv("SPACY_MODEL_PATH", DEFAULT_SPACY_PATH)
 
-# Load spaCy
-try:
-    nlp = spacy.load(SPACY_MODEL_PATH)
-    nlp.max_length = 2_000_000  # ⬅️ Increase the limit to handle large documents
-except OSError as e:
-    raise RuntimeError(f"❌ Failed to load spaCy model from {SPACY_MODEL_PATH}\n{e}")
+# Load spaCy (on first use, see model_registry)
+@register_model("spacy")
+def _load_spacy():
+    import spacy
+    try:
+        nlp = spacy.load(SPACY_MODEL_PATH)
+        nlp.max_length = 2_000_000  # ⬅️ Increase the limit to handle large documents
+    except OSError as e:
+        raise RuntimeError(f"❌ Failed to load spaCy model from {SPACY_MODEL_PATH}\n{e}")
+    return nlp
 
 stemmer = PorterStemmer()
 
+# bump whenever preprocess_bm25_document changes output, so `flask reindex --stale-only` rebuilds
+PREPROCESSING_VERSION = 1
+
 # --- Utility ---
 
 def normalize(text):
@@ -36,7 +44,7 @@ def split_compounds(text):
 # --- Core tokenizer wrapper ---
 
 def tokenize_doc(text, remove_stopwords=True, lemmatize=True, stem=False):
-    doc = nlp(text)
+    doc = get_model("spacy")(text)
     tokens = []
     for token in doc:
         if token.is_alpha and (not remove_stopwords or not token.is_stop):
@@ -48,6 +56,7 @@ def tokenize_doc(text, remove_stopwords=True, lemmatize=True, stem=False):
 
 # --- Preprocessing Pipelines ---
 
+@memoize_query("bm25_query")
 def preprocess_bm25_query(text):
     text = normalize(text)
     tokens = tokenize_doc(text, remove_stopwords=True, lemmatize=False, stem=True)
@@ -60,6 +69,7 @@ def preprocess_bm25_document(text):
     return ' '.join(tokens)
 
 
+@memoize_query("encoder_query")
 def preprocess_for_encoder(text):
     text = normalize(text)  # No compound split
     tokens = tokenize_doc(text, remove_stopwords=False, lemmatize=True, stem=False)
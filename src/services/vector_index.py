@@ -0,0 +1,409 @@
+# src/services/vector_index.py
+#
+# Per-user approximate-nearest-neighbour index over document embeddings, kept
+# on disk under VECTOR_INDEX_DIR/user_{id}/ and used by the search pipeline as
+# an extra candidate source next to BM25.
+#
+# Backends:
+#   hnsw  hnswlib graph (when installed); supports in-place add/delete.
+#   ivf   numpy inverted-file index: float16 vectors in a memory-mapped,
+#         append-only file, a k-means coarse quantiser and a per-row list id.
+#         Search scores the probed lists only. Deletes are tombstones until
+#         compact() rewrites a new file generation. With VECTOR_QUANTIZATION
+#         (int8 | binary) the probed rows are scored on compact codes first and
+#         only the best candidates are rescored from the float16 file.
+#
+# Writers (ingestion jobs) update the files and atomically replace meta.json;
+# readers in other processes notice the new mtime and reopen.
+
+import json
+import os
+import re
+import threading
+
+import numpy as np
+from flask import current_app
+
+from src.services import quantization
+from src.services.artifact_store import get_embedding, put_embedding
+
+try:  # optional: graph-based ANN
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+IVF_MIN_TRAIN = 1024        # below this many vectors, search is exact
+IVF_TRAIN_SAMPLE = 20000
+IVF_NPROBE = 8
+COMPACT_DELETED_RATIO = 0.25
+
+
+def _normalize(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _write_json(path: str, data: dict):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as fh:
+        json.dump(data, fh)
+    os.replace(tmp, path)
+
+
+def _spherical_kmeans(sample: np.ndarray, nlist: int, iterations: int = 10) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        for c in range(nlist):
+            members = sample[assign == c]
+            centroids[c] = members.mean(axis=0) if len(members) else sample[rng.integers(len(sample))]
+        centroids = _normalize(centroids)
+    return centroids
+
+
+# ─── numpy IVF over memory-mapped files ──────────────────────────────────────
+
+class IVFIndex:
+    backend = "ivf"
+
+    def __init__(self, path: str, dim: int, meta: dict = None, quantization_mode: str = "none"):
+        self.path = path
+        self.dim = dim
+        self.meta = meta or {
+            "backend": self.backend, "dim": dim, "gen": 0, "count": 0,
+            "ids": [], "deleted": [], "nlist": 0, "quantization": quantization_mode
+        }
+        self.mode = self.meta.get("quantization", "none")
+        # a re-added id has a tombstoned old row and a live new one
+        deleted = set(self.meta["deleted"])
+        self._rows = {fid: row for row, fid in enumerate(self.meta["ids"]) if row not in deleted}
+
+    # files of the current generation
+    def _file(self, name: str, gen: int = None) -> str:
+        return os.path.join(self.path, f"{name}.{self.meta['gen'] if gen is None else gen}")
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _vectors(self) -> np.ndarray:
+        if not self.meta["count"]:
+            return np.zeros((0, self.dim), dtype=np.float16)
+        return np.memmap(self._file("vectors"), dtype=np.float16, mode="r", shape=(self.meta["count"], self.dim))
+
+    def _assign(self) -> np.ndarray:
+        return np.memmap(self._file("assign"), dtype=np.int32, mode="r", shape=(self.meta["count"],))
+
+    def _centroids(self) -> np.ndarray:
+        return np.load(self._file("centroids") + ".npy")
+
+    def _codes(self) -> tuple:
+        count = self.meta["count"]
+        if self.mode == "int8":
+            codes = np.memmap(self._file("codes"), dtype=np.int8, mode="r", shape=(count, self.dim))
+            scales = np.memmap(self._file("scales"), dtype=np.float32, mode="r", shape=(count,))
+            return codes, scales
+        width = (self.dim + 7) // 8
+        return np.memmap(self._file("codes"), dtype=np.uint8, mode="r", shape=(count, width)), None
+
+    def _append_codes(self, vectors: np.ndarray, gen: int = None):
+        if self.mode == "none":
+            return
+        codes, scales = quantization.encode(vectors, self.mode)
+        with open(self._file("codes", gen), "ab") as fh:
+            fh.write(codes.tobytes())
+        if scales is not None:
+            with open(self._file("scales", gen), "ab") as fh:
+                fh.write(scales.tobytes())
+
+    def add(self, file_ids: list, vectors):
+        self.delete([fid for fid in file_ids if fid in self._rows], compact=False)
+        vectors = _normalize(vectors)
+
+        with open(self._file("vectors"), "ab") as fh:
+            fh.write(vectors.astype(np.float16).tobytes())
+        self._append_codes(vectors)
+        if self.meta["nlist"]:
+            assign = np.argmax(vectors @ self._centroids().T, axis=1).astype(np.int32)
+            with open(self._file("assign"), "ab") as fh:
+                fh.write(assign.tobytes())
+
+        start = self.meta["count"]
+        self.meta["ids"].extend(file_ids)
+        self.meta["count"] += len(file_ids)
+        self._rows.update({fid: start + i for i, fid in enumerate(file_ids)})
+
+        # (re)train the quantiser once the index outgrows exact search
+        live = len(self._rows)
+        if (not self.meta["nlist"] and live >= IVF_MIN_TRAIN) or live >= 4 * self.meta.get("trained_on", live):
+            self.compact()
+
+    def delete(self, file_ids: list, compact: bool = True):
+        rows = [self._rows.pop(fid) for fid in file_ids if fid in self._rows]
+        self.meta["deleted"].extend(rows)
+        if compact and self.meta["count"] and len(self.meta["deleted"]) > COMPACT_DELETED_RATIO * self.meta["count"]:
+            self.compact()
+
+    def search(self, vector, k: int) -> list:
+        if not self._rows:
+            return []
+        q = _normalize(vector)[0]
+
+        if self.meta["nlist"]:
+            probe = np.argsort(self._centroids() @ q)[::-1][:IVF_NPROBE]
+            rows = np.flatnonzero(np.isin(self._assign(), probe))
+        else:
+            rows = np.arange(self.meta["count"])
+        if self.meta["deleted"]:
+            rows = rows[~np.isin(rows, np.asarray(self.meta["deleted"]))]
+        if not len(rows):
+            return []
+
+        if self.mode != "none":
+            # approximate scores on the codes, exact rescoring of the best few
+            codes, scales = self._codes()
+            approx = quantization.approximate_scores(
+                self.mode, codes[rows], scales[rows] if scales is not None else None, q
+            )
+            rows = np.sort(rows[quantization.top_k(approx, k * quantization.RESCORE_FACTOR)])
+
+        scores = self._vectors()[rows].astype(np.float32) @ q
+        top = quantization.top_k(scores, k)
+        ids = self.meta["ids"]
+        return [(ids[rows[i]], float(scores[i])) for i in top]
+
+    def compact(self, quantization_mode: str = None):
+        """Rewrite live vectors into a new generation, retrain the IVF lists and re-encode codes."""
+        old_gen, new_gen = self.meta["gen"], self.meta["gen"] + 1
+        live_ids = list(self._rows)
+        live_rows = np.asarray([self._rows[fid] for fid in live_ids], dtype=np.int64)
+        vectors = self._vectors()[live_rows] if len(live_rows) else np.zeros((0, self.dim), np.float16)
+
+        for name in ("codes", "scales"):   # leftovers of an interrupted compaction
+            if os.path.exists(self._file(name, new_gen)):
+                os.remove(self._file(name, new_gen))
+        vectors.astype(np.float16).tofile(self._file("vectors", new_gen))
+        self.mode = quantization_mode or self.mode
+        for i in range(0, len(live_ids), 8192):
+            self._append_codes(vectors[i:i + 8192].astype(np.float32), gen=new_gen)
+        nlist = 0
+        if len(live_ids) >= IVF_MIN_TRAIN:
+            nlist = int(min(4096, max(16, np.sqrt(len(live_ids)))))
+            rng = np.random.default_rng(0)
+            sample_rows = rng.choice(len(live_ids), min(IVF_TRAIN_SAMPLE, len(live_ids)), replace=False)
+            centroids = _spherical_kmeans(vectors[np.sort(sample_rows)].astype(np.float32), nlist)
+            np.save(self._file("centroids", new_gen) + ".npy", centroids)
+            assign = np.concatenate([
+                np.argmax(vectors[i:i + 8192].astype(np.float32) @ centroids.T, axis=1)
+                for i in range(0, len(live_ids), 8192)
+            ]).astype(np.int32)
+            assign.tofile(self._file("assign", new_gen))
+
+        self.meta.update({
+            "gen": new_gen, "count": len(live_ids), "ids": live_ids, "deleted": [],
+            "nlist": nlist, "trained_on": len(live_ids), "quantization": self.mode
+        })
+        self._rows = {fid: row for row, fid in enumerate(live_ids)}
+        self.save()
+        for name in ("vectors", "assign", "centroids", "codes", "scales"):
+            for suffix in ("", ".npy"):
+                try:
+                    os.remove(self._file(name, old_gen) + suffix)
+                except FileNotFoundError:
+                    pass
+
+    def save(self):
+        _write_json(os.path.join(self.path, "meta.json"), self.meta)
+
+
+# ─── hnswlib ─────────────────────────────────────────────────────────────────
+
+class HNSWIndex:
+    backend = "hnsw"
+
+    def __init__(self, path: str, dim: int, meta: dict = None):
+        self.path = path
+        self.dim = dim
+        self.meta = meta or {"backend": self.backend, "dim": dim, "labels": {}, "next_label": 0}
+        self._index = hnswlib.Index(space="cosine", dim=dim)
+        index_file = os.path.join(path, "index.bin")
+        if meta and os.path.exists(index_file):
+            self._index.load_index(index_file, allow_replace_deleted=True)
+        else:
+            self._index.init_index(max_elements=1024, ef_construction=200, M=16, allow_replace_deleted=True)
+        self._index.set_ef(64)
+
+    def __len__(self):
+        return len(self.meta["labels"])
+
+    def add(self, file_ids: list, vectors):
+        labels = self.meta["labels"]
+        needed = self.meta["next_label"] + len(file_ids)
+        if needed > self._index.get_max_elements():
+            self._index.resize_index(max(needed, 2 * self._index.get_max_elements()))
+
+        ids = []
+        for fid in file_ids:
+            if fid not in labels:
+                labels[fid] = self.meta["next_label"]
+                self.meta["next_label"] += 1
+            ids.append(labels[fid])
+        self._index.add_items(_normalize(vectors), np.asarray(ids))
+
+    def delete(self, file_ids: list, compact: bool = True):
+        for fid in file_ids:
+            label = self.meta["labels"].pop(fid, None)
+            if label is not None:
+                self._index.mark_deleted(label)
+
+    def search(self, vector, k: int) -> list:
+        if not self.meta["labels"]:
+            return []
+        labels, distances = self._index.knn_query(_normalize(vector), k=min(k, len(self)))
+        by_label = {label: fid for fid, label in self.meta["labels"].items()}
+        return [
+            (by_label[label], 1.0 - float(dist))
+            for label, dist in zip(labels[0], distances[0]) if label in by_label
+        ]
+
+    def compact(self, quantization_mode: str = None):
+        pass   # hnswlib keeps float32 vectors; quantization applies to the ivf backend
+
+    def save(self):
+        self._index.save_index(os.path.join(self.path, "index.bin"))
+        _write_json(os.path.join(self.path, "meta.json"), self.meta)
+
+
+# ─── Per-user registry ───────────────────────────────────────────────────────
+
+_open = {}                 # user_id -> (meta mtime, index)
+_locks = {}
+_registry_lock = threading.Lock()
+
+
+def vector_index_enabled() -> bool:
+    return current_app.config.get("VECTOR_INDEX_ENABLED", False)
+
+
+def _user_lock(user_id: int) -> threading.Lock:
+    with _registry_lock:
+        return _locks.setdefault(user_id, threading.Lock())
+
+
+def _user_dir(user_id: int) -> str:
+    return os.path.join(current_app.config["VECTOR_INDEX_DIR"], f"user_{user_id}")
+
+
+def _backend_class(name: str = None):
+    name = name or current_app.config.get("VECTOR_INDEX_BACKEND", "auto")
+    if name == "auto":
+        name = "hnsw" if hnswlib is not None else "ivf"
+    if name == "hnsw" and hnswlib is None:
+        raise RuntimeError("VECTOR_INDEX_BACKEND=hnsw requires the 'hnswlib' package")
+    return HNSWIndex if name == "hnsw" else IVFIndex
+
+
+def get_vector_index(user_id: int, dim: int = None):
+    """The user's index (reopened if another process changed it), or a new one when dim is given."""
+    path = _user_dir(user_id)
+    meta_file = os.path.join(path, "meta.json")
+    mtime = os.path.getmtime(meta_file) if os.path.exists(meta_file) else None
+
+    cached = _open.get(user_id)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    if mtime is not None:
+        with open(meta_file) as fh:
+            meta = json.load(fh)
+        cls = HNSWIndex if meta["backend"] == "hnsw" else IVFIndex
+        index = cls(path, meta["dim"], meta)
+    elif dim is not None:
+        os.makedirs(path, exist_ok=True)
+        cls = _backend_class()
+        if cls is IVFIndex:
+            index = cls(path, dim, quantization_mode=current_app.config.get("VECTOR_QUANTIZATION", "none"))
+        else:
+            index = cls(path, dim)
+    else:
+        return None
+
+    _open[user_id] = (mtime, index)
+    return index
+
+
+def _remember(user_id: int, index):
+    meta_file = os.path.join(_user_dir(user_id), "meta.json")
+    _open[user_id] = (os.path.getmtime(meta_file), index)
+
+
+def add_vectors(user_id: int, file_ids: list, vectors):
+    if not file_ids:
+        return
+    vectors = np.asarray(vectors, dtype=np.float32)
+    with _user_lock(user_id):
+        index = get_vector_index(user_id, dim=vectors.shape[1])
+        index.add(list(file_ids), vectors)
+        index.save()
+        _remember(user_id, index)
+
+
+def delete_vectors(user_id: int, file_ids: list):
+    if not file_ids:
+        return
+    with _user_lock(user_id):
+        index = get_vector_index(user_id)
+        if index is None:
+            return
+        index.delete(list(file_ids))
+        index.save()
+        _remember(user_id, index)
+
+
+def _embedding_key(max_chars: int) -> str:
+    """Model name (last path component, Windows or POSIX) and embedded prefix length."""
+    from src.config.search_config import BIENCODER_MODEL_PATH
+    model = re.split(r"[\\/]", BIENCODER_MODEL_PATH.rstrip("\\/"))[-1]
+    return f"{model}-{max_chars}"
+
+
+def embed_documents(texts: list, hashes: list) -> np.ndarray:
+    """
+    Bi-encoder embeddings of texts (rows follow `texts`). Embeddings of known
+    content hashes come from the artifact store; only the rest are encoded.
+    """
+    from src.services.embedding_service import encode_documents
+
+    max_chars = current_app.config.get("VECTOR_EMBED_CHARS", 4000)
+    model_key = _embedding_key(max_chars)
+
+    vectors = [get_embedding(h, model_key) for h in hashes]
+    missing = [i for i, v in enumerate(vectors) if v is None]
+    if missing:
+        encoded = encode_documents([texts[i][:max_chars] for i in missing]).float().cpu().numpy()
+        for i, vector in zip(missing, encoded):
+            vectors[i] = vector
+            put_embedding(hashes[i], model_key, vector)
+    return np.stack(vectors)
+
+
+def index_documents(user_id: int, docs: list):
+    """Embed (file_id, text[, content_hash]) tuples and add them to the user's index."""
+    if not docs:
+        return
+    file_ids = [doc[0] for doc in docs]
+    vectors = embed_documents([doc[1] for doc in docs], [doc[2] if len(doc) > 2 else None for doc in docs])
+
+    add_vectors(user_id, file_ids, vectors)
+    current_app.logger.info(f"🧭 Added {len(file_ids)} vectors to the ANN index of user {user_id}")
+
+
+def search_vectors(user_id: int, query_vector, k: int) -> list:
+    """[(file_id, cosine similarity)] of the k nearest documents, or [] without an index."""
+    index = get_vector_index(user_id)
+    if index is None:
+        return []
+    return index.search(np.asarray(query_vector, dtype=np.float32), k)
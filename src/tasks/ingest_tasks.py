@@ -0,0 +1,145 @@
+# src/tasks/ingest_tasks.py
+
+from datetime import datetime
+from dateutil.parser import parse as parse_datetime
+from flask import current_app
+
+from src.models import db
+from src.models.document_model import Document
+from src.models.user_model import SyncStatus, User
+from src.services.change_detection import item_fingerprint, provider_sha256
+from src.tasks.scheduler import job_handler
+
+SYNC_USER = "sync_user"
+BACKFILL_HASHES = "backfill_hashes"
+REINDEX = "reindex"
+
+
+def _set_sync_status(user_id: int, status: SyncStatus):
+    user = db.session.get(User, user_id)
+    if user:
+        user.sync_status = status
+        user.sync_updated_at = datetime.utcnow()
+        db.session.commit()
+
+
+@job_handler(SYNC_USER)
+def sync_user_drive(job):
+    """Delta-sync a user's OneDrive into the DB and index."""
+    from src.controllers.ingest_controller import _init_tempdir, ingest_user_onedrive_files
+
+    logger = current_app.logger
+    _init_tempdir()
+
+    user = db.session.get(User, job.user_id)
+    if not user:
+        logger.warning(f"🔍 DEBUG: User {job.user_id} not found; skipping")
+        return
+
+    _set_sync_status(user.id, SyncStatus.RUNNING)
+    logger.info(f"🔍 DEBUG: Set sync status to RUNNING for user {user.id}")
+
+    try:
+        ingest_user_onedrive_files(user, job_id=job.id)
+    except Exception as e:
+        logger.error(f"🔍 DEBUG: Ingestion failed for user {job.user_id}: {e}")
+        db.session.rollback()
+        _set_sync_status(job.user_id, SyncStatus.ERROR)
+        raise
+
+    _set_sync_status(job.user_id, SyncStatus.DONE)
+    logger.info(f"🔍 DEBUG: Ingestion completed successfully for user {job.user_id}")
+
+
+def _keep_text(sha: str, name: str, spool):
+    """The bytes are in hand anyway: store their text for later syncs and reindexes."""
+    from src.services.artifact_store import get_text, put_text
+    from src.services.parser import is_supported, parse_stream
+
+    if not is_supported(name) or get_text(sha) is not None:
+        return
+    try:
+        put_text(sha, parse_stream(name, spool).strip())
+    except Exception as e:
+        current_app.logger.debug(f"Text not cached for {name}: {e}")
+
+
+def backfill_document_hashes(user: User, on_error=None) -> int:
+    """
+    Fill in missing content hashes, modification dates and Graph fingerprints.
+    Metadata comes from a single item lookup; content is only downloaded when
+    Graph doesn't provide a SHA-256 of the bytes. Returns the number updated.
+    """
+    from src.services.microsoft_graph import MicrosoftGraphService
+
+    svc = MicrosoftGraphService(
+        access_token=user.access_token,
+        refresh_token=user.refresh_token,
+        token_expires=user.token_expires,
+        user_id=user.id
+    )
+    svc.ensure_valid_token()
+
+    docs = Document.query.filter_by(user_id=user.id).all()
+    updated = 0
+
+    for doc in docs:
+        if doc.content_hash and doc.modified_at and doc.ctag:
+            continue
+
+        try:
+            meta = svc.get_item(doc.file_id)
+            modified_at_str = meta.get("lastModifiedDateTime")
+            doc.modified_at = parse_datetime(modified_at_str) if modified_at_str else None
+
+            sha = provider_sha256(meta)
+            if not doc.content_hash:
+                # same definition as ingestion: SHA-256 of the raw bytes
+                if not sha:
+                    spool, sha, _ = svc.download_to_spool(doc.file_id)
+                    try:
+                        _keep_text(sha, doc.filename.lower(), spool)
+                    finally:
+                        spool.close()
+                doc.content_hash = sha
+            elif sha and sha == doc.content_hash:
+                # only trust the fingerprint when it provably describes the indexed bytes;
+                # otherwise the next sync fetches the file and records it
+                for key, value in item_fingerprint(meta).items():
+                    setattr(doc, key, value)
+            updated += 1
+
+        except Exception as e:
+            if on_error:
+                on_error(doc, e)
+            else:
+                current_app.logger.warning(f"⚠️ Failed to backfill {doc.filename}: {e}")
+
+    db.session.commit()
+    return updated
+
+
+@job_handler(BACKFILL_HASHES)
+def backfill_hashes_job(job):
+    user = db.session.get(User, job.user_id)
+    if not user:
+        return
+    updated = backfill_document_hashes(user)
+    current_app.logger.info(f"✅ Backfilled {updated} documents for user {user.id}")
+
+
+@job_handler(REINDEX)
+def reindex_job(job):
+    """Rebuild a user's index and swap it in; runs exclusive with the user's syncs."""
+    from src.services.reindex_service import reindex_user
+
+    user = db.session.get(User, job.user_id)
+    if not user:
+        return
+    args = job.args
+    stats = reindex_user(
+        user,
+        source=args.get("source", "graph"),
+        keep_old=args.get("keep_old", False)
+    )
+    current_app.logger.info(f"✅ Reindexed user {user.id}: {stats}")
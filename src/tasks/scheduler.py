@@ -0,0 +1,356 @@
+# src/tasks/scheduler.py
+
+import heapq
+import itertools
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from src.models import db
+from src.models.job_model import Job, JobStatus, JobPriority
+from src.models.user_model import User
+
+# kind -> callable(job), filled in by @job_handler
+_handlers = {}
+
+
+def job_handler(kind: str):
+    """Register a function as the handler for a persistent job kind."""
+    def decorator(fn):
+        _handlers[kind] = fn
+        return fn
+    return decorator
+
+
+class JobScheduler:
+    """
+    Persistent, prioritised job queue executed by a fixed pool of worker threads.
+
+    - Jobs live in the `jobs` table, so queued work survives a restart.
+    - At most one job per user runs at a time (in this process, and checked
+      against the table for other processes).
+    - A running job is leased to its consumer (owner + heartbeat_at, renewed
+      every JOB_HEARTBEAT_INTERVAL). Only jobs whose lease expired, i.e. whose
+      process died, are re-queued, so several consumers can share the table.
+    - The pool is sized to the CPU count, which bounds host load no matter
+      how many users log in at once.
+    - With consume=False (pre-forked web workers) persistent jobs are only
+      stored; a single `flask run-jobs` process executes them. Transient
+      callables still run on the local pool.
+    """
+
+    RETRY_BUSY_SECONDS = 5
+
+    def __init__(self, app, max_workers: int = None, consume: bool = None):
+        self.app = app
+        self.consume = app.config.get("JOB_QUEUE_CONSUMER", True) if consume is None else consume
+        self.max_workers = max_workers or app.config.get("JOB_WORKERS") or os.cpu_count() or 2
+        self._heap = []                 # (priority, seq, user_id, job_id, fn)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._busy_users = set()
+        self._running_jobs = set()
+        self._started = False
+        self.poll_interval = app.config.get("JOB_POLL_INTERVAL", 30)
+        self.heartbeat_interval = app.config.get("JOB_HEARTBEAT_INTERVAL", 15)
+        self.lease_seconds = app.config.get("JOB_LEASE_SECONDS", 90)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    # ─── Lifecycle ───────────────────────────────────────────────────────────
+
+    def start(self):
+        with self._cond:
+            if self._started:
+                return
+            self._started = True
+
+        if self.consume:
+            with self.app.app_context():
+                self._recover()
+
+        for i in range(self.max_workers):
+            threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True).start()
+        if self.consume:
+            threading.Thread(target=self._poll, name="job-poller", daemon=True).start()
+            threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True).start()
+        self.app.logger.info(
+            f"🧵 Job scheduler started with {self.max_workers} workers"
+            f"{'' if self.consume else ' (transient tasks only)'}"
+        )
+
+    def _requeue_expired(self) -> int:
+        """Re-queue RUNNING jobs whose owner stopped renewing the lease (process died)."""
+        now = datetime.utcnow()
+        expired_before = now - timedelta(seconds=self.lease_seconds)
+        expired = db.and_(
+            Job.status == JobStatus.RUNNING,
+            db.or_(
+                Job.heartbeat_at < expired_before,
+                db.and_(Job.heartbeat_at.is_(None), db.or_(
+                    Job.started_at.is_(None), Job.started_at < expired_before
+                ))
+            )
+        )
+        other = db.aliased(Job)
+        queued_twin = (
+            db.select(other.id)
+            .where(other.kind == Job.kind, other.user_id == Job.user_id, other.status == JobStatus.QUEUED)
+            .exists()
+        )
+        stale = (
+            Job.query
+            .filter(expired, ~queued_twin)
+            .update(
+                {"status": JobStatus.QUEUED, "started_at": None, "owner": None, "heartbeat_at": None},
+                synchronize_session=False
+            )
+        )
+        # only one job per (kind, user) may wait; a queued one already covers the rest
+        Job.query.filter(expired).update(
+            {"status": JobStatus.ERROR, "error": "Lease expired; superseded by a queued job",
+             "finished_at": now, "owner": None, "heartbeat_at": None},
+            synchronize_session=False
+        )
+        db.session.commit()
+        if stale:
+            self.app.logger.warning(f"♻️ Re-queued {stale} interrupted jobs (lease expired)")
+        return stale
+
+    def _recover(self):
+        """Re-queue jobs of dead processes and schedule everything queued."""
+        self._requeue_expired()
+
+        for job in Job.query.filter_by(status=JobStatus.QUEUED).order_by(Job.priority, Job.id):
+            self._push(job.priority, job.user_id, job_id=job.id)
+        db.session.remove()
+
+    def _poll(self):
+        """Pick up jobs queued by other processes (CLI, other workers)."""
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                with self.app.app_context():
+                    self._requeue_expired()
+                    queued = Job.query.filter_by(status=JobStatus.QUEUED).all()
+                    with self._cond:
+                        known = {e[3] for e in self._heap} | self._running_jobs
+                    for job in queued:
+                        if job.id not in known:
+                            self._push(job.priority, job.user_id, job_id=job.id)
+                    db.session.remove()
+            except Exception:
+                self.app.logger.exception("❌ Job poller failed")
+
+    def _heartbeat(self):
+        """Renew the lease of the jobs this process is running."""
+        while True:
+            time.sleep(self.heartbeat_interval)
+            with self._cond:
+                job_ids = [j for j in self._running_jobs if j is not None]
+            if not job_ids:
+                continue
+            try:
+                with self.app.app_context():
+                    Job.query.filter(
+                        Job.id.in_(job_ids), Job.owner == self.owner, Job.status == JobStatus.RUNNING
+                    ).update({"heartbeat_at": datetime.utcnow()}, synchronize_session=False)
+                    db.session.commit()
+                    db.session.remove()
+            except Exception:
+                self.app.logger.exception("❌ Job heartbeat failed")
+
+    # ─── Queue ───────────────────────────────────────────────────────────────
+
+    def _push(self, priority, user_id, job_id=None, fn=None):
+        with self._cond:
+            heapq.heappush(self._heap, (int(priority), next(self._seq), user_id, job_id, fn))
+            self._cond.notify()
+
+    def _take(self):
+        """Pop the most urgent entry whose user has no job running."""
+        with self._cond:
+            while True:
+                ready = [e for e in self._heap if e[2] is None or e[2] not in self._busy_users]
+                if ready:
+                    entry = min(ready)
+                    self._heap.remove(entry)
+                    heapq.heapify(self._heap)
+                    if entry[2] is not None:
+                        self._busy_users.add(entry[2])
+                    return entry
+                self._cond.wait()
+
+    def _release(self, user_id):
+        with self._cond:
+            self._busy_users.discard(user_id)
+            self._cond.notify_all()
+
+    def enqueue(self, kind: str, user_id: int, priority=JobPriority.SYNC, dispatch=True, **payload) -> Job:
+        """
+        Persist a job and schedule it. A job of the same kind already waiting
+        for this user absorbs the request (its priority is raised if needed).
+        With dispatch=False the job is only stored, for a server process to pick up.
+        """
+        dispatch = dispatch and self.consume
+        while True:
+            pending = Job.query.filter_by(kind=kind, user_id=user_id, status=JobStatus.QUEUED).first()
+            if pending:
+                if priority < pending.priority:
+                    pending.priority = int(priority)
+                    db.session.commit()
+                    if dispatch:
+                        self._push(priority, user_id, job_id=pending.id)
+                current_app.logger.debug(f"🔁 Job {kind} for user {user_id} already queued (#{pending.id})")
+                if dispatch:
+                    self.start()
+                return pending
+
+            job = Job(
+                kind=kind,
+                user_id=user_id,
+                priority=int(priority),
+                status=JobStatus.QUEUED,
+                payload=json.dumps(payload) if payload else None
+            )
+            db.session.add(job)
+            try:
+                db.session.commit()
+                break
+            except IntegrityError:
+                # another process queued it since the lookup (uq_jobs_queued_kind_user)
+                db.session.rollback()
+
+        if dispatch:
+            self.start()
+            self._push(job.priority, user_id, job_id=job.id)
+        current_app.logger.info(f"📥 Queued job #{job.id} {kind} for user {user_id} (priority {job.priority})")
+        return job
+
+    def run_transient(self, fn, *args, priority=JobPriority.SYNC, **kwargs):
+        """Run a non-persistent callable on the shared pool."""
+        self.start()
+        self._push(priority, None, fn=lambda: fn(*args, **kwargs))
+
+    # ─── Workers ─────────────────────────────────────────────────────────────
+
+    def _work(self):
+        while True:
+            _, _, user_id, job_id, fn = self._take()
+            with self._cond:
+                self._running_jobs.add(job_id)
+            try:
+                with self.app.app_context():
+                    if fn is not None:
+                        fn()
+                    else:
+                        self._run_job(job_id)
+            except Exception:
+                self.app.logger.exception("❌ Job worker failed")
+            finally:
+                with self._cond:
+                    self._running_jobs.discard(job_id)
+                self._release(user_id)
+
+    def _run_job(self, job_id: int):
+        try:
+            job = db.session.get(Job, job_id)
+            if job is None:
+                return
+
+            priority, user_id = job.priority, job.user_id
+
+            # Claim atomically, and only while no other job of the user runs in
+            # any process. The user row lock serializes concurrent claims for the
+            # user until commit (under READ COMMITTED two claims could otherwise
+            # both pass NOT EXISTS).
+            db.session.execute(db.select(User.id).where(User.id == user_id).with_for_update())
+            other = db.aliased(Job)
+            busy = (
+                db.select(other.id)
+                .where(other.user_id == Job.user_id, other.status == JobStatus.RUNNING, other.id != Job.id)
+                .exists()
+            )
+            claimed = (
+                Job.query
+                .filter(Job.id == job_id, Job.status == JobStatus.QUEUED, ~busy)
+                .update({
+                    "status": JobStatus.RUNNING,
+                    "started_at": datetime.utcnow(),
+                    "heartbeat_at": datetime.utcnow(),
+                    "owner": self.owner,
+                    "attempts": Job.attempts + 1,
+                }, synchronize_session=False)
+            )
+            db.session.commit()
+            if not claimed:
+                if db.session.execute(db.select(Job.status).where(Job.id == job_id)).scalar() == JobStatus.QUEUED:
+                    # another job of this user is running: try again later
+                    threading.Timer(
+                        self.RETRY_BUSY_SECONDS, self._push, (priority, user_id), {"job_id": job_id}
+                    ).start()
+                return
+
+            job = db.session.get(Job, job_id)
+            db.session.refresh(job)
+            handler = _handlers.get(job.kind)
+            self.app.logger.info(f"▶️ Running job #{job.id} {job.kind} for user {job.user_id}")
+
+            try:
+                if handler is None:
+                    raise RuntimeError(f"No handler registered for job kind '{job.kind}'")
+                handler(job)
+                job = db.session.get(Job, job_id)
+                job.status = JobStatus.DONE
+                job.error = None
+            except Exception as e:
+                self.app.logger.exception(f"❌ Job #{job_id} failed")
+                db.session.rollback()
+                job = db.session.get(Job, job_id)
+                job.status = JobStatus.ERROR
+                job.error = str(e)
+
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+        finally:
+            db.session.remove()
+
+
+def init_job_scheduler(app) -> JobScheduler:
+    """Attach a scheduler to the app. Workers start lazily on first use."""
+    import src.tasks.ingest_tasks  # noqa: F401  (registers job handlers)
+
+    scheduler = JobScheduler(app)
+    app.extensions["job_scheduler"] = scheduler
+    return scheduler
+
+
+def get_scheduler() -> JobScheduler:
+    return current_app.extensions["job_scheduler"]
+
+
+def enqueue_job(kind: str, user_id: int, priority=JobPriority.SYNC, dispatch=True, **payload) -> Job:
+    return get_scheduler().enqueue(kind, user_id, priority, dispatch=dispatch, **payload)
+
+
+def update_job_progress(job_id: int, **fields):
+    """Merge fields into a job's persisted progress snapshot."""
+    job = db.session.get(Job, job_id)
+    if job is None:
+        return
+    data = job.progress_data
+    data.update(fields)
+    job.progress = json.dumps(data, default=str)
+    db.session.commit()
+
+
+def get_latest_job(user_id: int, kind: str = None):
+    query = Job.query.filter_by(user_id=user_id)
+    if kind:
+        query = query.filter_by(kind=kind)
+    return query.order_by(Job.id.desc()).first()
@@ -1,11 +1,10 @@
-import threading
 from flask import current_app
 
 def run_in_background(fn, *args, **kwargs):
+    """Run fn on the shared job pool instead of spawning a thread per call."""
     def _target():
         try:
             fn(*args, **kwargs)
         except Exception:
             current_app.logger.exception("❌ Background task failed")
-    t = threading.Thread(target=_target, daemon=True)
-    t.start()
+    current_app.extensions["job_scheduler"].run_transient(_target)
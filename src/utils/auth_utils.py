@@ -1,8 +1,88 @@
 # src/services/auth_utils.py
+import threading
+import time
 from flask import current_app, session
 from datetime import datetime
+from msal import ConfidentialClientApplication
 from src.models import db, User
 
+# ─── Process-wide MSAL client ────────────────────────────────────────────────
+
+_msal_apps = {}
+_msal_lock = threading.Lock()
+
+
+def get_confidential_client(authority: str = None, validate_authority: bool = True) -> ConfidentialClientApplication:
+    """
+    One ConfidentialClientApplication per (client, authority) for the whole
+    process. Construction does OIDC discovery over the network, so building
+    one per request/service instance is expensive; the app itself is thread-safe.
+    """
+    cfg = current_app.config
+    authority = authority or cfg["AUTHORITY"]
+    key = (cfg["CLIENT_ID"], authority, validate_authority)
+
+    app = _msal_apps.get(key)
+    if app is None:
+        with _msal_lock:
+            app = _msal_apps.get(key)
+            if app is None:
+                app = ConfidentialClientApplication(
+                    client_id=cfg["CLIENT_ID"],
+                    client_credential=cfg["CLIENT_SECRET"],
+                    authority=authority,
+                    validate_authority=validate_authority
+                )
+                _msal_apps[key] = app
+    return app
+
+
+# ─── In-memory access-token cache ────────────────────────────────────────────
+
+class TokenCache:
+    """Thread-safe user_id -> (access_token, refresh_token, expires_at) cache."""
+
+    def __init__(self, skew_seconds: int = 300):
+        self.skew_seconds = skew_seconds
+        self._tokens = {}
+        self._lock = threading.Lock()
+        self._refresh_locks = {}
+
+    def get(self, user_id):
+        """Cached tokens for a user if the access token is still comfortably valid."""
+        with self._lock:
+            entry = self._tokens.get(user_id)
+        if entry and entry[2] - time.time() > self.skew_seconds:
+            return entry
+        return None
+
+    def put(self, user_id, access_token, refresh_token, expires_at: float):
+        with self._lock:
+            self._tokens[user_id] = (access_token, refresh_token, float(expires_at))
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._tokens.pop(user_id, None)
+
+    def refresh_lock(self, user_id) -> threading.Lock:
+        """Serialises refreshes per user so concurrent requests refresh once."""
+        with self._lock:
+            return self._refresh_locks.setdefault(user_id, threading.Lock())
+
+
+token_cache = TokenCache()
+
+
+def apply_tokens(user, access_token, refresh_token, expires_at: float) -> bool:
+    """Copy tokens onto a User row; returns True only if anything changed."""
+    token_cache.put(user.id, access_token, refresh_token, expires_at)
+    if user.access_token == access_token and user.refresh_token == refresh_token:
+        return False
+    user.access_token = access_token
+    user.refresh_token = refresh_token
+    user.token_expires = datetime.utcfromtimestamp(expires_at)
+    return True
+
 
 def get_non_reserved_scopes():
     # Only filter 'openid' and 'profile' to keep 'offline_access' for refresh tokens
@@ -21,10 +101,8 @@ def save_updated_token(user_id, token_data):
     if not user:
         raise ValueError(f"User with ID {user_id} not found")
 
-    user.access_token = token_data["access_token"]
-    user.refresh_token = token_data["refresh_token"]
-    user.token_expires = datetime.utcfromtimestamp(token_data["expires_at"])
-    db.session.commit()
+    if apply_tokens(user, token_data["access_token"], token_data["refresh_token"], token_data["expires_at"]):
+        db.session.commit()
 
 def refresh_token_if_needed(user):
     """Check if user token needs refresh and refresh if necessary"""
@@ -0,0 +1,98 @@
+# src/utils/fake_graph.py
+#
+# In-process stand-in for the Graph /subscriptions endpoints, used by
+# `flask check-subscriptions` to exercise the subscription manager without a
+# tenant. Point MicrosoftGraphService at it through GRAPH_BASE_URL.
+#
+# Like Graph, creating a subscription first POSTs ?validationToken=... to the
+# notification URL and only succeeds when the token is echoed back as text.
+
+import secrets
+import threading
+import uuid
+
+import requests
+from flask import Flask, jsonify, request
+from werkzeug.serving import make_server
+
+
+def _http_validate(url: str, token: str) -> tuple:
+    resp = requests.post(url, params={"validationToken": token}, timeout=10)
+    return resp.status_code, resp.text
+
+
+class FakeGraph:
+    """Subscriptions held in memory; `validate(url, token) -> (status, body)` runs the handshake."""
+
+    def __init__(self, validate=None):
+        self.validate = validate or _http_validate
+        self.subscriptions = {}
+        self.handshakes = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    def _error(self, status: int, code: str, message: str):
+        return jsonify({"error": {"code": code, "message": message}}), status
+
+    def create_app(self) -> Flask:
+        app = Flask("fake_graph")
+
+        @app.before_request
+        def require_bearer():
+            if not request.headers.get("Authorization", "").startswith("Bearer "):
+                return self._error(401, "InvalidAuthenticationToken", "Access token is empty.")
+
+        @app.route("/subscriptions", methods=["GET"])
+        def list_subscriptions():
+            with self._lock:
+                return jsonify({"value": list(self.subscriptions.values())})
+
+        @app.route("/subscriptions", methods=["POST"])
+        def create_subscription():
+            body = request.get_json()
+            token = secrets.token_urlsafe(16)
+            status, text = self.validate(body["notificationUrl"], token)
+            self.handshakes += 1
+            if status != 200 or text != token:
+                return self._error(400, "ValidationError", "Subscription validation request failed.")
+
+            sub = {
+                "id":                 str(uuid.uuid4()),
+                "resource":           body["resource"],
+                "changeType":         body["changeType"],
+                "notificationUrl":    body["notificationUrl"],
+                "clientState":        body.get("clientState"),
+                "expirationDateTime": body["expirationDateTime"],
+            }
+            with self._lock:
+                self.subscriptions[sub["id"]] = sub
+            return jsonify(sub), 201
+
+        @app.route("/subscriptions/<sub_id>", methods=["PATCH"])
+        def renew_subscription(sub_id):
+            with self._lock:
+                sub = self.subscriptions.get(sub_id)
+                if sub is None:
+                    return self._error(404, "ResourceNotFound", "The object was not found.")
+                sub["expirationDateTime"] = request.get_json()["expirationDateTime"]
+                return jsonify(sub), 200
+
+        @app.route("/subscriptions/<sub_id>", methods=["DELETE"])
+        def delete_subscription(sub_id):
+            with self._lock:
+                if self.subscriptions.pop(sub_id, None) is None:
+                    return self._error(404, "ResourceNotFound", "The object was not found.")
+            return "", 204
+
+        return app
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Serve on a background thread; returns the base URL to use as GRAPH_BASE_URL."""
+        self._server = make_server(host, port, self.create_app(), threaded=True)
+        threading.Thread(target=self._server.serve_forever, name="fake-graph", daemon=True).start()
+        return f"http://{host}:{self._server.server_port}"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
@@ -0,0 +1,9 @@
+# wsgi.py
+#
+# Production entry point: `gunicorn -c gunicorn.conf.py wsgi:app`.
+# With preload_app the app (and, see gunicorn.conf.py, the NLP models) is
+# built once in the master and shared copy-on-write by every worker.
+
+from app import create_app
+
+app = create_app()